@@ -0,0 +1,88 @@
+"""
+Micro-benchmark of the band statistics: `calculate_array_statistics` (band by band)
+versus `calculate_fused_statistics` (one pass over the whole stack of bands).
+
+Usage:
+    python benchmarks/bench_statistics.py --bands 16 --size 1000
+    python benchmarks/bench_statistics.py --bands 16 --size 1000 --tile-size 100
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from sample.data_analysis import calculate_array_statistics, calculate_fused_statistics, split_array_into_tiles
+
+def main():
+    parser = argparse.ArgumentParser(description = 'This script compares the speed of the band statistics functions.')
+
+    ## BANDS
+    parser.add_argument('-b', '--bands',
+        type = int,
+        help = 'Number of bands',
+        default = 16
+    )
+
+    ## SIZE
+    parser.add_argument('-s', '--size',
+        type = int,
+        help = 'Width and height of each band (in pixels)',
+        default = 1000
+    )
+
+    ## TILE SIZE
+    parser.add_argument('-t', '--tile-size',
+        type = int,
+        help = 'Width and height of tiles (in pixels); if given, the statistics are calculated per tile',
+        default = None
+    )
+
+    ## REPEATS
+    parser.add_argument('-n', '--repeats',
+        type = int,
+        help = 'Number of repeats',
+        default = 5
+    )
+
+    args = parser.parse_args()
+
+    # Create deterministic data, with a NaN region in every band
+    data = np.random.default_rng(0).normal(10, 3, (args.bands, args.size, args.size)).astype(np.float32)
+    data[:, :args.size // 10, :] = np.nan
+
+    statistics = ['mean', 'minimum', 'maximum', 'range', 'coefficient_of_variation']
+
+    if args.tile_size:
+        # Statistics per tile per band
+        tile_size = args.tile_size
+        offsets = [(row_off, col_off) for row_off in range(0, args.size, tile_size) for col_off in range(0, args.size, tile_size)]
+
+        def reference():
+            for band in data:
+                for row_off, col_off in offsets:
+                    tile = band[row_off:row_off + tile_size, col_off:col_off + tile_size]
+                    if not np.isnan(tile).all():
+                        calculate_array_statistics(tile, statistics)
+
+        def fused():
+            calculate_fused_statistics(split_array_into_tiles(data, tile_size, tile_size), statistics, axis = (-3, -1))
+    else:
+        # Statistics per band
+        def reference():
+            for band in data:
+                calculate_array_statistics(band, statistics)
+
+        def fused():
+            calculate_fused_statistics(data, statistics, axis = (-2, -1))
+
+    reference_time = min(timeit.repeat(reference, number = 1, repeat = args.repeats))
+    fused_time = min(timeit.repeat(fused, number = 1, repeat = args.repeats))
+
+    print("{} bands of {} x {} pixels, tile size: {}, statistics: {}".format(
+        args.bands, args.size, args.size, args.tile_size or args.size, ", ".join(statistics)))
+    print("calculate_array_statistics: {:.4f} s".format(reference_time))
+    print("calculate_fused_statistics: {:.4f} s".format(fused_time))
+    print("Speedup: {:.1f}x".format(reference_time / fused_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark suite of the entry points: `aggregate`, `tile_raster`, `add_padding_to_raster` and
+`calculate_spectral_variance`, on deterministic synthetic data (see `synthetic.py`), across tile dimensions.
+
+The timings are written to a JSON file, which can be compared with the results of another commit.
+
+Usage:
+    python benchmarks/bench_suite.py --size 1000 --dimensions 500 1000 --output benchmarks/results.json
+    python benchmarks/bench_suite.py --size 1000 --dimensions 500 1000 --compare benchmarks/results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import create_synthetic_lut, create_synthetic_raster, create_synthetic_points
+
+from sample import aggregating
+from sample.raster import tile_raster, add_padding_to_raster
+from sample.spectral import calculate_spectral_variance
+
+def main():
+    parser = argparse.ArgumentParser(description = 'This script times the entry points on synthetic data.')
+
+    ## SIZE
+    parser.add_argument('-s', '--size',
+        type = int,
+        help = 'Width and height of the synthetic raster (in pixels)',
+        default = 1000
+    )
+
+    ## BANDS
+    parser.add_argument('-b', '--bands',
+        type = int,
+        help = 'Number of bands (the last band is the land use band)',
+        default = 16
+    )
+
+    ## DIMENSIONS
+    parser.add_argument('-d', '--dimensions',
+        nargs = '+',
+        type = int,
+        help = 'Tile dimensions (in metres; the resolution is 10 metres)',
+        default = [500, 1000]
+    )
+
+    ## REPEATS
+    parser.add_argument('-n', '--repeats',
+        type = int,
+        help = 'Number of repeats',
+        default = 3
+    )
+
+    ## OUTPUT
+    parser.add_argument('-o', '--output',
+        type = str,
+        help = 'Filepath of results (JSON)',
+        default = None
+    )
+
+    ## COMPARE
+    parser.add_argument('-c', '--compare',
+        type = str,
+        help = 'Filepath of earlier results (JSON) to compare with',
+        default = None
+    )
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Create the synthetic data
+        raster_fpath = os.path.join(folder, "raster.tif")
+        lut_fpath = os.path.join(folder, "classes.txt")
+        points_fpath = os.path.join(folder, "points.csv")
+
+        create_synthetic_lut(lut_fpath)
+        create_synthetic_raster(raster_fpath, width = args.size, height = args.size, num_bands = args.bands, land_use_band = args.bands)
+        create_synthetic_points(points_fpath, raster_fpath)
+
+        results = []
+        for dimension in args.dimensions:
+            benchmarks = get_benchmarks(folder, raster_fpath, lut_fpath, points_fpath, dimension, args.bands)
+
+            for name, benchmark in benchmarks.items():
+                timings = time_benchmark(benchmark, args.repeats)
+                results.append({
+                    'benchmark': name,
+                    'dimension': dimension,
+                    'seconds': min(timings),
+                    'timings': timings
+                })
+                print("{:<30} {:>6} m: {:.4f} s".format(name, dimension, min(timings)))
+
+    output = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'parameters': {
+            'size': args.size,
+            'bands': args.bands,
+            'dimensions': args.dimensions,
+            'repeats': args.repeats
+        },
+        'results': results
+    }
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent = 2)
+
+    if args.compare is not None:
+        with open(args.compare) as compare_file:
+            compare_results(json.load(compare_file), output)
+
+def get_benchmarks(folder: str, raster_fpath: str, lut_fpath: str, points_fpath: str, dimension: int, num_bands: int) -> dict:
+    """Creates the benchmarks of the entry points for a tile dimension.
+
+    Args:
+        folder (str): Folder for the output of the benchmarks.
+        raster_fpath (str): Filepath of raster.
+        lut_fpath (str): Filepath of look-up table.
+        points_fpath (str): Filepath of point data.
+        dimension (int): Tile dimension (in metres).
+        num_bands (int): Number of bands (the last band is the land use band).
+
+    Returns:
+        dict: Benchmarks (functions without arguments) by name.
+    """
+    output_folder = os.path.join(folder, "output_{}".format(dimension))
+    tiles_folder = os.path.join(folder, "tiles_{}".format(dimension))
+    os.makedirs(output_folder, exist_ok = True)
+
+    def aggregate(engine):
+        # Run the entry point, as from the command line
+        sys.argv = [
+            'aggregate',
+            '-r', raster_fpath,
+            '-d', str(dimension),
+            '-o', output_folder,
+            '-lub', str(num_bands),
+            '-lut', lut_fpath,
+            '-p', points_fpath,
+            '-e', engine,
+            '-v', ''
+        ]
+        aggregating.main()
+
+    def tile():
+        tile_raster(raster_fpath, tiles_folder, dimension = dimension, padding = True, verbose = False)
+
+    def pad():
+        add_padding_to_raster(raster_fpath, os.path.join(folder, "padded.tif"), dimension = dimension, verbose = False)
+
+    def spectral_variance():
+        # Spectral variance of the first tile (written by the tile benchmark)
+        calculate_spectral_variance(os.path.join(tiles_folder, "tile_0-0.tif"))
+
+    return {
+        'aggregate (strip engine)': lambda: aggregate('strip'),
+        'aggregate (tile engine)': lambda: aggregate('tile'),
+        'tile_raster': tile,
+        'add_padding_to_raster': pad,
+        'calculate_spectral_variance': spectral_variance
+    }
+
+def time_benchmark(benchmark, repeats: int) -> list:
+    """Times a benchmark.
+
+    Args:
+        benchmark: Benchmark (function without arguments).
+        repeats (int): Number of repeats.
+
+    Returns:
+        list: Time (in seconds) of every repeat.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        benchmark()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+def get_commit() -> str:
+    """Gets the current git commit of the repository, if available.
+
+    Returns:
+        str: Commit hash (or None).
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd = os.path.dirname(os.path.abspath(__file__)),
+            capture_output = True,
+            text = True,
+            check = True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline: dict, current: dict) -> None:
+    """Prints the speedup of the current results compared with a baseline, per benchmark and dimension.
+
+    Args:
+        baseline (dict): Baseline results (JSON).
+        current (dict): Current results (JSON).
+    """
+    baseline_seconds = {(result['benchmark'], result['dimension']): result['seconds'] for result in baseline['results']}
+
+    print("\nCompared with commit {}:".format(baseline.get('commit')))
+    for result in current['results']:
+        key = (result['benchmark'], result['dimension'])
+        if key in baseline_seconds:
+            print("{:<30} {:>6} m: {:.4f} s -> {:.4f} s ({:.2f}x)".format(
+                key[0], key[1], baseline_seconds[key], result['seconds'], baseline_seconds[key] / result['seconds']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Generator of deterministic synthetic input data for the benchmarks: a multiband raster
+(with a land use band matching a look-up table, continuous thematic bands, and NaN and nodata regions),
+the look-up table, and a CSV file with pitfall-style point data.
+"""
+import numpy as np
+import pandas as pd
+
+import rasterio as rio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+# Land use classes of the look-up table (the first class is skipped by the aggregation)
+LAND_USE_CLASSES = ['clouds/shadows', 'urban', 'bare_soil', 'other_crops', 'trees', 'grassland', 'water']
+
+# Origin (top left) of the synthetic raster, in UTM coordinates
+ORIGIN = (500000, 4200000)
+
+def create_synthetic_lut(lut_fpath: str) -> None:
+    """Writes a look-up table (.txt) with the land use classes of the synthetic raster.
+
+    Args:
+        lut_fpath (str): Filepath of look-up table.
+    """
+    with open(lut_fpath, 'w') as lut_file:
+        lut_file.write("\n".join("{}={}".format(class_no, name) for class_no, name in enumerate(LAND_USE_CLASSES)))
+
+def create_synthetic_raster(raster_fpath: str, width: int = 1000, height: int = 1000, num_bands: int = 16, land_use_band: int = 16, resolution: float = 10, block_size: int = 256, seed: int = 0) -> None:
+    """Writes a deterministic synthetic raster (float32 GeoTIFF, internally tiled), strip by strip.
+
+    The thematic bands are smooth gradients with noise. The land use band contains the classes of
+    `create_synthetic_lut`, in patches. The top left corner is NaN in every band, and the second band
+    has a region of very negative nodata values (-3e38).
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        width (int, optional): Width (in pixels). Defaults to 1000.
+        height (int, optional): Height (in pixels). Defaults to 1000.
+        num_bands (int, optional): Number of bands. Defaults to 16.
+        land_use_band (int, optional): Band with land use classes. Defaults to 16.
+        resolution (float, optional): Spatial resolution (in metres). Defaults to 10.
+        block_size (int, optional): Size of internal blocks (in pixels). Defaults to 256.
+        seed (int, optional): Seed of random generator. Defaults to 0.
+    """
+    assert 1 <= land_use_band <= num_bands, "The land use band should be between 1 and {}.".format(num_bands)
+
+    profile = {
+        'driver': 'GTiff',
+        'width': width,
+        'height': height,
+        'count': num_bands,
+        'dtype': 'float32',
+        'crs': 'EPSG:32626',
+        'transform': from_origin(ORIGIN[0], ORIGIN[1], resolution, resolution),
+        'tiled': True,
+        'blockxsize': block_size,
+        'blockysize': block_size,
+        'compress': 'deflate'
+    }
+
+    # Band offsets and gradients, and land use patches of 50 x 50 pixels
+    rng = np.random.default_rng(seed)
+    band_offsets = rng.uniform(0, 1000, num_bands)
+    band_gradients = rng.uniform(-1, 1, (num_bands, 2))
+    land_use_patches = rng.integers(0, len(LAND_USE_CLASSES), (height // 50 + 1, width // 50 + 1))
+
+    with rio.open(raster_fpath, 'w', **profile) as raster:
+        for row_off in range(0, height, block_size):
+            rows = np.arange(row_off, min(row_off + block_size, height))
+            columns = np.arange(width)
+
+            # Thematic bands: gradient plus noise
+            strip_data = band_offsets[:, None, None] \
+                + band_gradients[:, 0, None, None] * rows[None, :, None] \
+                + band_gradients[:, 1, None, None] * columns[None, None, :] \
+                + rng.normal(0, 10, (num_bands, len(rows), width))
+            strip_data = strip_data.astype(np.float32)
+
+            # Land use band: patches of classes
+            strip_data[land_use_band - 1] = land_use_patches[rows // 50][:, columns // 50]
+
+            # NaN region (top left) and nodata region (second band)
+            strip_data[:, rows < height // 10, :width // 10] = np.nan
+            if num_bands > 1:
+                nodata_rows = (rows >= height // 2) & (rows < height // 2 + height // 20)
+                strip_data[1, nodata_rows, width // 2:width // 2 + width // 20] = -3e38
+
+            raster.write(strip_data, window = Window(col_off = 0, row_off = row_off, width = width, height = len(rows)))
+
+def create_synthetic_points(points_fpath: str, raster_fpath: str, num_points: int = 135, num_species: int = 28, seed: int = 0) -> None:
+    """Writes a deterministic CSV file with pitfall-style point data within the bounds of a raster.
+
+    Like the pitfall trap data, the CSV file has the coordinates in 'UTM E' and 'UTM N', metadata in
+    the first 30 columns and species counts in the last columns.
+
+    Args:
+        points_fpath (str): Filepath of CSV file.
+        raster_fpath (str): Filepath of raster.
+        num_points (int, optional): Number of points. Defaults to 135.
+        num_species (int, optional): Number of species (columns with counts). Defaults to 28.
+        seed (int, optional): Seed of random generator. Defaults to 0.
+    """
+    with rio.open(raster_fpath) as raster:
+        left, bottom, right, top = raster.bounds
+
+    rng = np.random.default_rng(seed)
+
+    points = {
+        'UTM E': rng.uniform(left, right, num_points),
+        'UTM N': rng.uniform(bottom, top, num_points),
+        'site': ["site_{}".format(point_no) for point_no in range(num_points)]
+    }
+
+    # Metadata columns, up to column 30
+    for column_no in range(len(points), 30):
+        points["metadata_{}".format(column_no)] = np.arange(num_points)
+
+    # Species counts
+    for species_no in range(num_species):
+        points["species_{}".format(species_no)] = rng.poisson(3, num_points)
+
+    pd.DataFrame(points).to_csv(points_fpath, index = False)
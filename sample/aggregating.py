@@ -1,21 +1,39 @@
 import argparse
+import json
 import math
 import os
 
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 import rasterio as rio
-from itertools import product, chain
+from itertools import product, chain, islice
 from rasterio.windows import Window
 from alive_progress import alive_bar
 
-from sample.pitfall import calculate_point_statistics_within_bounds
+from sample.pitfall import calculate_point_statistics_within_bounds, calculate_point_statistics_per_tile, read_point_data
+from sample.pitfall import get_point_statistic_names, get_tile_point_counts
 from sample.data_analysis import calculate_array_statistics, count_proportions_in_array
+from sample.data_analysis import split_array_into_tiles, count_tile_grid_classes, calculate_proportions_from_counts
+from sample.data_analysis import calculate_tile_grid_partials, merge_tile_grid_partials, calculate_statistics_from_partials
+from sample.data_analysis import create_histogram_bin_edges, calculate_tile_grid_histograms, parse_percentile, calculate_quantile_from_histograms
+from sample.data_analysis import calculate_standard_errors_from_partials
+from sample.data_analysis import cross_tabulate_tile_grid, calculate_class_means_from_partials
+from sample.helpers import read_land_use_classes, get_file_fingerprint
+from sample.results import ResultTable
+from sample.profiling import Profiler, get_profiler, set_profiler
+from sample.cache import TileCache, get_tile_cache_key
+from sample.filters import create_tile_filters, find_failed_filter, get_band_read_order, count_band_pixels
+from sample.raster import get_block_aligned_tile_rows, plan_block_aligned_reads, read_block_aligned_strips, count_decoded_bytes
+from sample.raster import read_decimated_window, build_missing_overviews, get_tile_grid_bounds, STRIP_HEIGHT
 
 # Define constants
 TOTAL_NUM_OF_TRAPS = 135
 
+# Dataset handle and settings of a worker process, set by `init_worker`
+_worker_state = {}
+
 def main():
     parser = argparse.ArgumentParser(
         description = """This command aggregates data from a raster file."""
@@ -45,6 +63,13 @@ def main():
         default="output/default.csv"
     )
 
+    ## OUTPUT FORMAT
+    parser.add_argument('-f', '--format',
+        choices = ['csv', 'parquet'],
+        help = 'Format of data table; Parquet tables are written to a subfolder per dimension',
+        default = 'csv'
+    )
+
     ## LAND USE BAND
     parser.add_argument('-lub', '--land-use-band',
         type = int,
@@ -58,6 +83,115 @@ def main():
         default='data/raw/classes.txt'
     )
 
+    ## POINT DATA
+    parser.add_argument('-p', '--points',
+        type = str,
+        help = 'Filepath to CSV file with point data (pitfall traps)',
+        default = 'data/raw/pitfall_TER.csv'
+    )
+
+    ## STATISTICS
+    parser.add_argument('-s', '--statistics',
+        nargs = '+',
+        help = 'Statistics of the thematic bands (mean, minimum, maximum, range, median, coefficient_of_variation, or percentiles like p5 and p95)',
+        default = ['mean']
+    )
+
+    ## HISTOGRAM BINS
+    parser.add_argument('-hb', '--histogram-bins',
+        type = int,
+        help = 'Number of histogram bins per band, used by the strip engine for the median and percentiles',
+        default = 256
+    )
+
+    ## ENGINE
+    parser.add_argument('-e', '--engine',
+        choices = ['strip', 'tile'],
+        help = 'Read whole row strips of tiles at once (strip), or each tile separately (tile)',
+        default = 'strip'
+    )
+
+    ## APPROXIMATE
+    parser.add_argument('-ap', '--approximate',
+        type = int,
+        help = 'Approximate the statistics from every n-th pixel in both directions (strip engine), and write their standard errors to a separate table',
+        default = None
+    )
+
+    ## APPROXIMATE SOURCE
+    parser.add_argument('-as', '--approximate-source',
+        choices = ['overview', 'subsample'],
+        help = 'Read the pixels of an approximation from an overview of the raster, which is built if it is missing (overview), or from the raster itself (subsample)',
+        default = 'overview'
+    )
+
+    ## CLASS MEANS
+    parser.add_argument('-cm', '--class-means',
+        action = 'store_true',
+        help = 'Include the mean of every thematic band per land use class (strip engine)'
+    )
+
+    ## WORKERS
+    parser.add_argument('-w', '--workers',
+        type = int,
+        help = 'Number of worker processes (each with its own dataset handle)',
+        default = 1
+    )
+
+    ## PROFILE
+    parser.add_argument('-pf', '--profile',
+        type = str,
+        help = 'Filepath of profiling report (JSON lines), with the time per stage, bytes read, skipped tiles and tiles per second',
+        default = None
+    )
+
+    ## PROMETHEUS
+    parser.add_argument('-pt', '--prometheus',
+        type = str,
+        help = 'Filepath of Prometheus textfile with the profile, updated during the run (requires --profile)',
+        default = None
+    )
+
+    ## CLOUD FRACTION
+    parser.add_argument('-cf', '--cloud-fraction',
+        type = float,
+        help = "Skip the tiles with at least this proportion of 'clouds/shadows' (default: only tiles that are all clouds)",
+        default = 1.0
+    )
+
+    ## MINIMUM NUMBER OF POINTS
+    parser.add_argument('-mp', '--min-points',
+        type = int,
+        help = 'Skip the tiles with fewer points (traps); these tiles are not read',
+        default = 1
+    )
+
+    ## VALIDITY MAP
+    parser.add_argument('-vm', '--validity-map',
+        action = 'store_true',
+        help = 'Read the land use band of all tiles first, and skip the empty and cloud-only tiles without reading their other bands (tile engine)'
+    )
+
+    ## CACHE
+    parser.add_argument('-ca', '--cache',
+        type = str,
+        help = 'Filepath of tile cache (SQLite); the results of tiles are reused by later runs on the same raster with the same parameters',
+        default = None
+    )
+
+    ## CACHE SIZE
+    parser.add_argument('-cs', '--cache-size',
+        type = float,
+        help = 'Maximum size of tile cache (in MB); the least recently used results are evicted',
+        default = 1000
+    )
+
+    ## RESUME
+    parser.add_argument('-rs', '--resume',
+        action = 'store_true',
+        help = 'Continue an interrupted run in the output folder, from the checkpoints in its manifest'
+    )
+
     ## VERBOSITY
     parser.add_argument('-v', '--verbose',
         help='Verbose output',
@@ -71,22 +205,94 @@ def main():
     ## Get the statistics of the thematic variables;
     ## Get the statistics of the Sentinel-2 bands.
 
-    # Open the raster
-    raster = rio.open(args.raster)
+    # Set up the profiler (disabled without --profile)
+    profiler = Profiler(report_fpath = args.profile, prometheus_fpath = args.prometheus, enabled = args.profile is not None)
+    set_profiler(profiler)
+
+    if args.approximate is not None:
+        assert args.approximate >= 1, "The decimation factor should be at least 1, not {}.".format(args.approximate)
+        assert args.engine == 'strip', "Only the strip engine can approximate the statistics."
+        assert not args.resume, "An approximation cannot be resumed; it is fast to run again."
+
+        # Build the overview to read the pixels from (as an external file, so the raster is not changed)
+        if args.approximate_source == 'overview' and args.approximate > 1:
+            if build_missing_overviews(args.raster, [args.approximate]) and args.verbose:
+                print("Built an overview of the raster with factor {}.".format(args.approximate))
+
+    if args.class_means:
+        assert args.engine == 'strip', "Only the strip engine can calculate the means per land use class."
+
+    # Open the raster (without overviews, to subsample the raster itself)
+    if args.approximate is not None and args.approximate_source == 'subsample':
+        raster = rio.open(args.raster, OVERVIEW_LEVEL = 'NONE')
+    else:
+        raster = rio.open(args.raster)
+
+    # The manifest identifies the input and parameters of the run, and keeps a checkpoint of every dimension
+    # NOTE: Readers of Parquet datasets skip files starting with an underscore, so the output folder can still be read as a single dataset.
+    manifest_fpath = os.path.join(args.output, "_manifest.json")
+    manifest = create_manifest(args)
+
+    if args.resume and os.path.exists(manifest_fpath):
+        earlier_manifest = read_manifest(manifest_fpath)
+
+        assert earlier_manifest['raster'] == manifest['raster'], "The raster has changed since the run that is resumed."
+        assert earlier_manifest['parameters'] == manifest['parameters'], "The parameters differ from those of the run that is resumed."
+
+        manifest['dimensions'] = earlier_manifest['dimensions']
+
+    write_manifest(manifest, manifest_fpath)
+
+    # Open the tile cache, and hash the content of the raster and the LUT (once per version of the files)
+    cache = None
+    if args.cache is not None:
+        cache = TileCache(args.cache, max_bytes = int(args.cache_size * 1e6))
+        raster_hash = cache.get_file_hash(args.raster)
+        cache_parameters = get_tile_cache_parameters(args, raster.count, cache.get_file_hash(args.lookup_table), cache.get_file_hash(args.points))
+
+    # Read the point data once
+    points = read_point_data(args.points)
+
+    # Declare the filters that skip tiles, which are evaluated on the cheapest input first
+    tile_filters = create_tile_filters(cloud_fraction = args.cloud_fraction, min_points = args.min_points)
+
+    # Get raster cell sizes
+    cell_size_x, cell_size_y = raster.res
+
+    # Calculate the tile size (in pixels) of each dimension
+    tile_sizes = {int(dimension): (int(int(dimension) / cell_size_x), int(int(dimension) / cell_size_y)) for dimension in args.dimension}
+
+    # Find the finest tile size that divides each tile size, so all dimensions can be calculated with one raster pass
+    base_tile_sizes = find_base_tile_sizes(tile_sizes.values())
+
+    # Create dictionary for storing the partial statistics of each base tile size
+    base_partials = {}
+
+    # The median and percentiles are estimated from mergeable histograms, with fixed bins per band
+    bin_edges = None
+    quantile_statistics = [statistic for statistic in args.statistics if statistic == 'median' or parse_percentile(statistic) is not None]
+    if args.engine == 'strip' and quantile_statistics:
+        bin_edges = create_histogram_bin_edges(*get_band_ranges(raster, factor = args.approximate or 1), num_bins = args.histogram_bins)
+
+        if args.verbose:
+            for band_no, band_bin_edges in enumerate(bin_edges, start = 1):
+                print("The median and percentiles of band {} are estimated within {:.4g} (one histogram bin).".format(
+                    band_no, band_bin_edges[1] - band_bin_edges[0]))
 
     # Loop through all dimensions
     for dimension in args.dimension:
         dimension = int(dimension)
 
-        # Get raster cell sizes
-        cell_size_x, cell_size_y = raster.res
+        # Checkpoint of the dimension: the number of tiles that are done, and the state of the output
+        checkpoint = manifest['dimensions'].get(str(dimension))
 
-        # Calculate tile size
-        tile_size_x = int(dimension / cell_size_x)
-        tile_size_y = int(dimension / cell_size_y)
+        if checkpoint is not None and checkpoint['complete']:
+            if args.verbose:
+                print("The tiles of {} metres are already done.".format(dimension))
+            continue
 
-        # Create the tile offsets
-        offsets = product(range(0, raster.meta['width'], tile_size_x), range(0, raster.meta['height'], tile_size_y))
+        # Get tile size
+        tile_size_x, tile_size_y = tile_sizes[dimension]
 
         # Calculate number of tiles necessary
         tiles_x = math.ceil(raster.width / tile_size_x)
@@ -103,49 +309,400 @@ def main():
         # Create counter variable for the amount of points (= traps) found, to verify its equal to total number of points
         total_points_encountered = 0
 
-        # Create empty Pandas DataFrame for storing our aggregated data
-        data_table = pd.DataFrame()
+        # Calculate the point statistics of all tiles at once
+        x_bounds, y_bounds = get_tile_grid_bounds(raster, tile_size_x, tile_size_y)
+        with profiler.stage('points'):
+            point_statistics = calculate_point_statistics_per_tile(points, x_bounds, y_bounds, verbose = args.verbose)
+        point_counts = get_tile_point_counts(point_statistics, tiles_x, tiles_y)
 
-        with alive_bar(total_num_tiles) as bar:
-            for index, (col_off, row_off) in enumerate(offsets):
-                bar()
+        # Skip the tiles that are done
+        num_tiles_done = 0
+        if checkpoint is not None:
+            num_tiles_done = checkpoint['tiles']
 
-                result = create_virtual_tile_data(
-                    col_off = col_off,
-                    row_off = row_off,
+            if args.verbose:
+                print("Resuming after {} of {} tiles.".format(num_tiles_done, total_num_tiles))
+
+        # Look up the results of the (remaining) tiles in the cache
+        cached_results = {}
+        if cache is not None:
+            offsets = list(product(range(0, raster.width, tile_size_x), range(0, raster.height, tile_size_y)))[num_tiles_done:]
+            tile_keys = {
+                offset: get_tile_cache_key(raster_hash, (*offset, tile_size_x, tile_size_y), cache_parameters)
+                for offset in offsets
+            }
+            cached_results = cache.get_many(tile_keys)
+
+            profiler.count('cache_hits', len(cached_results))
+            profiler.count('cache_misses', len(offsets) - len(cached_results))
+
+            if args.verbose:
+                print("{} of {} tiles are found in the cache.".format(len(cached_results), len(offsets)))
+
+        if cache is not None and len(cached_results) == len(offsets) and args.approximate is None:
+            # All results are cached, so the raster is not read (an approximation reads it for the standard errors)
+            tile_data = ((offset, cached_results[offset]) for offset in offsets)
+        elif args.engine == 'strip':
+            base_size_x, base_size_y = base_tile_sizes[(tile_size_x, tile_size_y)]
+            factor = (tile_size_x // base_size_x, tile_size_y // base_size_y)
+
+            # Roll up the histograms to all dimensions with this base tile size while reading, so they are not kept per base tile
+            histogram_factors = None
+            if bin_edges is not None:
+                histogram_factors = [
+                    (size_x // base_size_x, size_y // base_size_y) for (size_x, size_y), base_tile_size in base_tile_sizes.items()
+                    if base_tile_size == (base_size_x, base_size_y)
+                ]
+
+            # Read the raster only for the first dimension with this base tile size
+            if (base_size_x, base_size_y) not in base_partials and args.approximate is not None:
+                base_partials[(base_size_x, base_size_y)] = create_approximate_tile_grid_partials(
                     raster = raster,
-                    tile_width = tile_size_x,
-                    tile_height = tile_size_y
+                    tile_width = base_size_x,
+                    tile_height = base_size_y,
+                    factor = args.approximate,
+                    land_use_band = args.land_use_band,
+                    lut_fpath = args.lookup_table,
+                    bin_edges = bin_edges,
+                    class_means = args.class_means,
+                    histogram_factors = histogram_factors,
+                    quantile_statistics = quantile_statistics,
+                    tile_filters = tile_filters
                 )
-
-                bounds, result_points = get_virtual_tile_point_date(
-                    col_off = col_off,
-                    row_off = row_off,
+            elif (base_size_x, base_size_y) not in base_partials:
+                base_partials[(base_size_x, base_size_y)] = create_tile_grid_partials(
                     raster = raster,
-                    tile_width = tile_size_x,
-                    tile_height = tile_size_y
+                    tile_width = base_size_x,
+                    tile_height = base_size_y,
+                    land_use_band = args.land_use_band,
+                    lut_fpath = args.lookup_table,
+                    bin_edges = bin_edges,
+                    workers = args.workers,
+                    class_means = args.class_means,
+                    histogram_factors = histogram_factors,
+                    quantile_statistics = quantile_statistics,
+                    tile_filters = tile_filters
+                )
+
+                if args.verbose:
+                    tile_decoded_bytes, strip_decoded_bytes = get_decoded_bytes(raster, base_size_x, base_size_y)
+                    print("Reading block-aligned strips decodes {:.1f} MB instead of {:.1f} MB ({:.1f} MB saved).".format(
+                        strip_decoded_bytes / 1e6, tile_decoded_bytes / 1e6, (tile_decoded_bytes - strip_decoded_bytes) / 1e6))
+            elif args.verbose:
+                print("Rolling up the statistics of {} x {} pixel tiles.".format(base_size_x, base_size_y))
+
+            # Merge the partial statistics of the base tiles into the tiles of this dimension
+            with profiler.stage('merge'):
+                partials = merge_tile_grid_partials(
+                    {name: values for name, values in base_partials[(base_size_x, base_size_y)].items() if name != 'quantiles'},
+                    factor_x = factor[0],
+                    factor_y = factor[1]
+                )
+
+            # The median and percentiles of this dimension are estimated already
+            if 'quantiles' in base_partials[(base_size_x, base_size_y)]:
+                partials['quantiles'] = base_partials[(base_size_x, base_size_y)]['quantiles'][factor]
+
+            tile_data = create_tile_data_from_partials(
+                partials = partials,
+                tile_width = tile_size_x,
+                tile_height = tile_size_y,
+                land_use_band = args.land_use_band,
+                lut_fpath = args.lookup_table,
+                included_statistics = args.statistics,
+                bin_edges = bin_edges,
+                verbose = args.verbose,
+                tile_filters = tile_filters,
+                point_counts = point_counts
+            )
+
+            # NOTE: The strip engine calculates all tiles at once, so the tiles that are done are only skipped here.
+            tile_data = islice(tile_data, num_tiles_done, None)
+
+            # Estimate the standard errors of the approximation
+            if args.approximate is not None:
+                standard_errors = calculate_standard_errors_from_partials(
+                    partials,
+                    sampling_fraction = get_tile_sampling_fractions(raster, tile_size_x, tile_size_y, args.approximate)
                 )
+        else:
+            # Find the tiles that are skipped by the checks of the land use band, before reading any other band
+            skipped_tiles = None
+            valid_tile_proportions = None
+            if args.validity_map:
+                with profiler.stage('validity map'):
+                    skipped_tiles, valid_tile_proportions = create_tile_validity_map(
+                        raster = raster,
+                        tile_width = tile_size_x,
+                        tile_height = tile_size_y,
+                        land_use_band = args.land_use_band,
+                        lut_fpath = args.lookup_table,
+                        tile_filters = tile_filters
+                    )
+
+                if args.verbose:
+                    print("The validity map skips {} of {} tiles.".format(len(skipped_tiles), total_num_tiles))
+
+            tile_data = create_virtual_tile_grid_data(
+                raster = raster,
+                tile_width = tile_size_x,
+                tile_height = tile_size_y,
+                land_use_band = args.land_use_band,
+                lut_fpath = args.lookup_table,
+                included_statistics = args.statistics,
+                verbose = args.verbose,
+                workers = args.workers,
+                skip_tiles = num_tiles_done,
+                cached_results = cached_results,
+                skipped_tiles = skipped_tiles,
+                tile_filters = tile_filters,
+                point_counts = point_counts,
+                land_use_proportions = valid_tile_proportions
+            )
+
+        # Store the results that are not cached yet
+        if cache is not None:
+            tile_data = cache_tile_data(tile_data, cache, tile_keys, cached_results)
+
+        # Create table for storing our aggregated data, which is written to the output in chunks
+        if args.format == 'parquet':
+            # NOTE: The subfolders partition the tables by dimension, and can be read as a single dataset.
+            table_fpath = os.path.join(args.output, "dimension={}".format(dimension))
+        else:
+            table_fpath = os.path.join(args.output, "dimension_{}.csv".format(dimension))
+
+        columns = get_tile_data_columns(
+            num_bands = raster.count,
+            land_use_band = args.land_use_band,
+            lut_fpath = args.lookup_table,
+            point_statistic_names = get_point_statistic_names(points),
+            included_statistics = args.statistics,
+            class_means = args.class_means
+        )
+
+        # Store the checkpoint after every chunk of rows is written: all tiles up to the current tile are done
+        def store_checkpoint(table, complete = False):
+            manifest['dimensions'][str(dimension)] = {
+                'tiles': num_tiles_done,
+                **table.get_checkpoint(),
+                'complete': complete
+            }
+            write_manifest(manifest, manifest_fpath)
+
+        data_table = ResultTable(
+            columns,
+            fpath = table_fpath,
+            file_format = args.format,
+            bounds_columns = ('x1', 'y1', 'x2', 'y2'),
+            crs = raster.crs,
+            checkpoint = checkpoint,
+            on_flush = store_checkpoint
+        )
+
+        # Create table for the standard errors of an approximation, with the same columns (without the point statistics)
+        error_table = None
+        if args.approximate is not None:
+            if args.format == 'parquet':
+                # NOTE: The folder starts with an underscore, so it is not part of the dataset of the output folder.
+                error_table_fpath = os.path.join(args.output, "_errors", "dimension={}".format(dimension))
+            else:
+                error_table_fpath = os.path.join(args.output, "dimension_{}_errors.csv".format(dimension))
+
+            point_statistic_names = get_point_statistic_names(points)
+            error_table = ResultTable(
+                {name: dtype for name, dtype in columns.items() if name not in point_statistic_names},
+                fpath = error_table_fpath,
+                file_format = args.format,
+                bounds_columns = ('x1', 'y1', 'x2', 'y2'),
+                crs = raster.crs
+            )
+
+        with data_table, alive_bar(total_num_tiles - num_tiles_done) as bar:
+            for (col_off, row_off), result in tile_data:
+                bar()
+                profiler.count('tiles')
+                profiler.update()
 
-                # If the result returns False or if there are no points found, continue
-                if result == False or not result_points:
+                # If the result returns False, continue
+                if result == False:
+                    num_tiles_done += 1
                     continue
 
+                # Look up the points found within the tile (tiles without points are skipped by the filters)
+                tile_x, tile_y = col_off // tile_size_x, row_off // tile_size_y
+                result_points = point_statistics[(tile_x, tile_y)]
+
+                bounds = {
+                    'x1': int(x_bounds[tile_x, 0]),
+                    'x2': int(x_bounds[tile_x, 1]),
+                    'y1': int(y_bounds[tile_y, 0]),
+                    'y2': int(y_bounds[tile_y, 1])
+                }
+
                 # Combine the dictionaries into single dictionary
                 combined = {**bounds, **result, **result_points}
 
                 # Add dictionary as row to data table
-                data_table = data_table.append(combined, ignore_index = True)
+                with profiler.stage('append'):
+                    data_table.append(combined)
+
+                    if error_table is not None:
+                        error_table.append({**bounds, **get_tile_standard_errors(
+                            standard_errors, tile_x, tile_y, raster.count, args.land_use_band, args.lookup_table, args.statistics)})
+
+                # NOTE: A tile is only done once its row is appended, as every checkpoint counts the done tiles.
+                num_tiles_done += 1
+                profiler.count('tiles_written')
+
+        store_checkpoint(data_table, complete = True)
+
+        if error_table is not None:
+            error_table.close()
+
+        profiler.report(dimension = dimension, engine = args.engine, workers = args.workers)
 
         # assert total_points_encountered == TOTAL_NUM_OF_TRAPS, "Only {} points out of {} points".format(
         #     total_points_encountered, TOTAL_NUM_OF_TRAPS
         # )
 
-        csv_fpath = os.path.join(args.output, "dimension_{}.csv".format(dimension))
-        data_table.to_csv(csv_fpath)
+    if cache is not None:
+        if args.verbose:
+            print("The hit rate of the tile cache is {:.1%} ({:.1f} MB stored).".format(cache.get_hit_rate(), cache.get_size() / 1e6))
+
+        cache.close()
+
+def create_manifest(args) -> dict:
+    """Creates the manifest of a run: the fingerprints of the input files, the parameters that the output depends on,
+    and (empty) checkpoints of the dimensions.
+
+    Args:
+        args: Arguments of the command.
+
+    Returns:
+        dict: Manifest.
+    """
+    return {
+        'raster': get_file_fingerprint(args.raster),
+        'parameters': {
+            # NOTE: The statistics of the engines differ slightly (in rounding, and for very negative values), so their rows should not end up in the same table.
+            'engine': args.engine,
+            'land_use_band': args.land_use_band,
+            'lookup_table': get_file_fingerprint(args.lookup_table),
+            'points': get_file_fingerprint(args.points),
+            'statistics': args.statistics,
+            'class_means': args.class_means,
+            'histogram_bins': args.histogram_bins,
+            'cloud_fraction': args.cloud_fraction,
+            'min_points': args.min_points,
+            'approximate': args.approximate,
+            'approximate_source': args.approximate_source,
+            'format': args.format
+        },
+        'dimensions': {}
+    }
+
+def get_tile_cache_parameters(args, num_bands: int, lut_hash: str, points_hash: str) -> str:
+    """Describes the parameters that the result of a tile depends on (besides the raster and its window), for use in cache keys.
+
+    Args:
+        args: Arguments of the command.
+        num_bands (int): Number of bands of the raster.
+        lut_hash (str): Hash of the content of the LUT.
+        points_hash (str): Hash of the content of the point data (the tiles with too few points are skipped).
+
+    Returns:
+        str: Parameters (JSON).
+    """
+    parameters = {
+        'engine': args.engine,
+        'num_bands': num_bands,
+        'land_use_band': args.land_use_band,
+        'lookup_table': lut_hash,
+        'points': points_hash,
+        'statistics': args.statistics,
+        'cloud_fraction': args.cloud_fraction,
+        'min_points': args.min_points
+    }
+
+    # An approximation depends on the pixels that are read
+    if args.approximate is not None:
+        parameters['approximate'] = args.approximate
+        parameters['approximate_source'] = args.approximate_source
+
+    # The strip engine estimates the median and percentiles from histograms, and can include the means per land use class
+    if args.engine == 'strip':
+        parameters['histogram_bins'] = args.histogram_bins
+
+        if args.class_means:
+            parameters['class_means'] = True
+
+    return json.dumps(parameters, sort_keys = True)
+
+def cache_tile_data(tile_data, cache: TileCache, tile_keys: dict, cached_results: dict, batch_size: int = 1000):
+    """Passes on the results of tiles, and stores those that are not cached yet in the cache (in batches).
+
+    Args:
+        tile_data: Tile offsets (col_off, row_off) and results, as yielded by the engines.
+        cache (TileCache): Tile cache.
+        tile_keys (dict): Cache keys (value) by tile offsets (key).
+        cached_results (dict): Results (value) that are found in the cache, by tile offsets (key).
+        batch_size (int, optional): Number of results stored at once. Defaults to 1000.
+
+    Yields:
+        tuple: Tile offsets (col_off, row_off) and results.
+    """
+    new_results = {}
+
+    for offset, result in tile_data:
+        if offset not in cached_results:
+            new_results[tile_keys[offset]] = result
+
+            if len(new_results) >= batch_size:
+                cache.put_many(new_results)
+                new_results = {}
+
+        yield offset, result
+
+    cache.put_many(new_results)
+
+def read_manifest(manifest_fpath: str) -> dict:
+    """Reads the manifest of a run (JSON).
+
+    Args:
+        manifest_fpath (str): Filepath of manifest.
+
+    Returns:
+        dict: Manifest.
+    """
+    with open(manifest_fpath) as manifest_file:
+        return json.load(manifest_file)
+
+def write_manifest(manifest: dict, manifest_fpath: str) -> None:
+    """Writes the manifest of a run (JSON), replacing the earlier manifest at once.
 
-def create_virtual_tile_data(col_off, row_off, raster, tile_width, tile_height, land_use_band: int = 16, verbose = True) -> dict:
+    Args:
+        manifest (dict): Manifest.
+        manifest_fpath (str): Filepath of manifest.
+    """
+    # The output folder may not exist yet (e.g. when the manifest is written before the first table)
+    os.makedirs(os.path.dirname(manifest_fpath) or ".", exist_ok = True)
+
+    temporary_fpath = manifest_fpath + ".tmp"
+
+    with open(temporary_fpath, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent = 2)
+
+    os.replace(temporary_fpath, manifest_fpath)
+
+def create_virtual_tile_data(col_off, row_off, raster, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", included_statistics: list = ['mean'], verbose = True, tile_filters: list = None, land_use_proportions: dict = None) -> dict:
     """Creates a dictionary with statistic values for a specified tile in a raster.
 
+    The land use band is read first, so the filters on it (e.g. 'clouds/shadows') skip the tile before any
+    thematic band is read; the filters on every band skip the tile as soon as a band fails.
+    If the land use proportions are known already (see `create_tile_validity_map`), the land use band is not read.
+
+    NOTE: This reads and reduces the tile band by band; `create_tile_grid_data` gives (nearly) the same values much faster.
+
     Args:
         col_off (int): Column offset.   
         row_off (int): Row offset.
@@ -153,53 +710,62 @@ def create_virtual_tile_data(col_off, row_off, raster, tile_width, tile_height,
         tile_width (int): Tile width.
         tile_height (int): Tile width. 
         land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean'].
         verbose (bool, optional): Verbosity. Defaults to True.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`. Defaults to the default filters.
+        land_use_proportions (dict, optional): Land use proportions of the tile, of which the land use band passed the filters already. Defaults to None.
 
     Returns:
         dict: Statistics.
     """
+    profiler = get_profiler()
+
+    if tile_filters is None:
+        tile_filters = create_tile_filters()
+
     # Set window
     window = Window(col_off = col_off, row_off = row_off, width = tile_width, height = tile_height)
 
-    # Create empty dictionary for land use proportions
-    land_use_proportions = {}
-    
     # Create empty dictionary for band statistics
     statistics = {}
 
-    # Loop through all bands for the tile
-    for band_no in range(1, raster.count + 1):
-        # Read band data
-        band_data = raster.read(band_no, boundless = False, window = window, fill_value = np.NaN)
+    # Loop through all bands for the tile, starting with the land use band
+    for band_no in get_band_read_order(raster.count, land_use_band):
+        # Use the known land use proportions, instead of reading the land use band again
+        if band_no == land_use_band and land_use_proportions is not None:
+            statistics = {**land_use_proportions, **statistics}
+            continue
 
-        # If all values in the band are NaN, skip this tile
-        if np.isnan(band_data).all():
-            if verbose:
-                print("Tile ({},{}) only contains NaN values.".format(col_off, row_off))
-            return False
+        # Read band data
+        with profiler.stage('read'):
+            band_data = raster.read(band_no, boundless = False, window = window, fill_value = np.nan)
+        profiler.count('bytes_read', band_data.nbytes)
 
-        # If all values are very negative, skip this tile
-        # NOTE: With (supposedly) rasterio, the NaN values are assigned the largest possible negative value
-        if np.all(band_data < -10_000_000):
-            if verbose:
-                print("The data in tile {} has only negative values.".format(window))
-            return False
+        # If the band fails a filter (e.g. all values are NaN), skip this tile
+        reason = find_failed_filter(tile_filters, 'band', band_data)
 
         # For the land use band, count proportions instad of array statistics
-        if band_no == land_use_band:
+        if reason is None and band_no == land_use_band:
             # Get land use proportions
-            land_use_proportions = count_proportions_in_array(band_data, "data/raw/classes.txt")
+            with profiler.stage('land use proportions'):
+                land_use_proportions = count_proportions_in_array(band_data, lut_fpath)
 
-            # If the tile only consists of the class 'clouds/shadows', skip this tile
-            if land_use_proportions['clouds/shadows'] == 1:
-                if verbose:
-                    print("This tile has only clouds and/or shadows, and is therefore skipped.")
-                return False
+            # If the proportions fail a filter (e.g. the tile only consists of 'clouds/shadows'), skip this tile
+            reason = find_failed_filter(tile_filters, 'land use', land_use_proportions)
 
+        if reason is not None:
+            if verbose:
+                print("Tile ({},{}) is skipped ({}).".format(col_off, row_off, reason))
+            profiler.count('tiles_skipped', reason = reason)
+            return False
+
+        if band_no == land_use_band:
             statistics = {**land_use_proportions, **statistics}
             continue
 
-        tile_statistics = calculate_array_statistics(band_data)
+        with profiler.stage('band statistics'):
+            tile_statistics = calculate_array_statistics(band_data, included_statistics)
         temp = "band {} - ".format(band_no)
 
         if tile_statistics:
@@ -209,11 +775,877 @@ def create_virtual_tile_data(col_off, row_off, raster, tile_width, tile_height,
 
     return statistics
 
-def get_virtual_tile_point_date(raster, col_off, row_off, tile_width, tile_height):
-    """[summary]
+def create_virtual_tile_grid_data(raster, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", included_statistics: list = ['mean'], verbose = True, workers: int = 1, skip_tiles: int = 0, cached_results: dict = None, skipped_tiles: dict = None, tile_filters: list = None, point_counts: np.ndarray = None, land_use_proportions: dict = None):
+    """Creates dictionaries with statistic values for all tiles in a raster, using `create_virtual_tile_data`.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean'].
+        verbose (bool, optional): Verbosity. Defaults to True.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        skip_tiles (int, optional): Number of tiles to skip (in the order of the offsets), e.g. because they are done. Defaults to 0.
+        cached_results (dict, optional): Results (value) by tile offsets (key) that are known already, and are not calculated again. Defaults to None.
+        skipped_tiles (dict, optional): Skip reasons (value) by tile offsets (key) of tiles that are known to be skipped,
+            as given by `create_tile_validity_map`; these tiles are not read. Defaults to None.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`. Defaults to the default filters.
+        point_counts (np.ndarray, optional): Number of points per tile (tiles_y, tiles_x), for the filters on points;
+            the tiles that fail these are not read. Defaults to None (no filters on points).
+        land_use_proportions (dict, optional): Land use proportions (value) by tile offsets (key) of tiles of which the land use band
+            passed the filters already, as given by `create_tile_validity_map`; their land use band is not read again. Defaults to None.
+
+    Yields:
+        tuple: Tile offsets (col_off, row_off) and statistics (or False, if the tile should be skipped).
+    """
+    # Create the tile offsets
+    offsets = list(product(range(0, raster.width, tile_width), range(0, raster.height, tile_height)))[skip_tiles:]
+
+    profiler = get_profiler()
+
+    if tile_filters is None:
+        tile_filters = create_tile_filters()
+
+    # Calculate only the tiles without a known result, that are not known to be skipped
+    if cached_results is None:
+        cached_results = {}
+    if skipped_tiles is None:
+        skipped_tiles = {}
+    if land_use_proportions is None:
+        land_use_proportions = {}
+
+    # The filters on points come first, as they need no raster data
+    if point_counts is not None:
+        skipped_tiles = dict(skipped_tiles)
+        for col_off, row_off in offsets:
+            reason = find_failed_filter(tile_filters, 'points', point_counts[row_off // tile_height, col_off // tile_width])
+            if reason is not None:
+                skipped_tiles[(col_off, row_off)] = reason
+    new_offsets = [offset for offset in offsets if offset not in cached_results and offset not in skipped_tiles]
+
+    def calculate_new_tiles():
+        if workers > 1:
+            # Split the offsets in batches, a few per worker
+            batch_size = max(1, math.ceil(len(new_offsets) / (workers * 4)))
+            batches = [new_offsets[i:i + batch_size] for i in range(0, len(new_offsets), batch_size)]
+
+            # NOTE: The results are returned in the order of the batches, so the output is equal to a serial run.
+            with ProcessPoolExecutor(workers, initializer = init_worker, initargs = (raster.name, land_use_band, lut_fpath, verbose, profiler.enabled)) as executor:
+                batch_results = executor.map(
+                    create_virtual_tile_data_in_worker,
+                    [(batch, tile_width, tile_height, included_statistics, tile_filters, [land_use_proportions.get(offset) for offset in batch]) for batch in batches]
+                )
+
+                # NOTE: The 'workers' stage is the time waiting for the workers; their own stages and counters are merged into the profiler.
+                for _ in batches:
+                    with profiler.stage('workers'):
+                        results, profile = next(batch_results)
+                    profiler.merge(profile)
+                    yield from results
+        else:
+            for col_off, row_off in new_offsets:
+                yield create_virtual_tile_data(
+                    col_off = col_off,
+                    row_off = row_off,
+                    raster = raster,
+                    tile_width = tile_width,
+                    tile_height = tile_height,
+                    land_use_band = land_use_band,
+                    lut_fpath = lut_fpath,
+                    included_statistics = included_statistics,
+                    verbose = verbose,
+                    tile_filters = tile_filters,
+                    land_use_proportions = land_use_proportions.get((col_off, row_off))
+                )
+
+    # Yield the known and calculated results in the order of the offsets
+    new_results = calculate_new_tiles()
+    for offset in offsets:
+        if offset in cached_results:
+            yield offset, cached_results[offset]
+        elif offset in skipped_tiles:
+            if verbose:
+                print("Tile ({},{}) is skipped ({}).".format(*offset, skipped_tiles[offset]))
+            profiler.count('tiles_skipped', reason = skipped_tiles[offset])
+            yield offset, False
+        else:
+            yield offset, next(new_results)
+
+    # Shut down the workers
+    new_results.close()
+
+def create_tile_grid_data(raster, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", verbose = True):
+    """Creates dictionaries with statistic values for all tiles in a raster.
+
+    The raster is read in row strips of tiles, with all bands at once, and each strip is reduced in a single NumPy pass.
+    The tiles, the skipped tiles and the land use proportions are those of `create_virtual_tile_data`, but the band statistics
+    can differ, as the statistics are calculated as 64-bit floats here, and as 32-bit floats (the data type of the raster) there:
+    - the statistics differ by up to about 1e-3 (mostly the means and coefficients of variation, whose sums are accumulated differently);
+    - the median and percentiles are estimated from histograms (within one bin), without the very negative (nodata) values.
+    For tiles with very negative (nodata) values, e.g. -3e38, the 32-bit statistics of `create_virtual_tile_data` overflow:
+    - the mean is -inf if the sum of these values overflows, where it is the (very negative) mean here;
+    - the minimum and range are -inf and inf (when rounded), where they are the very negative minimum and its range here;
+    - the coefficient of variation is NaN, where it is a (meaningless) number here.
+    The maximum is equal, as tiles with only very negative values in a band are skipped.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        verbose (bool, optional): Verbosity. Defaults to True.
+
+    Yields:
+        tuple: Tile offsets (col_off, row_off) and statistics (or False, if the tile should be skipped).
+    """
+    partials = create_tile_grid_partials(
+        raster = raster,
+        tile_width = tile_width,
+        tile_height = tile_height,
+        land_use_band = land_use_band,
+        lut_fpath = lut_fpath
+    )
+
+    yield from create_tile_data_from_partials(
+        partials = partials,
+        tile_width = tile_width,
+        tile_height = tile_height,
+        land_use_band = land_use_band,
+        lut_fpath = lut_fpath,
+        verbose = verbose
+    )
+
+def create_tile_grid_partials(raster, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", bin_edges: np.ndarray = None, workers: int = 1, class_means: bool = False, histogram_factors: list = None, quantile_statistics: list = None, tile_filters: list = None) -> dict:
+    """Creates mergeable partial statistics for all tiles in a raster, reading the raster in row strips of tiles.
+
+    The partials can be merged into the partials of any multiple of the tile size with `merge_tile_grid_partials`.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        bin_edges (np.ndarray, optional): Bin edges of the band histograms; if given, histograms are included. Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        class_means (bool, optional): Whether to cross-tabulate the bands by land use class. Defaults to False.
+        histogram_factors (list, optional): Factors (x, y) to roll up the histograms to while reading, instead of keeping them (see `stack_strip_partials`). Defaults to None.
+        quantile_statistics (list, optional): Median and percentiles to estimate from the rolled-up histograms. Defaults to None.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`, to count the pixels of. Defaults to the default filters.
+
+    Returns:
+        dict: Partial statistics with shape (..., tiles_y, tiles_x).
+    """
+    profiler = get_profiler()
+
+    # Calculate the number of tile rows per strip (so strips start at block boundaries, if possible)
+    tile_rows = get_block_aligned_tile_rows(tile_height, raster.block_shapes[0][0], STRIP_HEIGHT)
+
+    # Get the number of land use classes
+    num_classes = len(read_land_use_classes(lut_fpath))
+
+    # Calculate the partials for each strip
+    strip_offsets = range(0, raster.height, tile_rows * tile_height)
+
+    def calculate_strips():
+        if workers > 1:
+            # NOTE: The results are returned in the order of the strips, so the output is equal to a serial run.
+            with ProcessPoolExecutor(workers, initializer = init_worker, initargs = (raster.name, land_use_band, lut_fpath, False, profiler.enabled)) as executor:
+                strip_results = executor.map(
+                    create_tile_strip_partials_in_worker,
+                    [(row_off, tile_width, tile_height, tile_rows, bin_edges, class_means, tile_filters) for row_off in strip_offsets]
+                )
+
+                # NOTE: The 'workers' stage is the time waiting for the workers; their own stages and counters are merged into the profiler.
+                for _ in strip_offsets:
+                    with profiler.stage('workers'):
+                        partials, profile = next(strip_results)
+                    profiler.merge(profile)
+                    yield partials
+        else:
+            # NOTE: Every internal block is decoded once, also if the strips are not aligned to the blocks.
+            for row_off, strip_data in read_block_aligned_strips(raster, tile_rows * tile_height):
+                yield create_tile_strip_partials(
+                    raster = raster,
+                    row_off = row_off,
+                    tile_width = tile_width,
+                    tile_height = tile_height,
+                    tile_rows = tile_rows,
+                    land_use_band = land_use_band,
+                    num_classes = num_classes,
+                    bin_edges = bin_edges,
+                    strip_data = strip_data,
+                    class_means = class_means,
+                    tile_filters = tile_filters
+                )
+
+    # Stack the strips along the tile rows, as they are calculated
+    return stack_strip_partials(calculate_strips(), bin_edges, histogram_factors, quantile_statistics)
+
+def create_approximate_tile_grid_partials(raster, tile_width, tile_height, factor: int, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", bin_edges: np.ndarray = None, class_means: bool = False, histogram_factors: list = None, quantile_statistics: list = None, tile_filters: list = None) -> dict:
+    """Creates mergeable partial statistics for all tiles in a raster, like `create_tile_grid_partials`, from every n-th pixel
+    in both directions (see `read_decimated_window`). If the raster has an overview with this factor, it is read instead.
+
+    The partials describe the sampled pixels; their standard errors can be estimated with `calculate_standard_errors_from_partials`.
 
     Args:
-        raster ([type]): [description]
+        raster ([type]): Raster.
+        tile_width (int): Tile width (a multiple of the factor).
+        tile_height (int): Tile height (a multiple of the factor).
+        factor (int): Decimation factor.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        bin_edges (np.ndarray, optional): Bin edges of the band histograms; if given, histograms are included. Defaults to None.
+        class_means (bool, optional): Whether to cross-tabulate the bands by land use class. Defaults to False.
+        histogram_factors (list, optional): Factors (x, y) to roll up the histograms to while reading, instead of keeping them (see `stack_strip_partials`). Defaults to None.
+        quantile_statistics (list, optional): Median and percentiles to estimate from the rolled-up histograms. Defaults to None.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`, to count the pixels of. Defaults to the default filters.
+
+    Returns:
+        dict: Partial statistics with shape (..., tiles_y, tiles_x).
+    """
+    assert tile_width % factor == 0 and tile_height % factor == 0, \
+        "The tile size ({} x {} pixels) should be a multiple of the decimation factor ({}).".format(tile_width, tile_height, factor)
+
+    profiler = get_profiler()
+
+    # Get the number of land use classes
+    num_classes = len(read_land_use_classes(lut_fpath))
+
+    # Read strips of whole tile rows (of at least the strip height, after decimation)
+    tile_rows = max(1, STRIP_HEIGHT * factor // tile_height)
+
+    def calculate_strips():
+        for row_off in range(0, raster.height, tile_rows * tile_height):
+            # Set window, clipped to the raster
+            strip_height = min(tile_rows * tile_height, raster.height - row_off)
+            window = Window(col_off = 0, row_off = row_off, width = raster.width, height = strip_height)
+
+            with profiler.stage('read'):
+                strip_data = read_decimated_window(raster, window, factor)
+            profiler.count('bytes_read', strip_data.nbytes)
+
+            # The tiles of the sampled pixels are the tiles of the raster
+            yield create_tile_strip_partials(
+                raster = raster,
+                row_off = row_off,
+                tile_width = tile_width // factor,
+                tile_height = tile_height // factor,
+                tile_rows = tile_rows,
+                land_use_band = land_use_band,
+                num_classes = num_classes,
+                bin_edges = bin_edges,
+                strip_data = strip_data,
+                class_means = class_means,
+                tile_filters = tile_filters
+            )
+
+    # Stack the strips along the tile rows, as they are calculated
+    return stack_strip_partials(calculate_strips(), bin_edges, histogram_factors, quantile_statistics)
+
+def stack_strip_partials(strips, bin_edges: np.ndarray = None, histogram_factors: list = None, quantile_statistics: list = None) -> dict:
+    """Stacks the partial statistics of row strips of tiles along the tile rows.
+
+    The histograms (bands x bins per tile) are much larger than the other partials. If histogram factors are given,
+    they are therefore not kept: the histograms of every strip are rolled up to the tiles of each factor right away,
+    and as soon as a row of these tiles is complete, its median and percentiles are estimated. These are stored by
+    factor and statistic as 'quantiles', so only the histograms of one row of tiles per factor are kept in memory.
+
+    Args:
+        strips: Partial statistics of the strips, in order, as created by `create_tile_strip_partials`.
+        bin_edges (np.ndarray, optional): Bin edges of the histograms. Defaults to None.
+        histogram_factors (list, optional): Factors (x, y) of the tiles to estimate the quantiles of (e.g. (1, 1) for the tiles of the strips). Defaults to None (keep the histograms).
+        quantile_statistics (list, optional): Median and percentiles (e.g. 'p5') to estimate. Defaults to None.
+
+    Returns:
+        dict: Partial statistics with shape (..., tiles_y, tiles_x), and the 'quantiles' (dict) by factor and statistic with shape (bands, tiles_y, tiles_x) of the factor.
+    """
+    # Quantiles of the statistics, as fractions
+    quantiles = {statistic: 0.5 if statistic == 'median' else parse_percentile(statistic) / 100 for statistic in quantile_statistics or []}
+
+    stacked = {}
+
+    # Histograms of the current row of tiles of each factor, and the quantiles of the completed rows
+    row_histograms = {}
+    row_quantiles = {factor: {statistic: [] for statistic in quantiles} for factor in histogram_factors or []}
+
+    def complete_row(factor):
+        histograms = row_histograms.pop(factor)[1]
+        for statistic, quantile in quantiles.items():
+            row_quantiles[factor][statistic].append(calculate_quantile_from_histograms(histograms, bin_edges, quantile))
+
+    tile_row = 0
+    for strip in strips:
+        if histogram_factors is not None and 'histogram' in strip:
+            histograms = strip.pop('histogram')
+
+            for factor_x, factor_y in histogram_factors:
+                # Merge the columns of the tiles, and add the rows to the rows of the tiles
+                merged = merge_tile_grid_partials({'histogram': histograms}, factor_x, 1)['histogram']
+
+                for strip_row in range(merged.shape[-2]):
+                    merged_row = (tile_row + strip_row) // factor_y
+
+                    if (factor_x, factor_y) in row_histograms and row_histograms[(factor_x, factor_y)][0] != merged_row:
+                        complete_row((factor_x, factor_y))
+
+                    if (factor_x, factor_y) not in row_histograms:
+                        row_histograms[(factor_x, factor_y)] = (merged_row, np.zeros(merged.shape[:-2] + merged.shape[-1:], dtype = np.int64))
+                    row_histograms[(factor_x, factor_y)][1][...] += merged[..., strip_row, :]
+
+        for name, values in strip.items():
+            stacked.setdefault(name, []).append(values)
+
+        tile_row += strip['count'].shape[-2]
+
+    # Complete the last rows (which may be clipped to the raster)
+    for factor in list(row_histograms):
+        complete_row(factor)
+
+    partials = {name: np.concatenate(values, axis = -2) for name, values in stacked.items()}
+
+    if histogram_factors is not None:
+        partials['quantiles'] = {
+            factor: {statistic: np.stack(rows, axis = -2) for statistic, rows in statistics.items()}
+            for factor, statistics in row_quantiles.items()
+        }
+
+    return partials
+
+def get_tile_sampling_fractions(raster, tile_width, tile_height, factor: int) -> np.ndarray:
+    """Calculates the fraction of the pixels of every tile that an approximation samples (see `read_decimated_window`).
+
+    Every block of n x n pixels is sampled by one pixel, so the fraction is 1 / n^2, except for the tiles at the right and bottom
+    edge of the raster: the rows and columns after their last whole block are sampled by one extra row and column.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width (a multiple of the factor).
+        tile_height (int): Tile height (a multiple of the factor).
+        factor (int): Decimation factor.
+
+    Returns:
+        np.ndarray: Sampling fractions with shape (tiles_y, tiles_x).
+    """
+    # Width and height of every column and row of tiles, clipped to the raster
+    widths = np.minimum(tile_width, raster.width - np.arange(0, raster.width, tile_width))
+    heights = np.minimum(tile_height, raster.height - np.arange(0, raster.height, tile_height))
+
+    # Number of sampled columns and rows
+    sampled_widths = np.ceil(widths / factor)
+    sampled_heights = np.ceil(heights / factor)
+
+    return np.outer(sampled_heights, sampled_widths) / np.outer(heights, widths)
+
+def get_tile_standard_errors(standard_errors: dict, tile_x: int, tile_y: int, num_bands: int, land_use_band: int, lut_fpath: str, included_statistics: list = ['mean']) -> dict:
+    """Creates a dictionary with the standard errors of the statistics of a tile, named like the statistics.
+
+    Only the mean and the land use proportions have a standard error; the other statistics are NaN.
+
+    Args:
+        standard_errors (dict): Standard errors, as estimated by `calculate_standard_errors_from_partials`.
+        tile_x (int): Tile column.
+        tile_y (int): Tile row.
+        num_bands (int): Number of raster bands.
+        land_use_band (int): Raster band with land use classes.
+        lut_fpath (str): Filepath of LookUp-Table (.txt).
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean'].
+
+    Returns:
+        dict: Standard errors.
+    """
+    # Land use proportions
+    errors = dict(zip(read_land_use_classes(lut_fpath).values(), standard_errors['proportions'][:, tile_y, tile_x]))
+
+    # Band statistics
+    for band_no in range(1, num_bands + 1):
+        if band_no == land_use_band:
+            continue
+
+        for statistic in included_statistics:
+            errors["band {} - {}".format(band_no, statistic)] = \
+                standard_errors['mean'][band_no - 1, tile_y, tile_x] if statistic == 'mean' else np.nan
+
+    return errors
+
+def get_decoded_bytes(raster, tile_width, tile_height) -> tuple:
+    """Counts the bytes of internal blocks that are decoded when reading each tile separately (as the tile engine does),
+    and when reading block-aligned strips of tiles (as `create_tile_grid_partials` does).
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+
+    Returns:
+        tuple: Number of decoded bytes when reading each tile separately, and when reading block-aligned strips.
+    """
+    # Windows of the tiles
+    tile_windows = [
+        Window(col_off = col_off, row_off = row_off, width = tile_width, height = tile_height)
+        for col_off, row_off in product(range(0, raster.width, tile_width), range(0, raster.height, tile_height))
+    ]
+
+    # Windows of the block-aligned reads
+    tile_rows = get_block_aligned_tile_rows(tile_height, raster.block_shapes[0][0], STRIP_HEIGHT)
+    strip_windows = plan_block_aligned_reads(raster, tile_rows * tile_height)
+
+    return count_decoded_bytes(raster, tile_windows), count_decoded_bytes(raster, strip_windows)
+
+def get_band_ranges(raster, factor: int = 1) -> tuple:
+    """Finds the minimum and maximum of every band, reading the raster in row strips.
+
+    NaN values and very negative values (see `create_virtual_tile_data`) are ignored. With a decimation factor,
+    only the pixels that an approximation reads are used (see `read_decimated_window`), as its histograms only count these.
+
+    Args:
+        raster ([type]): Raster.
+        factor (int, optional): Decimation factor. Defaults to 1 (all pixels).
+
+    Returns:
+        tuple: Minimum and maximum of every band.
+    """
+    minimum = np.full(raster.count, np.nan)
+    maximum = np.full(raster.count, np.nan)
+
+    # Read strips of (at least) the strip height, after decimation
+    strip_height = STRIP_HEIGHT * factor
+
+    for row_off in range(0, raster.height, strip_height):
+        window = Window(col_off = 0, row_off = row_off, width = raster.width, height = min(strip_height, raster.height - row_off))
+        if factor > 1:
+            strip_data = read_decimated_window(raster, window, factor).astype(np.float64)
+        else:
+            strip_data = raster.read(window = window).astype(np.float64)
+
+        # Ignore the very negative values
+        strip_data[strip_data < -10_000_000] = np.nan
+
+        minimum = np.fmin(minimum, np.fmin.reduce(strip_data, axis = (1, 2)))
+        maximum = np.fmax(maximum, np.fmax.reduce(strip_data, axis = (1, 2)))
+
+    # Bands without any values get a dummy range
+    return np.nan_to_num(minimum), np.nan_to_num(maximum)
+
+def create_tile_strip_partials(raster, row_off, tile_width, tile_height, tile_rows: int = 1, land_use_band: int = 16, num_classes: int = 1, bin_edges: np.ndarray = None, strip_data: np.ndarray = None, class_means: bool = False, tile_filters: list = None) -> dict:
+    """Creates mergeable partial statistics for a row strip of tiles in a raster.
+
+    Next to the partials of `calculate_tile_grid_partials` for every band, these are included:
+    'filter_counts' (number of pixels per band that each filter on bands counts, see `count_band_pixels`), 'class_counts' (number
+    of pixels per land use class), 'class_total' (number of non-negative land use pixels), if bin edges
+    are given, 'histogram' (histogram of every band) and, if class means are included, 'class_band_count' and
+    'class_band_sum' (see `cross_tabulate_tile_grid`).
+
+    Args:
+        raster ([type]): Raster.
+        row_off (int): Row offset of the strip.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        tile_rows (int, optional): Number of tile rows in the strip. Defaults to 1.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        num_classes (int, optional): Number of land use classes. Defaults to 1.
+        bin_edges (np.ndarray, optional): Bin edges of the band histograms. Defaults to None.
+        strip_data (np.ndarray, optional): Data of the strip, if it is already read. Defaults to None.
+        class_means (bool, optional): Whether to cross-tabulate the bands by land use class. Defaults to False.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`. Defaults to the default filters.
+
+    Returns:
+        dict: Partial statistics with shape (..., tiles_y, tiles_x).
+    """
+    profiler = get_profiler()
+
+    if tile_filters is None:
+        tile_filters = create_tile_filters()
+
+    if strip_data is None:
+        # Set window, clipped to the raster
+        strip_height = min(tile_rows * tile_height, raster.height - row_off)
+        window = Window(col_off = 0, row_off = row_off, width = raster.width, height = strip_height)
+
+        # Read all bands of the strip at once
+        with profiler.stage('read'):
+            strip_data = raster.read(window = window)
+        profiler.count('bytes_read', strip_data.nbytes)
+
+    # Reshape to (bands, tiles_y, tile_height, tiles_x, tile_width), padding the edge tiles with NaN
+    tiles = split_array_into_tiles(strip_data, tile_width, tile_height)
+
+    # Keep track of which pixels are padding
+    padding = np.isnan(split_array_into_tiles(np.zeros(strip_data.shape[-2:], dtype = np.float32), tile_width, tile_height))
+
+    # Calculate the partial statistics of all bands at once
+    with profiler.stage('band statistics'):
+        partials = calculate_tile_grid_partials(tiles)
+
+        # Count the pixels that the filters on bands count (e.g. that are not NaN), so the filters can be evaluated on the merged tiles
+        band_filters = [tile_filter for tile_filter in tile_filters if tile_filter.source == 'band']
+        if band_filters:
+            partials['filter_counts'] = np.stack([
+                count_band_pixels(tile_filter, tiles, axis = (-3, -1), padding = padding) for tile_filter in band_filters
+            ])
+        else:
+            partials['filter_counts'] = np.zeros((0,) + partials['count'].shape, dtype = np.int64)
+
+    # For the land use band, count the classes
+    with profiler.stage('land use proportions'):
+        partials['class_counts'], partials['class_total'] = count_tile_grid_classes(tiles[land_use_band - 1], num_classes)
+
+    # Count the values of every band into histograms, for the median and percentiles
+    if bin_edges is not None:
+        with profiler.stage('histograms'):
+            partials['histogram'] = calculate_tile_grid_histograms(tiles, bin_edges)
+
+    # Sum and count the values of every band per land use class, for the class means
+    if class_means:
+        with profiler.stage('class means'):
+            partials.update(cross_tabulate_tile_grid(tiles, tiles[land_use_band - 1], num_classes))
+
+    return partials
+
+def create_tile_data_from_partials(partials: dict, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", included_statistics: list = ['mean'], bin_edges: np.ndarray = None, verbose = True, tile_filters: list = None, point_counts: np.ndarray = None):
+    """Creates dictionaries with statistic values for all tiles in a grid, using partial statistics.
+
+    If the partials include the cross-tabulation of the bands by land use class, the mean of every band per class is included as well
+    (e.g. 'band 1 - mean urban').
+
+    Args:
+        partials (dict): Partial statistics, as created by `create_tile_grid_partials`.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean'].
+        bin_edges (np.ndarray, optional): Bin edges of the histograms, for the median and percentiles. Defaults to None.
+        verbose (bool, optional): Verbosity. Defaults to True.
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`. Defaults to the default filters.
+        point_counts (np.ndarray, optional): Number of points per tile (tiles_y, tiles_x), for the filters on points. Defaults to None (no filters on points).
+
+    Yields:
+        tuple: Tile offsets (col_off, row_off) and statistics (or False, if the tile should be skipped).
+    """
+    profiler = get_profiler()
+
+    num_bands, tiles_y, tiles_x = partials['count'].shape
+
+    if tile_filters is None:
+        tile_filters = create_tile_filters()
+
+    # For the land use band, calculate proportions instead of band statistics
+    with profiler.stage('land use proportions'):
+        land_use_proportions = calculate_proportions_from_counts(partials['class_counts'], partials['class_total'], lut_fpath)
+
+    # Find the reason to skip each tile (if any), as `create_virtual_tile_data` evaluates the filters
+    skip_reasons = find_tile_skip_reasons(partials, land_use_proportions, tile_filters, land_use_band, point_counts)
+
+    # Count the skipped tiles by reason
+    if profiler.enabled:
+        reasons, counts = np.unique(skip_reasons[skip_reasons != None].astype(str), return_counts = True)
+        for reason, count in zip(reasons, counts):
+            profiler.count('tiles_skipped', int(count), reason = str(reason))
+
+    # Calculate the statistics of all bands at once
+    with profiler.stage('band statistics'):
+        band_statistics = calculate_statistics_from_partials(partials, included_statistics, bin_edges)
+
+    # Calculate the means of all bands per land use class at once
+    class_means = None
+    if 'class_band_sum' in partials:
+        with profiler.stage('class means'):
+            class_means = calculate_class_means_from_partials(partials)
+            land_use_classes = list(read_land_use_classes(lut_fpath).values())
+
+    # Return the results in the same order as the tile offsets
+    for (tile_x, tile_y) in product(range(tiles_x), range(tiles_y)):
+        offset = (tile_x * tile_width, tile_y * tile_height)
+
+        if skip_reasons[tile_y, tile_x] is not None:
+            if verbose:
+                print("Tile ({},{}) is skipped ({}).".format(*offset, skip_reasons[tile_y, tile_x]))
+            yield offset, False
+            continue
+
+        statistics = {name: proportions[tile_y, tile_x] for name, proportions in land_use_proportions.items()}
+
+        for band_no in range(1, num_bands + 1):
+            if band_no == land_use_band:
+                continue
+
+            for key, val in band_statistics.items():
+                statistics["band {} - ".format(band_no) + key] = val[band_no - 1, tile_y, tile_x]
+
+            if class_means is not None:
+                for class_index, land_use_class in enumerate(land_use_classes):
+                    statistics["band {} - mean {}".format(band_no, land_use_class)] = class_means[band_no - 1, class_index, tile_y, tile_x]
+
+        yield offset, statistics
+
+def create_tile_validity_map(raster, tile_width, tile_height, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", tile_filters: list = None) -> tuple:
+    """Finds the tiles that `create_virtual_tile_data` skips because of their land use band, by reading only that band.
+
+    The filters are the same (see `create_tile_filters`), and so are the reasons, as `create_virtual_tile_data`
+    checks the land use band first. As the land use band is read in row strips aligned to its internal blocks,
+    finding these tiles costs a single band, instead of reading the land use band of every tile separately.
+    The land use proportions of the other tiles are returned as well, so their land use band is not read again.
+
+    NOTE: An overview or the dataset mask would be cheaper to read, but a sample of the pixels cannot tell whether all pixels
+    of a tile are NaN or 'clouds/shadows', so the skip reasons would differ from those of `create_virtual_tile_data`.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        tile_filters (list, optional): Tile filters, as created by `create_tile_filters`. Defaults to the default filters.
+
+    Returns:
+        tuple: Skip reasons (value) by tile offsets (col_off, row_off) (key) of the skipped tiles, and land use proportions (value)
+            by tile offsets (key) of the other tiles.
+    """
+    profiler = get_profiler()
+
+    if tile_filters is None:
+        tile_filters = create_tile_filters()
+
+    num_classes = len(read_land_use_classes(lut_fpath))
+
+    # Read strips of whole tile rows, aligned to the internal blocks of the land use band
+    tile_rows = get_block_aligned_tile_rows(tile_height, raster.block_shapes[land_use_band - 1][0], STRIP_HEIGHT)
+
+    skipped_tiles = {}
+    valid_tile_proportions = {}
+
+    for row_off in range(0, raster.height, tile_rows * tile_height):
+        # Set window, clipped to the raster
+        strip_height = min(tile_rows * tile_height, raster.height - row_off)
+        window = Window(col_off = 0, row_off = row_off, width = raster.width, height = strip_height)
+
+        with profiler.stage('read'):
+            strip_data = raster.read(land_use_band, window = window)
+        profiler.count('bytes_read', strip_data.nbytes)
+
+        # Count the land use classes of all tiles of the strip at once
+        tiles = split_array_into_tiles(strip_data, tile_width, tile_height)
+        land_use_proportions = calculate_proportions_from_counts(*count_tile_grid_classes(tiles, num_classes), lut_fpath)
+
+        for tile_y, tile_x in product(range(tiles.shape[0]), range(tiles.shape[2])):
+            # The filters on the band, on the (clipped) tile
+            tile_data = strip_data[tile_y * tile_height:(tile_y + 1) * tile_height, tile_x * tile_width:(tile_x + 1) * tile_width]
+            reason = find_failed_filter(tile_filters, 'band', tile_data)
+
+            # The filters on the land use proportions
+            if reason is None:
+                tile_proportions = {name: proportions[tile_y, tile_x] for name, proportions in land_use_proportions.items()}
+                reason = find_failed_filter(tile_filters, 'land use', tile_proportions)
+
+            offset = (tile_x * tile_width, row_off + tile_y * tile_height)
+            if reason is not None:
+                skipped_tiles[offset] = reason
+            else:
+                valid_tile_proportions[offset] = tile_proportions
+
+    return skipped_tiles, valid_tile_proportions
+
+def find_tile_skip_reasons(partials: dict, land_use_proportions: dict, tile_filters: list, land_use_band: int = 16, point_counts: np.ndarray = None) -> np.ndarray:
+    """Finds the reason to skip each tile of a grid, using partial statistics.
+
+    The reason is that of the first filter that fails, in the order of `create_virtual_tile_data`: the filters on points,
+    then the filters on the land use band and its proportions, then the filters on the thematic bands, band by band.
+    The filters on bands are evaluated on the pixel counts of the partials ('filter_counts'), which should be created with the same filters.
+
+    Args:
+        partials (dict): Partial statistics, as created by `create_tile_grid_partials`.
+        land_use_proportions (dict): Land use names (key) and arrays with proportions (value) with shape (tiles_y, tiles_x).
+        tile_filters (list): Tile filters, as created by `create_tile_filters`.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        point_counts (np.ndarray, optional): Number of points per tile (tiles_y, tiles_x). Defaults to None (no filters on points).
+
+    Returns:
+        np.ndarray: Skip reason of every tile, or None if the tile passes (tiles_y, tiles_x).
+    """
+    num_bands, tiles_y, tiles_x = partials['count'].shape
+
+    # The pixel counts of the filters on bands, in the order of the filters
+    band_filters = [tile_filter for tile_filter in tile_filters if tile_filter.source == 'band']
+    assert len(band_filters) == len(partials['filter_counts']), \
+        "The partials are created with {} filters on bands, not {}.".format(len(partials['filter_counts']), len(band_filters))
+
+    # Create the checks (reason and failing tiles) in the order of evaluation
+    checks = []
+
+    if point_counts is not None:
+        checks += [(f.reason, f.predicate(point_counts, f.threshold)) for f in tile_filters if f.source == 'points']
+
+    for band_no in get_band_read_order(num_bands, land_use_band):
+        checks += [(f.reason, f.predicate(counts[band_no - 1], f.threshold)) for f, counts in zip(band_filters, partials['filter_counts'])]
+
+        if band_no == land_use_band:
+            checks += [(f.reason, f.predicate(land_use_proportions, f.threshold)) for f in tile_filters if f.source == 'land use']
+
+    # The first check that fails gives the reason
+    skip_reasons = np.full((tiles_y, tiles_x), None, dtype = object)
+
+    for reason, fails in reversed(checks):
+        skip_reasons[fails] = reason
+
+    return skip_reasons
+
+def init_worker(raster_fpath: str, land_use_band: int, lut_fpath: str, verbose: bool, profile: bool = False) -> None:
+    """Opens the dataset handle and reads the LUT of a worker process, once per process.
+
+    Args:
+        raster_fpath (str): Filepath to raster.
+        land_use_band (int): Raster band with land use classes.
+        lut_fpath (str): Filepath of LookUp-Table (.txt).
+        verbose (bool): Verbosity.
+        profile (bool, optional): Whether to profile the tasks, so their profiles can be merged into the profiler of the parent process. Defaults to False.
+    """
+    _worker_state['raster'] = rio.open(raster_fpath)
+    _worker_state['land_use_band'] = land_use_band
+    _worker_state['lut_fpath'] = lut_fpath
+    _worker_state['num_classes'] = len(read_land_use_classes(lut_fpath))
+    _worker_state['verbose'] = verbose
+    _worker_state['profile'] = profile
+
+def create_tile_strip_partials_in_worker(task: tuple) -> dict:
+    """Creates the partial statistics of a row strip of tiles in a worker process.
+
+    Args:
+        task (tuple): Row offset, tile width, tile height, number of tile rows of the strip, histogram bin edges, whether to include the class means and the tile filters.
+
+    Returns:
+        tuple: Partial statistics, as created by `create_tile_strip_partials`, and the profile of the task (see `Profiler.get_state`).
+    """
+    row_off, tile_width, tile_height, tile_rows, bin_edges, class_means, tile_filters = task
+
+    # Profile each task separately, so its stages and counters are merged into the parent process once
+    profiler = Profiler(enabled = _worker_state['profile'])
+    set_profiler(profiler)
+
+    partials = create_tile_strip_partials(
+        raster = _worker_state['raster'],
+        row_off = row_off,
+        tile_width = tile_width,
+        tile_height = tile_height,
+        tile_rows = tile_rows,
+        land_use_band = _worker_state['land_use_band'],
+        num_classes = _worker_state['num_classes'],
+        bin_edges = bin_edges,
+        class_means = class_means,
+        tile_filters = tile_filters
+    )
+
+    return partials, profiler.get_state()
+
+def create_virtual_tile_data_in_worker(task: tuple) -> list:
+    """Creates the statistics of a batch of tiles in a worker process, using `create_virtual_tile_data`.
+
+    Args:
+        task (tuple): Tile offsets (col_off, row_off), tile width, tile height, statistics of the thematic bands, tile filters
+            and the known land use proportions of each tile (or None).
+
+    Returns:
+        tuple: Statistics (or False, if the tile should be skipped) for each tile, and the profile of the task (see `Profiler.get_state`).
+    """
+    offsets, tile_width, tile_height, included_statistics, tile_filters, tile_land_use_proportions = task
+
+    # Profile each task separately, so its stages and counters are merged into the parent process once
+    profiler = Profiler(enabled = _worker_state['profile'])
+    set_profiler(profiler)
+
+    results = [
+        create_virtual_tile_data(
+            col_off = col_off,
+            row_off = row_off,
+            raster = _worker_state['raster'],
+            tile_width = tile_width,
+            tile_height = tile_height,
+            land_use_band = _worker_state['land_use_band'],
+            lut_fpath = _worker_state['lut_fpath'],
+            included_statistics = included_statistics,
+            verbose = _worker_state['verbose'],
+            tile_filters = tile_filters,
+            land_use_proportions = proportions
+        ) for (col_off, row_off), proportions in zip(offsets, tile_land_use_proportions)
+    ]
+
+    return results, profiler.get_state()
+
+def get_tile_data_columns(num_bands: int, land_use_band: int, lut_fpath: str, point_statistic_names: list, included_statistics: list = ['mean'], class_means: bool = False) -> dict:
+    """Creates the column schema of the aggregated data table, in the order of the output.
+
+    Args:
+        num_bands (int): Number of raster bands.
+        land_use_band (int): Raster band with land use classes.
+        lut_fpath (str): Filepath of LookUp-Table (.txt).
+        point_statistic_names (list): Names of the point statistics, as given by `get_point_statistic_names`.
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean'].
+        class_means (bool, optional): Whether the means of the thematic bands per land use class are included. Defaults to False.
+
+    Returns:
+        dict: Column names (key) and NumPy data types (value).
+    """
+    # Bounding box
+    columns = {name: np.int64 for name in ['x1', 'x2', 'y1', 'y2']}
+
+    # Land use proportions
+    columns.update({name: np.float64 for name in read_land_use_classes(lut_fpath).values()})
+
+    # Band statistics
+    for band_no in range(1, num_bands + 1):
+        if band_no != land_use_band:
+            columns.update({"band {} - {}".format(band_no, statistic): np.float64 for statistic in included_statistics})
+
+            if class_means:
+                columns.update({"band {} - mean {}".format(band_no, land_use_class): np.float64 for land_use_class in read_land_use_classes(lut_fpath).values()})
+
+    # Point statistics
+    columns.update({name: np.int64 if name == "number of points" else np.float64 for name in point_statistic_names})
+
+    return columns
+
+def find_base_tile_sizes(tile_sizes) -> dict:
+    """Finds, for each tile size, the finest of the tile sizes that divides it.
+
+    Example:
+        For the tile sizes (50, 50), (100, 100), (200, 200) and (75, 75), the base tile sizes are
+        (50, 50) for the first three, and (75, 75) for the last one.
+
+    Args:
+        tile_sizes (list): Tile sizes (width, height) in pixels.
+
+    Returns:
+        dict: Tile size (key) and base tile size (value).
+    """
+    base_tile_sizes = {}
+
+    for tile_size in sorted(set(tile_sizes)):
+        # Use the first (finest) base that divides the tile size, or make it a base itself
+        base_tile_sizes[tile_size] = next(
+            (base for base in base_tile_sizes.values() if tile_size[0] % base[0] == 0 and tile_size[1] % base[1] == 0),
+            tile_size
+        )
+
+    return base_tile_sizes
+
+def get_virtual_tile_point_date(raster, col_off, row_off, tile_width, tile_height, point_csv_fpath: str = "data/raw/pitfall_TER.csv"):
+    """Creates the bounding box of a tile, and the statistics of the points found within it.
+
+    NOTE: This reads the point data for every tile; `calculate_point_statistics_per_tile` does all tiles at once.
+
+    Args:
+        raster ([type]): Raster.
+        col_off (int): Column offset.
+        row_off (int): Row offset.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+        point_csv_fpath (str, optional): Filepath to CSV file with point data. Defaults to "data/raw/pitfall_TER.csv".
+
+    Returns:
+        tuple: Bounding box (dict) and point statistics (dict).
     """
     # Calculate the number of tiles that fit in the raster
     tiles_x = math.ceil(raster.width / tile_width)
@@ -238,7 +1670,7 @@ def get_virtual_tile_point_date(raster, col_off, row_off, tile_width, tile_heigh
 
     result = calculate_point_statistics_within_bounds(
         bounding_box,
-        point_csv_fpath = "data/raw/pitfall_TER.csv"
+        point_csv_fpath = point_csv_fpath
     )
 
     names = ['x1', 'x2', 'y1', 'y2']
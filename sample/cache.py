@@ -0,0 +1,186 @@
+"""
+Module for a persistent cache of tile results across runs, in a single SQLite file.
+
+The results are addressed by content: the key of a tile combines the hash of the raster's content, the window of the tile,
+and the parameters its result depends on, so a result is reused by any run on the same data, whatever its output.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+
+class TileCache:
+    """Stores compressed tile results by key, and evicts the least recently used results above a maximum size.
+
+    Example:
+        >>> with TileCache('cache/tiles.sqlite', max_bytes = 500_000_000) as cache:
+        ...     results = cache.get_many({(0, 0): 'key of tile'})
+        ...     cache.put_many({'key of tile': {'band_1_mean': 10.5}})
+
+    Args:
+        fpath (str): Filepath of cache (SQLite).
+        max_bytes (int, optional): Maximum size of the stored results (in bytes, compressed). Defaults to 1_000_000_000.
+    """
+    def __init__(self, fpath: str, max_bytes: int = 1_000_000_000):
+        assert max_bytes > 0, "The maximum size should be positive, not {}.".format(max_bytes)
+
+        self.fpath = fpath
+        self.max_bytes = max_bytes
+
+        # Number of results found and not found
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(fpath)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed INTEGER)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS file_hashes (fingerprint TEXT PRIMARY KEY, hash TEXT)")
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_many(self, keys: dict) -> dict:
+        """Looks up results, and marks them as recently used.
+
+        Args:
+            keys (dict): Cache keys (value) by name (key), e.g. by tile offsets.
+
+        Returns:
+            dict: Results (value) by name (key), of the keys that are found.
+        """
+        names = {key: name for name, key in keys.items()}
+        results = {}
+
+        # Look up the keys in batches (SQLite limits the number of parameters)
+        key_list = list(names)
+        for batch_start in range(0, len(key_list), 500):
+            batch = key_list[batch_start:batch_start + 500]
+            rows = self._connection.execute(
+                "SELECT key, value FROM results WHERE key IN ({})".format(",".join("?" * len(batch))), batch
+            ).fetchall()
+
+            for key, value in rows:
+                results[names[key]] = pickle.loads(zlib.decompress(value))
+
+            # Mark the results as recently used
+            self._connection.executemany(
+                "UPDATE results SET accessed = ? WHERE key = ?", [(time.time_ns(), key) for key, _ in rows]
+            )
+
+        self._connection.commit()
+
+        self.hits += len(results)
+        self.misses += len(keys) - len(results)
+
+        return results
+
+    def put_many(self, results: dict) -> None:
+        """Stores results, and evicts the least recently used results if the cache is larger than its maximum size.
+
+        Args:
+            results (dict): Results (value) by cache key (key).
+        """
+        rows = []
+        for key, result in results.items():
+            value = zlib.compress(pickle.dumps(result, protocol = pickle.HIGHEST_PROTOCOL))
+            rows.append((key, value, len(value), time.time_ns()))
+
+        self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        self._connection.commit()
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used results, until the stored results fit the maximum size."""
+        total_bytes = self.get_size()
+        if total_bytes <= self.max_bytes:
+            return
+
+        evicted_keys = []
+        for key, size in self._connection.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total_bytes <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            total_bytes -= size
+
+        self._connection.executemany("DELETE FROM results WHERE key = ?", evicted_keys)
+        self._connection.commit()
+
+    def get_size(self) -> int:
+        """Returns the size of the stored results (in bytes, compressed)."""
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get_hit_rate(self) -> float:
+        """Returns the fraction of the looked up results that were found (NaN if nothing is looked up)."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else float('nan')
+
+    def get_file_hash(self, fpath: str) -> str:
+        """Hashes the content of a file. The hash is stored by the path, size and modification time of the file,
+        so a large raster is only read again if it has changed.
+
+        Args:
+            fpath (str): Filepath.
+
+        Returns:
+            str: Hash (hexadecimal).
+        """
+        file_stat = os.stat(fpath)
+        fingerprint = json.dumps([os.path.abspath(fpath), file_stat.st_size, file_stat.st_mtime_ns])
+
+        row = self._connection.execute("SELECT hash FROM file_hashes WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is not None:
+            return row[0]
+
+        file_hash = hash_file(fpath)
+
+        self._connection.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?)", (fingerprint, file_hash))
+        self._connection.commit()
+
+        return file_hash
+
+    def close(self) -> None:
+        """Closes the cache."""
+        self._connection.close()
+
+def hash_file(fpath: str, chunk_size: int = 16 * 1024 * 1024) -> str:
+    """Hashes the content of a file (BLAKE2b), reading it in chunks.
+
+    Args:
+        fpath (str): Filepath.
+        chunk_size (int, optional): Number of bytes read at once. Defaults to 16 MiB.
+
+    Returns:
+        str: Hash (hexadecimal).
+    """
+    file_hash = hashlib.blake2b(digest_size = 20)
+
+    with open(fpath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+def get_tile_cache_key(raster_hash: str, window: tuple, parameters: str) -> str:
+    """Creates the cache key of a tile: a hash of the raster's content, the window of the tile and the parameters.
+
+    Args:
+        raster_hash (str): Hash of the raster's content (see `TileCache.get_file_hash`).
+        window (tuple): Window of the tile (col_off, row_off, width, height).
+        parameters (str): Parameters that the result of the tile depends on (JSON).
+
+    Returns:
+        str: Cache key (hexadecimal).
+    """
+    return hashlib.blake2b(
+        json.dumps([raster_hash, [int(value) for value in window], parameters]).encode(), digest_size = 20
+    ).hexdigest()
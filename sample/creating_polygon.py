@@ -5,6 +5,8 @@ import pandas as pd
 from shapely.geometry import mapping, Polygon
 import fiona
 
+from sample.results import read_table
+
 def main():
     parser = argparse.ArgumentParser(
         description = """This command creates a polygon using the extent coordinates from a CSV file."""
@@ -13,7 +15,7 @@ def main():
     ## INPUT
     parser.add_argument('-d', '--data',
         type = str,
-        help = 'Filepath to data (CSV)'
+        help = 'Filepath to data (CSV, or Parquet file or folder)'
     )
 
     ## INPUT
@@ -32,8 +34,8 @@ def main():
 
     args = parser.parse_args()
 
-    # Read CSV file into Pandas DataFrame
-    data_table = pd.read_csv(args.data)
+    # Read the bounds from the data table into Pandas DataFrame
+    data_table = read_table(args.data, columns = ["x1", "x2", "y1", "y2"])
 
     # Extract bounds from row with specified index
     left = data_table.iloc[args.index:,]["x1"].values[0]
@@ -1,9 +1,11 @@
 from re import M, VERBOSE
+import re
 import rasterio as rio
 import numpy as np
 
 import os
 import math
+import warnings
 
 from osgeo import gdal
 
@@ -223,4 +225,597 @@ def calculate_array_statistics(
 
     final_statistics = {k: v for k, v in statistic_names.items() if v is not None}
 
-    return final_statistics
\ No newline at end of file
+    return final_statistics
+
+def split_array_into_tiles(data: np.ndarray, tile_width: int, tile_height: int) -> np.ndarray:
+    """Splits an array into a grid of tiles, padding the edges with NaN.
+
+    Args:
+        data (NumPy.array): Array with shape (..., rows, columns).
+        tile_width (int): Tile width (in pixels).
+        tile_height (int): Tile height (in pixels).
+
+    Returns:
+        NumPy.array: View with shape (..., tiles_y, tile_height, tiles_x, tile_width).
+    """
+    rows, columns = data.shape[-2:]
+
+    # Calculate number of tiles necessary
+    tiles_x = math.ceil(columns / tile_width)
+    tiles_y = math.ceil(rows / tile_height)
+
+    # NaN can only be stored in floating point arrays
+    if not np.issubdtype(data.dtype, np.floating):
+        data = data.astype(np.float64)
+
+    # Pad the right and bottom edges, so the array holds a whole number of tiles
+    padding = [(0, 0)] * (data.ndim - 2) + [(0, tiles_y * tile_height - rows), (0, tiles_x * tile_width - columns)]
+    data = np.pad(data, pad_width = padding, mode = 'constant', constant_values = np.nan)
+
+    return data.reshape(data.shape[:-2] + (tiles_y, tile_height, tiles_x, tile_width))
+
+def calculate_sufficient_statistics(data: np.ndarray, axis = None) -> dict:
+    """Calculates count, sum, sum of squares, minimum and maximum of the non-NaN values in a single pass over the data.
+
+    The NaN mask is created once, and the sums are accumulated as 64-bit floats without temporary squared arrays.
+
+    Args:
+        data (NumPy.array): Array with values.
+        axis (int or tuple, optional): Axis or axes to reduce over. Defaults to None (all axes).
+
+    Returns:
+        dict: Sufficient statistics ('count', 'sum', 'sum_of_squares', 'minimum', 'maximum').
+    """
+    # Normalize the axes to reduce over
+    if axis is None:
+        axis = tuple(range(data.ndim))
+    elif not isinstance(axis, tuple):
+        axis = (axis,)
+    axis = tuple(sorted(a % data.ndim for a in axis))
+
+    # Replace NaN values with 0, so they do not add to the sums
+    valid = ~np.isnan(data)
+    filled = np.where(valid, data, 0)
+
+    # Sum the squares without creating an array of squares
+    subscripts = 'abcdefghijklmnopqrstuvwxyz'[:data.ndim]
+    kept_subscripts = ''.join(subscript for index, subscript in enumerate(subscripts) if index not in axis)
+    sum_of_squares = np.einsum(
+        '{0},{0}->{1}'.format(subscripts, kept_subscripts), filled, filled,
+        dtype = np.float64, casting = 'safe'
+    )
+
+    return {
+        'count': np.count_nonzero(valid, axis = axis),
+        'sum': filled.sum(axis = axis, dtype = np.float64),
+        'sum_of_squares': sum_of_squares,
+        # NOTE: fmin/fmax ignore NaN values, and give NaN (without warning) if all values are NaN.
+        'minimum': np.fmin.reduce(data, axis = axis),
+        'maximum': np.fmax.reduce(data, axis = axis)
+    }
+
+def calculate_fused_statistics(
+    data: np.ndarray,
+    included_statistics: list = ['mean'],
+    axis = None
+    ) -> dict:
+    """Calculates statistics from a single pass over the data, for a whole stack of bands or tiles at once.
+
+    Unlike `calculate_array_statistics`, the NaN values are only masked once, and each value is only read once
+    (except for the median, which is only calculated when requested).
+
+    Example:
+        For a stack of bands with shape (bands, rows, columns), use axis = (-2, -1) for statistics per band.
+        For a grid of tiles with shape (bands, tiles_y, tile_height, tiles_x, tile_width), use axis = (-3, -1).
+
+    Args:
+        data (NumPy.array): Array with values.
+        included_statistics (list, optional): Statistics to calculate. Defaults to ['mean'].
+        axis (int or tuple, optional): Axis or axes to reduce over. Defaults to None (all axes).
+
+    Returns:
+        dict: Statistic names (key) and (arrays of) values (value). The number of non-NaN values is always included as 'count'.
+    """
+    available_statistics = ['mean', 'minimum', 'maximum', 'range', 'median', 'standard_deviation', 'coefficient_of_variation']
+
+    # Check if statistics passed as argument are an option
+    for statistic in included_statistics:
+        assert statistic in available_statistics, "'{}' is not available as statistic.".format(statistic)
+
+    sufficient_statistics = calculate_sufficient_statistics(data, axis = axis)
+
+    # NOTE: Only NaN values give NaN (instead of a warning), and should be skipped by the caller.
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        count = sufficient_statistics['count']
+        mean = sufficient_statistics['sum'] / count
+
+        # Standard deviation (with 1 degree of freedom, like `calculate_array_statistics`)
+        squared_deviations = np.maximum(sufficient_statistics['sum_of_squares'] - sufficient_statistics['sum'] * mean, 0)
+        standard_deviation = np.sqrt(squared_deviations / (count - 1))
+
+        statistic_values = {
+            'count': count,
+            'mean': np.round(mean, 3),
+            'minimum': np.round(sufficient_statistics['minimum'], 3),
+            'maximum': np.round(sufficient_statistics['maximum'], 3),
+            'range': np.round(sufficient_statistics['maximum'] - sufficient_statistics['minimum'], 3),
+            'standard_deviation': np.round(standard_deviation, 3),
+            'coefficient_of_variation': np.round((standard_deviation / mean) * 100, 3)
+        }
+
+    # Median
+    if 'median' in included_statistics:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category = RuntimeWarning)
+            statistic_values['median'] = np.round(np.nanmedian(data, axis = axis), 3)
+
+    return {name: value for name, value in statistic_values.items() if name == 'count' or name in included_statistics}
+
+def calculate_tile_grid_statistics(
+    tiles: np.ndarray,
+    included_statistics: list = ['mean']
+    ) -> dict:
+    """Calculates statistics for every tile in a grid of tiles at once.
+
+    The values are equal to those of `calculate_array_statistics` for each single tile.
+
+    Args:
+        tiles (NumPy.array): Array with shape (..., tiles_y, tile_height, tiles_x, tile_width).
+        included_statistics (list, optional): Statistics to calculate. Defaults to ['mean'].
+
+    Returns:
+        dict: Statistic names (key) and arrays with shape (..., tiles_y, tiles_x) (value).
+    """
+    statistic_values = calculate_fused_statistics(tiles, included_statistics, axis = (-3, -1))
+
+    # Only return the requested statistics
+    del statistic_values['count']
+
+    return statistic_values
+
+def count_tile_grid_classes(tiles: np.ndarray, num_classes: int) -> tuple:
+    """Counts the pixels of each land use class for every tile in a grid of tiles at once.
+
+    Args:
+        tiles (NumPy.array): Array with shape (tiles_y, tile_height, tiles_x, tile_width).
+        num_classes (int): Number of land use classes.
+
+    Returns:
+        tuple: Pixel counts per class with shape (num_classes, tiles_y, tiles_x), and number of non-negative pixels with shape (tiles_y, tiles_x).
+    """
+    assert tiles.ndim == 4, "The tiles should have 4 dimensions, not {}.".format(tiles.ndim)
+
+    tiles_y, _, tiles_x, _ = tiles.shape
+
+    # Give every pixel the (flat) index of its tile
+    tile_ids = np.broadcast_to(
+        np.arange(tiles_y * tiles_x).reshape(tiles_y, 1, tiles_x, 1),
+        tiles.shape
+    )
+
+    # Only use non-negative pixels (NaN values are excluded as well)
+    with np.errstate(invalid = 'ignore'):
+        valid = tiles >= 0
+
+    # Count the number of valid pixels per tile
+    tile_sizes = np.bincount(tile_ids[valid], minlength = tiles_y * tiles_x)
+
+    # Count the pixels per class per tile, using a combined key of class and tile index
+    classes = tiles[valid].astype(np.int64)
+    known = classes < num_classes
+    pixel_counts = np.bincount(
+        classes[known] * tiles_y * tiles_x + tile_ids[valid][known],
+        minlength = num_classes * tiles_y * tiles_x
+    )
+
+    return pixel_counts.reshape(num_classes, tiles_y, tiles_x), tile_sizes.reshape(tiles_y, tiles_x)
+
+def calculate_proportions_from_counts(pixel_counts: np.ndarray, tile_sizes: np.ndarray, lut_fpath: str) -> dict:
+    """Calculates the proportions of each land use class from pixel counts.
+
+    Args:
+        pixel_counts (NumPy.array): Pixel counts per class with shape (num_classes, ...).
+        tile_sizes (NumPy.array): Number of non-negative pixels with shape (...).
+        lut_fpath (str): Filepath of LookUp-Table (.txt).
+
+    Returns:
+        dict: Land use names (key) and arrays with proportions (value).
+    """
+    assert os.path.exists(lut_fpath), "The file '{}' does not exist.".format(lut_fpath)
+
+    # Get landuse classes
+    land_use_class_dict = read_land_use_classes(lut_fpath)
+
+    # Calculate proportion
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        proportions = np.round(
+            np.true_divide(pixel_counts, tile_sizes),
+            4)
+
+    # Create dictionary for land use names and proportions
+    return dict(zip(land_use_class_dict.values(), proportions))
+
+def count_tile_grid_proportions(tiles: np.ndarray, lut_fpath: str) -> dict:
+    """Counts the proportions of each land use class for every tile in a grid of tiles at once.
+
+    The values are equal to those of `count_proportions_in_array` for each single tile.
+
+    Args:
+        tiles (NumPy.array): Array with shape (tiles_y, tile_height, tiles_x, tile_width).
+        lut_fpath (str): Filepath of LookUp-Table (.txt).
+
+    Returns:
+        dict: Land use names (key) and arrays with shape (tiles_y, tiles_x) with proportions (value).
+    """
+    assert os.path.exists(lut_fpath), "The file '{}' does not exist.".format(lut_fpath)
+
+    pixel_counts, tile_sizes = count_tile_grid_classes(tiles, len(read_land_use_classes(lut_fpath)))
+
+    return calculate_proportions_from_counts(pixel_counts, tile_sizes, lut_fpath)
+
+def cross_tabulate_tile_grid(tiles: np.ndarray, land_use_tiles: np.ndarray, num_classes: int) -> dict:
+    """Sums and counts the values of every band per land use class for every tile in a grid of tiles at once.
+
+    All bands, classes and tiles are counted with a single `np.bincount`, using a combined key of band, class and tile index
+    (with the values as weights for the sums). Pixels without a known land use class, and NaN values, are excluded.
+    The sums and counts can be merged into those of larger tiles with `merge_tile_grid_partials`.
+
+    Args:
+        tiles (NumPy.array): Array with shape (bands, tiles_y, tile_height, tiles_x, tile_width).
+        land_use_tiles (NumPy.array): Land use classes with shape (tiles_y, tile_height, tiles_x, tile_width).
+        num_classes (int): Number of land use classes.
+
+    Returns:
+        dict: Pixel counts ('class_band_count') and sums ('class_band_sum') with shape (bands, num_classes, tiles_y, tiles_x).
+    """
+    assert tiles.ndim == 5, "The tiles should have 5 dimensions, not {}.".format(tiles.ndim)
+    assert tiles.shape[1:] == land_use_tiles.shape, "The tiles {} and land use tiles {} should have the same shape.".format(tiles.shape[1:], land_use_tiles.shape)
+
+    num_bands = tiles.shape[0]
+    tiles_y, _, tiles_x, _ = land_use_tiles.shape
+    num_tiles = tiles_y * tiles_x
+
+    # Give every pixel the key of its class and tile
+    tile_ids = np.broadcast_to(
+        np.arange(num_tiles).reshape(tiles_y, 1, tiles_x, 1),
+        land_use_tiles.shape
+    )
+
+    # Only use pixels of a known class (NaN values are excluded as well)
+    with np.errstate(invalid = 'ignore'):
+        known = (land_use_tiles >= 0) & (land_use_tiles < num_classes)
+    keys = land_use_tiles[known].astype(np.int64) * num_tiles + tile_ids[known]
+
+    # Combine the keys with the band index, and only use the non-NaN values
+    values = tiles[:, known]
+    valid = ~np.isnan(values)
+    band_keys = (np.arange(num_bands).reshape(num_bands, 1) * num_classes * num_tiles + keys)[valid]
+
+    # Count and sum the values per band, class and tile
+    shape = (num_bands, num_classes, tiles_y, tiles_x)
+    counts = np.bincount(band_keys, minlength = num_bands * num_classes * num_tiles)
+    sums = np.bincount(band_keys, weights = values[valid], minlength = num_bands * num_classes * num_tiles)
+
+    return {
+        'class_band_count': counts.reshape(shape),
+        'class_band_sum': sums.reshape(shape)
+    }
+
+def calculate_class_means_from_partials(partials: dict) -> np.ndarray:
+    """Calculates the mean of every band per land use class from partial statistics, as created by `cross_tabulate_tile_grid`.
+
+    Args:
+        partials (dict): Partial statistics with 'class_band_count' and 'class_band_sum'.
+
+    Returns:
+        NumPy.array: Means with shape (bands, num_classes, ...), NaN for classes without pixels.
+    """
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.round(partials['class_band_sum'] / partials['class_band_count'], 3)
+
+def calculate_tile_grid_partials(tiles: np.ndarray) -> dict:
+    """Calculates mergeable partial statistics for every tile in a grid of tiles at once.
+
+    Partial statistics of neighbouring tiles can be combined with `merge_tile_grid_partials`, so statistics of
+    larger tiles never have to be calculated from the pixels again.
+
+    Args:
+        tiles (NumPy.array): Array with shape (..., tiles_y, tile_height, tiles_x, tile_width).
+
+    Returns:
+        dict: Partial statistics ('count', 'sum', 'squared_deviations', 'minimum', 'maximum') with shape (..., tiles_y, tiles_x).
+    """
+    sufficient_statistics = calculate_sufficient_statistics(tiles, axis = (-3, -1))
+
+    # Sum of squared deviations from the mean
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = sufficient_statistics['sum'] / sufficient_statistics['count']
+        squared_deviations = np.maximum(sufficient_statistics['sum_of_squares'] - sufficient_statistics['sum'] * mean, 0)
+
+    return {
+        'count': sufficient_statistics['count'],
+        'sum': sufficient_statistics['sum'],
+        'squared_deviations': np.where(sufficient_statistics['count'] > 0, squared_deviations, 0),
+        'minimum': sufficient_statistics['minimum'],
+        'maximum': sufficient_statistics['maximum']
+    }
+
+def merge_tile_grid_partials(partials: dict, factor_x: int, factor_y: int) -> dict:
+    """Merges the partial statistics of blocks of neighbouring tiles into the partial statistics of larger tiles.
+
+    Partials named 'minimum' and 'maximum' are reduced with their namesake, 'squared_deviations' is combined using
+    'count' and 'sum', and all other partials (e.g. counts) are summed.
+
+    Args:
+        partials (dict): Partial statistics with shape (..., tiles_y, tiles_x).
+        factor_x (int): Number of tiles to merge in width.
+        factor_y (int): Number of tiles to merge in height.
+
+    Returns:
+        dict: Partial statistics with shape (..., ceil(tiles_y / factor_y), ceil(tiles_x / factor_x)).
+    """
+    def group_tiles(values, fill_value):
+        # Pad with a neutral value and reshape to (..., tiles_y, factor_y, tiles_x, factor_x)
+        tiles_y, tiles_x = values.shape[-2:]
+        padding = [(0, 0)] * (values.ndim - 2) + [
+            (0, math.ceil(tiles_y / factor_y) * factor_y - tiles_y),
+            (0, math.ceil(tiles_x / factor_x) * factor_x - tiles_x)
+        ]
+        values = np.pad(values, pad_width = padding, mode = 'constant', constant_values = fill_value)
+        return values.reshape(values.shape[:-2] + (values.shape[-2] // factor_y, factor_y, values.shape[-1] // factor_x, factor_x))
+
+    # Reduce over the tiles within each block
+    axis = (-3, -1)
+
+    merged = {}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category = RuntimeWarning)
+
+        for name, values in partials.items():
+            if name == 'minimum':
+                merged[name] = np.nanmin(group_tiles(values.astype(np.float64), np.nan), axis = axis)
+            elif name == 'maximum':
+                merged[name] = np.nanmax(group_tiles(values.astype(np.float64), np.nan), axis = axis)
+            elif name != 'squared_deviations':
+                merged[name] = group_tiles(values, 0).sum(axis = axis)
+
+        # Combine the squared deviations, using the difference between the means of the tiles and the merged mean
+        if 'squared_deviations' in partials:
+            count = group_tiles(partials['count'], 0)
+            mean = group_tiles(partials['sum'], 0) / count
+            merged_mean = merged['sum'] / merged['count']
+            deviations = np.where(count > 0, count * np.square(mean - merged_mean[..., :, np.newaxis, :, np.newaxis]), 0)
+            merged['squared_deviations'] = group_tiles(partials['squared_deviations'], 0).sum(axis = axis) + deviations.sum(axis = axis)
+
+    return merged
+
+def calculate_statistics_from_partials(partials: dict, included_statistics: list = ['mean'], bin_edges: np.ndarray = None) -> dict:
+    """Calculates statistics from partial statistics, as created by `calculate_tile_grid_partials`.
+
+    The median and percentiles (e.g. 'p5', 'p95') can only be calculated from a 'histogram' partial,
+    as created by `calculate_tile_grid_histograms`, with the same bin edges, or be given as 'quantiles'
+    (a dictionary of arrays by statistic) that are estimated from these histograms already.
+
+    Args:
+        partials (dict): Partial statistics.
+        included_statistics (list, optional): Statistics to calculate. Defaults to ['mean'].
+        bin_edges (NumPy.array, optional): Bin edges of the histograms with shape (bands, num_bins + 1). Defaults to None.
+
+    Returns:
+        dict: Statistic names (key) and arrays (value).
+    """
+    available_statistics = ['mean', 'minimum', 'maximum', 'range', 'coefficient_of_variation']
+
+    # Check if statistics passed as argument are an option
+    # NOTE: The median and percentiles cannot be merged from partial statistics, only from histograms.
+    for statistic in included_statistics:
+        if statistic == 'median' or parse_percentile(statistic) is not None:
+            assert statistic in partials.get('quantiles', {}) or ('histogram' in partials and bin_edges is not None), \
+                "'{}' can only be calculated from histograms.".format(statistic)
+        else:
+            assert statistic in available_statistics, "'{}' is not available as statistic from partial statistics.".format(statistic)
+
+    statistic_values = {}
+
+    def estimate_quantile(statistic, quantile):
+        # Use the quantiles that are estimated already, if any
+        if statistic in partials.get('quantiles', {}):
+            return partials['quantiles'][statistic]
+        return calculate_quantile_from_histograms(partials['histogram'], bin_edges, quantile)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category = RuntimeWarning)
+
+        mean = partials['sum'] / partials['count']
+
+        # Round the extremes as 64-bit floats, also for tiles that are not merged (where they have the data type of the raster),
+        # so very negative values do not overflow
+        minimum = partials['minimum'].astype(np.float64)
+        maximum = partials['maximum'].astype(np.float64)
+
+        # Mean
+        if 'mean' in included_statistics:
+            statistic_values['mean'] = np.round(mean, 3)
+
+        # Minimum
+        if 'minimum' in included_statistics:
+            statistic_values['minimum'] = np.round(minimum, 3)
+
+        # Maximum
+        if 'maximum' in included_statistics:
+            statistic_values['maximum'] = np.round(maximum, 3)
+
+        # Range
+        if 'range' in included_statistics:
+            statistic_values['range'] = np.round(maximum - minimum, 3)
+
+        # Median
+        if 'median' in included_statistics:
+            statistic_values['median'] = np.round(estimate_quantile('median', 0.5), 3)
+
+        # Percentiles
+        for statistic in included_statistics:
+            percentile = parse_percentile(statistic)
+            if percentile is not None:
+                statistic_values[statistic] = np.round(estimate_quantile(statistic, percentile / 100), 3)
+
+        # Coefficient of variation (with 1 degree of freedom, like the other statistic functions)
+        if 'coefficient_of_variation' in included_statistics:
+            std = np.sqrt(partials['squared_deviations'] / (partials['count'] - 1))
+            statistic_values['coefficient_of_variation'] = np.round((std / mean) * 100, 3)
+
+    return statistic_values
+
+def calculate_standard_errors_from_partials(partials: dict, sampling_fraction: float) -> dict:
+    """Estimates the standard errors of the mean of every band, and of the land use proportions, for partial statistics
+    of a sample of the pixels of each tile (e.g. every n-th pixel in both directions).
+
+    The standard errors are those of a simple random sample, with the finite population correction:
+    sqrt(s^2 / n * (1 - f)) for the mean, and sqrt(p * (1 - p) / n * (1 - f)) for a proportion, where f is the sampling fraction.
+
+    Args:
+        partials (dict): Partial statistics of the sampled pixels, with 'class_counts' and 'class_total' (see `count_tile_grid_classes`).
+        sampling_fraction (float or NumPy.array): Fraction of the pixels that is sampled (between 0 and 1), or the fraction
+            of every tile with shape (...), e.g. if the tiles at the edge of the raster are sampled more densely.
+
+    Returns:
+        dict: Standard errors of the mean ('mean') with shape (bands, ...), and of the proportions ('proportions') with shape (num_classes, ...).
+    """
+    assert np.all((0 < np.asarray(sampling_fraction)) & (np.asarray(sampling_fraction) <= 1)), "The sampling fraction should be within (0, 1]."
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category = RuntimeWarning)
+
+        # Mean: sample variance (with 1 degree of freedom) divided by the sample size
+        variance = partials['squared_deviations'] / (partials['count'] - 1)
+        mean_errors = np.sqrt(variance / partials['count'] * (1 - sampling_fraction))
+
+        # Proportions
+        proportions = partials['class_counts'] / partials['class_total']
+        proportion_errors = np.sqrt(proportions * (1 - proportions) / partials['class_total'] * (1 - sampling_fraction))
+
+    return {
+        'mean': np.where(partials['count'] > 1, mean_errors, np.nan),
+        'proportions': np.where(partials['class_total'] > 1, proportion_errors, np.nan)
+    }
+
+def parse_percentile(statistic: str) -> float:
+    """Parses the percentile from a statistic name like 'p5' or 'p97.5'.
+
+    Args:
+        statistic (str): Statistic name.
+
+    Returns:
+        float: Percentile (between 0 and 100), or None if the statistic is not a percentile.
+    """
+    match = re.fullmatch(r'p(\d+(?:\.\d+)?)', statistic)
+
+    if match is None or float(match.group(1)) > 100:
+        return None
+
+    return float(match.group(1))
+
+def create_histogram_bin_edges(minimum: np.ndarray, maximum: np.ndarray, num_bins: int = 256) -> np.ndarray:
+    """Creates fixed bin edges for the histograms of each band, spanning the range of the band.
+
+    The median and percentiles calculated from these histograms are within one bin width, i.e.
+    (maximum - minimum) / num_bins, of the values ranked directly below and above them.
+
+    Args:
+        minimum (NumPy.array): Minimum value of each band.
+        maximum (NumPy.array): Maximum value of each band.
+        num_bins (int, optional): Number of bins. Defaults to 256.
+
+    Returns:
+        NumPy.array: Bin edges with shape (bands, num_bins + 1).
+    """
+    minimum = np.asarray(minimum, dtype = np.float64)
+    maximum = np.asarray(maximum, dtype = np.float64)
+
+    # Avoid empty bins for bands with a single value
+    maximum = np.where(maximum > minimum, maximum, minimum + 1)
+
+    return np.linspace(minimum, maximum, num_bins + 1, axis = -1)
+
+def calculate_tile_grid_histograms(tiles: np.ndarray, bin_edges: np.ndarray) -> np.ndarray:
+    """Counts the values of every band in a grid of tiles into fixed-bin histograms, all at once.
+
+    Histograms with the same bin edges can be merged by summing them, e.g. with `merge_tile_grid_partials`.
+    NaN values and very negative (nodata) values are not counted, as they are left out of the bin edges (see `get_band_ranges`
+    of the aggregation); other values outside the bin edges are counted in the first or last bin.
+
+    Args:
+        tiles (NumPy.array): Array with shape (bands, tiles_y, tile_height, tiles_x, tile_width).
+        bin_edges (NumPy.array): Bin edges with shape (bands, num_bins + 1), as created by `create_histogram_bin_edges`.
+
+    Returns:
+        NumPy.array: Histograms with shape (bands, num_bins, tiles_y, tiles_x).
+    """
+    assert tiles.ndim == 5, "The tiles should have 5 dimensions, not {}.".format(tiles.ndim)
+    assert bin_edges.shape[0] == tiles.shape[0], "There should be bin edges for each of the {} bands.".format(tiles.shape[0])
+
+    num_bands, tiles_y, _, tiles_x, _ = tiles.shape
+    num_bins = bin_edges.shape[1] - 1
+
+    # Calculate the bin of every value
+    minimum = bin_edges[:, 0].reshape(num_bands, 1, 1, 1, 1)
+    bin_width = (bin_edges[:, -1] - bin_edges[:, 0]).reshape(num_bands, 1, 1, 1, 1) / num_bins
+    with np.errstate(invalid = 'ignore'):
+        bins = np.clip(np.floor((tiles - minimum) / bin_width), 0, num_bins - 1)
+
+    # Leave out the NaN values and the very negative values
+    # NOTE: With (supposedly) rasterio, the NaN values are assigned the largest possible negative value
+    with np.errstate(invalid = 'ignore'):
+        valid = ~np.isnan(tiles) & ~(tiles < -10_000_000)
+
+    # Give every value the (flat) index of its band, bin and tile, and count these combined keys
+    band_ids = np.broadcast_to(np.arange(num_bands).reshape(num_bands, 1, 1, 1, 1), tiles.shape)[valid]
+    tile_ids = np.broadcast_to(np.arange(tiles_y * tiles_x).reshape(1, tiles_y, 1, tiles_x, 1), tiles.shape)[valid]
+    keys = (band_ids * num_bins + bins[valid].astype(np.int64)) * tiles_y * tiles_x + tile_ids
+
+    histograms = np.bincount(keys, minlength = num_bands * num_bins * tiles_y * tiles_x)
+
+    return histograms.reshape(num_bands, num_bins, tiles_y, tiles_x)
+
+def calculate_quantile_from_histograms(histograms: np.ndarray, bin_edges: np.ndarray, quantile: float) -> np.ndarray:
+    """Estimates a quantile from fixed-bin histograms, interpolating within the bin that holds the quantile.
+
+    Like `np.nanquantile` (with linear interpolation), the quantile is the value with rank quantile * (count - 1).
+    The values within a bin are assumed to be evenly spread, so the estimate is within one bin width of the
+    values ranked directly below and above it.
+
+    Args:
+        histograms (NumPy.array): Histograms with shape (bands, num_bins, ...).
+        bin_edges (NumPy.array): Bin edges with shape (bands, num_bins + 1).
+        quantile (float): Quantile (between 0 and 1).
+
+    Returns:
+        NumPy.array: Quantile with shape (bands, ...); NaN if the histogram is empty.
+    """
+    assert 0 <= quantile <= 1, "The quantile should be between 0 and 1, not {}.".format(quantile)
+
+    num_bands, num_bins = histograms.shape[:2]
+
+    # Reshape the bin edges, so they broadcast to the histograms
+    edge_shape = (num_bands,) + (1,) * (histograms.ndim - 2)
+    minimum = bin_edges[:, 0].reshape(edge_shape)
+    bin_width = ((bin_edges[:, -1] - bin_edges[:, 0]) / num_bins).reshape(edge_shape)
+
+    cumulative_counts = np.cumsum(histograms, axis = 1)
+    count = cumulative_counts[:, -1]
+
+    # Find the bin holding the value with the requested rank
+    rank = quantile * (count - 1)
+    bin_index = np.minimum(np.count_nonzero(cumulative_counts <= rank[:, np.newaxis], axis = 1), num_bins - 1)
+
+    counts_before = np.take_along_axis(cumulative_counts, bin_index[:, np.newaxis], axis = 1)[:, 0] - \
+        np.take_along_axis(histograms, bin_index[:, np.newaxis], axis = 1)[:, 0]
+    counts_in_bin = np.take_along_axis(histograms, bin_index[:, np.newaxis], axis = 1)[:, 0]
+
+    # Interpolate within the bin
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        position = (rank - counts_before + 0.5) / counts_in_bin
+        values = minimum + (bin_index + position) * bin_width
+
+    return np.where(count > 0, values, np.nan)
@@ -0,0 +1,126 @@
+"""
+Module for the tile filters of the aggregation: the predicates that decide whether a tile is skipped.
+
+The filters are declared once (see `create_tile_filters`), each with the input it needs, and are evaluated on
+the cheapest input first: the point data (no reading), then the land use band, and only then the thematic bands.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# A filter skips a tile if its predicate is true for the input ('points', 'band' or 'land use'), given the threshold.
+# The filters on bands are evaluated on a mergeable partial: the number of pixels of the band that the filter counts
+# (see `count_band_pixels`), so every engine evaluates the same predicate, on whole tiles or on partial statistics
+TileFilter = namedtuple('TileFilter', ['reason', 'source', 'predicate', 'threshold', 'counted'], defaults = [None])
+
+# Inputs of the filters, from cheapest to most expensive:
+## 'points': the number of points within the tile (no raster data needed);
+## 'band': the number of counted pixels of a band (applied to every band that is read, the land use band first);
+## 'land use': the land use proportions of the tile.
+FILTER_SOURCES = ['points', 'band', 'land use']
+
+def has_too_few_points(num_points, min_points: int):
+    """Whether a tile has fewer points than the minimum (works on arrays of counts as well)."""
+    return num_points < min_points
+
+def has_no_counted_pixels(num_pixels, threshold = None):
+    """Whether a band of a tile has no counted pixels (works on arrays of counts as well)."""
+    return num_pixels == 0
+
+def is_not_nan(data: np.ndarray, threshold = None) -> np.ndarray:
+    """Whether the values of a band are not NaN."""
+    return ~np.isnan(data)
+
+def is_not_very_negative(data: np.ndarray, threshold: float = -10_000_000) -> np.ndarray:
+    """Whether the values of a band are not very negative (below the threshold).
+
+    NOTE: With (supposedly) rasterio, the NaN values are assigned the largest possible negative value
+    """
+    with np.errstate(invalid = 'ignore'):
+        return ~(data < threshold)
+
+def count_band_pixels(tile_filter: TileFilter, data: np.ndarray, axis = None, padding: np.ndarray = None):
+    """Counts the pixels of a band that a filter counts, e.g. the pixels that are not NaN.
+
+    Args:
+        tile_filter (TileFilter): Filter on bands.
+        data (np.ndarray): Band data (of a tile, or of a grid of tiles).
+        axis (optional): Axes of the pixels within a tile. Defaults to None (the data is a single tile).
+        padding (np.ndarray, optional): Pixels that are padding, and are not counted. Defaults to None.
+
+    Returns:
+        Number of counted pixels (per tile).
+    """
+    counted = tile_filter.counted(data, tile_filter.threshold)
+
+    if padding is not None:
+        counted &= ~padding
+
+    return np.count_nonzero(counted, axis = axis)
+
+def has_too_many_clouds(land_use_proportions: dict, max_fraction: float):
+    """Whether the proportion of 'clouds/shadows' of a tile is at least the maximum (works on arrays of proportions as well)."""
+    return land_use_proportions['clouds/shadows'] >= max_fraction
+
+def create_tile_filters(cloud_fraction: float = 1.0, min_points: int = 1) -> list:
+    """Declares the tile filters, in the order of their input (see `FILTER_SOURCES`).
+
+    With the defaults, tiles are skipped if they have no points, if a band only contains NaN or very negative
+    values, or if they only consist of the class 'clouds/shadows'.
+
+    Args:
+        cloud_fraction (float, optional): Tiles with at least this proportion of 'clouds/shadows' are skipped. Defaults to 1.0.
+        min_points (int, optional): Tiles with fewer points are skipped. Defaults to 1.
+
+    Returns:
+        list: Tile filters.
+    """
+    assert 0 < cloud_fraction <= 1, "The cloud fraction should be within (0, 1], not {}.".format(cloud_fraction)
+    assert min_points >= 1, "Tiles without points have no point statistics, so the minimum number of points should be at least 1, not {}.".format(min_points)
+
+    tile_filters = [
+        TileFilter('no points', 'points', has_too_few_points, min_points),
+        TileFilter('nan', 'band', has_no_counted_pixels, None, is_not_nan),
+        TileFilter('very negative', 'band', has_no_counted_pixels, -10_000_000, is_not_very_negative),
+        TileFilter('clouds', 'land use', has_too_many_clouds, cloud_fraction)
+    ]
+
+    return sorted(tile_filters, key = lambda tile_filter: FILTER_SOURCES.index(tile_filter.source))
+
+def find_failed_filter(tile_filters: list, source: str, value):
+    """Evaluates the filters of a source on its input, in order.
+
+    Args:
+        tile_filters (list): Tile filters, as created by `create_tile_filters`.
+        source (str): Source of the input ('points', 'band' or 'land use').
+        value: Input of the filters (number of points, band data of the tile or land use proportions).
+
+    Returns:
+        str: Reason of the first filter that skips the tile, or None if the tile passes.
+    """
+    for tile_filter in tile_filters:
+        if tile_filter.source != source:
+            continue
+
+        # The filters on bands are evaluated on the number of counted pixels
+        if source == 'band':
+            value_of_filter = count_band_pixels(tile_filter, value)
+        else:
+            value_of_filter = value
+
+        if tile_filter.predicate(value_of_filter, tile_filter.threshold):
+            return tile_filter.reason
+
+    return None
+
+def get_band_read_order(num_bands: int, land_use_band: int) -> list:
+    """Orders the bands to read: the land use band first, as it is needed by most filters, then the thematic bands.
+
+    Args:
+        num_bands (int): Number of raster bands.
+        land_use_band (int): Raster band with land use classes.
+
+    Returns:
+        list: Band numbers.
+    """
+    return [land_use_band] + [band_no for band_no in range(1, num_bands + 1) if band_no != land_use_band]
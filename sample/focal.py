@@ -0,0 +1,308 @@
+"""
+Module for focal (moving-window) statistics: the mean and variance of every band, and the land use proportions,
+within a square window around every pixel, written as rasters.
+
+The window sums are calculated from summed-area tables (integral images), so every pixel costs the same,
+whatever the radius. The raster is read once, in row strips, for all radii at once.
+"""
+import argparse
+import os
+import warnings
+
+import numpy as np
+import rasterio as rio
+
+from rasterio.windows import Window
+from alive_progress import alive_bar
+
+from sample.helpers import read_land_use_classes
+from sample.raster import get_tile_profile
+
+# Number of output rows that are calculated at once
+STRIP_HEIGHT = 512
+
+def main():
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description = 'This script calculates focal (moving-window) statistics of a raster.')
+
+    ## INPUT
+    parser.add_argument('-r', '--raster',
+        type = str,
+        help = 'Filepath of raster'
+    )
+
+    ## OUTPUT
+    parser.add_argument('-o', '--output',
+        type = str,
+        help = 'Folder of output rasters (one per radius)',
+        default = 'output/focal'
+    )
+
+    ## RADII
+    parser.add_argument('-rd', '--radii',
+        nargs = '+',
+        type = float,
+        help = 'Radii of the windows (in metres); the window is a square of (2 * radius + 1) pixels',
+        required = True
+    )
+
+    ## LAND USE BAND
+    parser.add_argument('-lub', '--land-use-band',
+        type = int,
+        help = 'Raster band with land use classes',
+        default = 16
+    )
+
+    ## LOOK-UP TABLE
+    parser.add_argument('-lut', '--lookup-table',
+        type = str,
+        help = 'Filepath of LookUp-Table (.txt) with the land use classes',
+        default = 'data/raw/classes.txt'
+    )
+
+    ## STATISTICS
+    parser.add_argument('-s', '--statistics',
+        nargs = '+',
+        choices = ['mean', 'variance'],
+        help = 'Statistics of the thematic bands',
+        default = ['mean', 'variance']
+    )
+
+    ## COMPRESSION
+    parser.add_argument('-c', '--compression',
+        type = str,
+        help = "Compression of the output rasters (e.g. 'deflate', 'lzw', 'zstd', or 'none')",
+        default = 'deflate'
+    )
+
+    ## VERBOSITY
+    parser.add_argument('-v', '--verbose',
+        help = 'Verbose output',
+        default = True
+    )
+
+    args = parser.parse_args()
+
+    # Create folder for output rasters
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    create_focal_statistics(
+        raster_fpath = args.raster,
+        output_folder = args.output,
+        radii = args.radii,
+        land_use_band = args.land_use_band,
+        lut_fpath = args.lookup_table,
+        included_statistics = args.statistics,
+        compression = None if args.compression == 'none' else args.compression,
+        verbose = args.verbose
+    )
+
+def create_focal_statistics(raster_fpath: str, output_folder: str, radii: list, land_use_band: int = 16, lut_fpath: str = "data/raw/classes.txt", included_statistics: list = ['mean', 'variance'], compression: str = 'deflate', strip_height: int = STRIP_HEIGHT, verbose = True) -> list:
+    """Calculates focal statistics of a raster for several radii, and writes a raster per radius.
+
+    Each output raster has, for every thematic band, the included statistics ('band 1 - mean', 'band 1 - variance', ...),
+    followed by the proportion of every land use class. The raster is read once, in row strips with a margin of the largest radius.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        output_folder (str): Folder of output rasters.
+        radii (list): Radii of the windows (in metres), rounded down to whole pixels.
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        lut_fpath (str, optional): Filepath of LookUp-Table (.txt). Defaults to "data/raw/classes.txt".
+        included_statistics (list, optional): Statistics of the thematic bands ('mean' and/or 'variance'). Defaults to ['mean', 'variance'].
+        compression (str, optional): Compression of the output rasters, or None. Defaults to 'deflate'.
+        strip_height (int, optional): Number of output rows calculated at once. Defaults to 512.
+        verbose (bool, optional): Verbosity. Defaults to True.
+
+    Returns:
+        list: Filepaths of the output rasters, in the order of the radii.
+    """
+    for statistic in included_statistics:
+        assert statistic in ['mean', 'variance'], "'{}' is not available as focal statistic.".format(statistic)
+
+    land_use_classes = list(read_land_use_classes(lut_fpath).values())
+
+    with rio.open(raster_fpath) as raster:
+        assert 1 <= land_use_band <= raster.count, "The land use band should be between 1 and {}.".format(raster.count)
+
+        # Convert the radii to pixels
+        cell_size = min(abs(raster.res[0]), abs(raster.res[1]))
+        pixel_radii = [int(radius // cell_size) for radius in radii]
+        max_radius = max(pixel_radii)
+
+        # Names of the output bands
+        thematic_bands = [band_no for band_no in range(1, raster.count + 1) if band_no != land_use_band]
+        band_names = ["band {} - {}".format(band_no, statistic) for band_no in thematic_bands for statistic in included_statistics]
+        band_names += land_use_classes
+
+        # Profile of the output rasters: a float band per statistic, with NaN where the window has no values
+        meta = raster.meta.copy()
+        meta.update({'count': len(band_names), 'dtype': 'float32', 'nodata': np.nan})
+        profile = get_tile_profile(meta, compression = compression)
+
+        output_fpaths = [
+            os.path.join(output_folder, "focal_radius_{:g}.tif".format(radius)) for radius in radii
+        ]
+        outputs = [rio.open(output_fpath, 'w', **profile) for output_fpath in output_fpaths]
+
+        try:
+            for output in outputs:
+                for band_index, band_name in enumerate(band_names, start = 1):
+                    output.set_band_description(band_index, band_name)
+
+            strip_offsets = range(0, raster.height, strip_height)
+
+            with alive_bar(len(strip_offsets), disable = not verbose) as bar:
+                for row_off in strip_offsets:
+                    rows = min(strip_height, raster.height - row_off)
+
+                    # Read the strip with a margin of the largest radius (clipped to the raster)
+                    read_row_off = max(row_off - max_radius, 0)
+                    read_rows = min(row_off + rows + max_radius, raster.height) - read_row_off
+                    strip_data = raster.read(window = Window(col_off = 0, row_off = read_row_off, width = raster.width, height = read_rows))
+
+                    # Rows of the output, within the strip that is read
+                    output_rows = np.arange(row_off, row_off + rows) - read_row_off
+
+                    focal_statistics = calculate_focal_strip_statistics(
+                        strip_data = strip_data,
+                        output_rows = output_rows,
+                        radii = pixel_radii,
+                        land_use_band = land_use_band,
+                        num_classes = len(land_use_classes),
+                        included_statistics = included_statistics
+                    )
+
+                    window = Window(col_off = 0, row_off = row_off, width = raster.width, height = rows)
+                    for output, output_data in zip(outputs, focal_statistics):
+                        output.write(output_data, window = window)
+
+                    bar()
+        finally:
+            for output in outputs:
+                output.close()
+
+    if verbose:
+        for radius, pixel_radius, output_fpath in zip(radii, pixel_radii, output_fpaths):
+            print("Radius {:g} m ({} x {} pixels): {}".format(radius, 2 * pixel_radius + 1, 2 * pixel_radius + 1, output_fpath))
+
+    return output_fpaths
+
+def calculate_focal_strip_statistics(strip_data: np.ndarray, output_rows: np.ndarray, radii: list, land_use_band: int = 16, num_classes: int = 1, included_statistics: list = ['mean', 'variance']) -> list:
+    """Calculates the focal statistics of the output rows of a strip, for several radii.
+
+    The strip should contain the rows within the largest radius of the output rows (as far as they are within the raster).
+    NaN and very negative values are ignored; the land use proportions are those of the non-negative land use pixels (like `count_proportions_in_array`).
+
+    Args:
+        strip_data (np.ndarray): Data of all bands of the strip (bands, rows, columns).
+        output_rows (np.ndarray): Rows of the strip to calculate the statistics of.
+        radii (list): Radii of the windows (in pixels).
+        land_use_band (int, optional): Raster band with land use classes. Defaults to 16.
+        num_classes (int, optional): Number of land use classes. Defaults to 1.
+        included_statistics (list, optional): Statistics of the thematic bands. Defaults to ['mean', 'variance'].
+
+    Returns:
+        list: Focal statistics (bands, output rows, columns) for each radius, in the band order of `create_focal_statistics`.
+    """
+    num_bands, rows, columns = strip_data.shape
+
+    output_bands = [[] for _ in radii]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category = RuntimeWarning)
+
+        # Thematic bands, one at a time
+        for band_no in range(1, num_bands + 1):
+            if band_no == land_use_band:
+                continue
+
+            # NaN and very negative values (nodata) are ignored, as they would dominate the sums
+            band_data = strip_data[band_no - 1].astype(np.float64)
+            with np.errstate(invalid = 'ignore'):
+                valid = ~np.isnan(band_data) & ~(band_data < -10_000_000)
+
+            # Subtract the mean of the strip, so the sums of squares keep their precision
+            shift = band_data[valid].mean() if valid.any() else 0.0
+            band_data = np.where(valid, band_data - shift, 0)
+
+            count_table = calculate_summed_area_table(valid)
+            sum_table = calculate_summed_area_table(band_data)
+            squares_table = calculate_summed_area_table(band_data ** 2) if 'variance' in included_statistics else None
+
+            for radius_index, radius in enumerate(radii):
+                counts = calculate_window_sums(count_table, output_rows, radius)
+                sums = calculate_window_sums(sum_table, output_rows, radius)
+                # The sums are not exactly zero for windows without values (rounding), so they are masked by the counts
+                mean = np.where(counts > 0, sums / counts, np.nan)
+
+                for statistic in included_statistics:
+                    if statistic == 'mean':
+                        output_bands[radius_index].append(mean + shift)
+
+                    # Variance (with 1 degree of freedom, like the other statistic functions)
+                    if statistic == 'variance':
+                        squares = calculate_window_sums(squares_table, output_rows, radius)
+                        variance = np.maximum(squares - sums * mean, 0) / (counts - 1)
+                        output_bands[radius_index].append(np.where(counts > 1, variance, np.nan))
+
+        # Land use proportions, one class at a time
+        land_use_data = strip_data[land_use_band - 1]
+        with np.errstate(invalid = 'ignore'):
+            valid = land_use_data >= 0
+        classes = np.where(valid, land_use_data, -1).astype(np.int64)
+
+        total_table = calculate_summed_area_table(valid)
+        totals = [calculate_window_sums(total_table, output_rows, radius) for radius in radii]
+
+        for class_no in range(num_classes):
+            class_table = calculate_summed_area_table(classes == class_no)
+
+            for radius_index, radius in enumerate(radii):
+                output_bands[radius_index].append(calculate_window_sums(class_table, output_rows, radius) / totals[radius_index])
+
+    return [np.stack(bands).astype(np.float32) for bands in output_bands]
+
+def calculate_summed_area_table(data: np.ndarray) -> np.ndarray:
+    """Calculates the summed-area table (integral image) of an array: the sum of all values above and left of each position.
+
+    Args:
+        data (np.ndarray): Array (rows, columns).
+
+    Returns:
+        np.ndarray: Summed-area table (rows + 1, columns + 1), with a first row and column of zeros.
+    """
+    table = np.zeros((data.shape[0] + 1, data.shape[1] + 1), dtype = np.float64)
+    np.cumsum(data, axis = 0, out = table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis = 1, out = table[1:, 1:])
+
+    return table
+
+def calculate_window_sums(table: np.ndarray, rows: np.ndarray, radius: int) -> np.ndarray:
+    """Calculates the sums of square windows around every column of the given rows from a summed-area table,
+    at the same cost for every radius. The windows are clipped to the table.
+
+    Args:
+        table (np.ndarray): Summed-area table, as calculated by `calculate_summed_area_table`.
+        rows (np.ndarray): Rows (of the data) of the centers of the windows.
+        radius (int): Radius of the windows (in pixels).
+
+    Returns:
+        np.ndarray: Window sums (rows, columns).
+    """
+    num_rows, num_columns = table.shape[0] - 1, table.shape[1] - 1
+
+    # Bounds of the windows (the stop is exclusive)
+    row_starts = np.clip(rows - radius, 0, num_rows)
+    row_stops = np.clip(rows + radius + 1, 0, num_rows)
+    column_starts = np.clip(np.arange(num_columns) - radius, 0, num_columns)
+    column_stops = np.clip(np.arange(num_columns) + radius + 1, 0, num_columns)
+
+    # Sum of the rows of each window, then of its columns
+    row_sums = table[row_stops] - table[row_starts]
+
+    return row_sums[:, column_stops] - row_sums[:, column_starts]
+
+if __name__ == '__main__':
+    main()
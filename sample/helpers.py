@@ -44,3 +44,20 @@ def sort_alphanumerically(data: list) -> list:
     convert = lambda text: int(text) if text.isdigit() else text.lower()
     alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
     return sorted(data, key=alphanum_key)
+
+def get_file_fingerprint(fpath: str) -> dict:
+    """Identifies a file by its (absolute) path, size and modification time, to detect whether it has changed.
+
+    Args:
+        fpath (str): Filepath.
+
+    Returns:
+        dict: Path ('path'), size in bytes ('size') and modification time in nanoseconds ('mtime').
+    """
+    file_stat = os.stat(fpath)
+
+    return {
+        'path': os.path.abspath(fpath),
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime_ns
+    }
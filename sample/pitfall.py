@@ -1,6 +1,8 @@
 from os import stat
+import os
 import rasterio as rio
 
+import numpy as np
 import pandas as pd
 
 from shapely.geometry import Point
@@ -80,3 +82,167 @@ def calculate_point_statistics_within_bounds(
         print("Within this bound, there are {} points.".format(len(points_within_bounds)))
 
     return statistic_values
+
+def read_point_data(point_csv_fpath: str) -> pd.DataFrame:
+    """Reads point data from a CSV file, so it can be assigned to tiles in one go.
+
+    Args:
+        point_csv_fpath (str): Filepath to CSV file with point data.
+
+    Returns:
+        pd.DataFrame: Point data, with the coordinates in the columns 'UTM E' and 'UTM N'.
+    """
+    assert os.path.exists(point_csv_fpath), "The file '{}' does not exist.".format(point_csv_fpath)
+
+    return pd.read_csv(point_csv_fpath)
+
+def assign_points_to_tiles(points: pd.DataFrame, x_bounds: np.ndarray, y_bounds: np.ndarray) -> pd.DataFrame:
+    """Assigns points to the tiles of a grid, in a single vectorized step.
+
+    Like `calculate_point_statistics_within_bounds`, the bounds are inclusive: a point on the edge of two tiles
+    is assigned to both tiles.
+
+    Args:
+        points (pd.DataFrame): Point data, with the coordinates in the columns 'UTM E' and 'UTM N'.
+        x_bounds (np.ndarray): Bounds (X1, X2) of each tile column, with shape (tiles_x, 2).
+        y_bounds (np.ndarray): Bounds (Y1, Y2) of each tile row, with shape (tiles_y, 2).
+
+    Returns:
+        pd.DataFrame: Point data, with one row per point per tile and the tile indices in the columns 'tile_x' and 'tile_y'.
+    """
+    def find_tile_ranges(values, bounds):
+        # The bounds are increasing, so the first and last tile containing each value can be looked up with a binary search
+        first = np.searchsorted(bounds[:, 1], values, side = 'left')
+        last = np.searchsorted(bounds[:, 0], values, side = 'right') - 1
+        return first, np.maximum(last - first + 1, 0)
+
+    first_x, num_x = find_tile_ranges(points['UTM E'].to_numpy(), x_bounds)
+    first_y, num_y = find_tile_ranges(points['UTM N'].to_numpy(), y_bounds)
+
+    # Repeat every point once for every tile it falls in
+    num_tiles = num_x * num_y
+    point_idx = np.repeat(np.arange(len(points)), num_tiles)
+    pair_idx = np.arange(num_tiles.sum()) - np.repeat(np.cumsum(num_tiles) - num_tiles, num_tiles)
+
+    assigned = points.iloc[point_idx].reset_index(drop = True)
+    assigned['tile_x'] = first_x[point_idx] + pair_idx // num_y[point_idx]
+    assigned['tile_y'] = first_y[point_idx] + pair_idx % num_y[point_idx]
+
+    return assigned
+
+def get_point_statistic_names(points: pd.DataFrame, statistics: list = ['mean']) -> list:
+    """Gives the names of the statistics created by `calculate_point_statistics_per_tile`, in the same order.
+
+    Args:
+        points (pd.DataFrame): Point data, as read by `read_point_data`.
+        statistics (list, optional): List of statistics. Defaults to ['mean'].
+
+    Returns:
+        list: Names of the statistics.
+    """
+    mean_columns, other_columns = get_point_value_columns(points)
+
+    names = ["number of points"]
+
+    for statistic, prefix, columns in [
+        ('mean', "mean_", mean_columns),
+        ('median', "median_", other_columns),
+        ('minimum', "min_", other_columns),
+        ('maximum', "max_", other_columns)
+    ]:
+        if statistic in statistics:
+            names.extend(prefix + column for column in columns)
+
+    return names
+
+def get_point_value_columns(points: pd.DataFrame) -> tuple:
+    """Selects the (numeric) columns with trap data, as used by `calculate_point_statistics_within_bounds`.
+
+    Args:
+        points (pd.DataFrame): Point data, as read by `read_point_data`.
+
+    Returns:
+        tuple: Columns for the mean, and columns for the other statistics.
+    """
+    mean_columns = points.iloc[:, 30:].select_dtypes('number').columns
+    other_columns = points.iloc[:, -28:].select_dtypes('number').columns
+
+    return mean_columns, other_columns
+
+def calculate_point_statistics_per_tile(
+    points: pd.DataFrame,
+    x_bounds: np.ndarray,
+    y_bounds: np.ndarray,
+    statistics: list = ['mean'],
+    verbose: bool = True
+    ) -> dict:
+    """Aggregates the values of point data into statistics for all tiles of a grid at once.
+
+    The values are equal to those of `calculate_point_statistics_within_bounds` for each single tile.
+
+    Args:
+        points (pd.DataFrame): Point data, as read by `read_point_data`.
+        x_bounds (np.ndarray): Bounds (X1, X2) of each tile column, with shape (tiles_x, 2).
+        y_bounds (np.ndarray): Bounds (Y1, Y2) of each tile row, with shape (tiles_y, 2).
+        statistics (list, optional): List of statistics to return. Defaults to ['mean'].
+        verbose (bool, optional): Verbosity flag.
+
+    Returns:
+        dict: Tile indices (tile_x, tile_y) (key) and statistics (value), only for tiles with points.
+    """
+    # Create list of available statistics
+    available_statistics = ['mean', 'minimum', 'maximum', 'median']
+
+    # Check if any statistic is specified that is not available
+    for statistic in statistics:
+        assert statistic in available_statistics, "'{}' is not an available option.".format(statistic)
+
+    # Select the (numeric) columns with trap data
+    mean_columns, other_columns = get_point_value_columns(points)
+
+    # Group the points by tile
+    grouped = assign_points_to_tiles(points, x_bounds, y_bounds).groupby(['tile_x', 'tile_y'])
+
+    # Create list of statistic tables, in the same order as the single tile statistics
+    tables = [grouped.size().rename("number of points")]
+
+    ## MEAN
+    if 'mean' in statistics:
+        tables.append(round(grouped[mean_columns].mean(), 2).add_prefix("mean_"))
+
+    ## MEDIAN
+    if 'median' in statistics:
+        tables.append(grouped[other_columns].median().add_prefix("median_"))
+
+    ## MINIMUM
+    if 'minimum' in statistics:
+        tables.append(grouped[other_columns].min().add_prefix("min_"))
+
+    ## MAXIMUM
+    if 'maximum' in statistics:
+        tables.append(grouped[other_columns].max().add_prefix("max_"))
+
+    statistic_table = pd.concat(tables, axis = 1)
+
+    if verbose:
+        print("There are {} points within {} tiles.".format(statistic_table["number of points"].sum(), len(statistic_table)))
+
+    return statistic_table.to_dict(orient = 'index')
+
+def get_tile_point_counts(point_statistics: dict, tiles_x: int, tiles_y: int) -> np.ndarray:
+    """Creates a grid with the number of points of each tile.
+
+    Args:
+        point_statistics (dict): Point statistics per tile, as calculated by `calculate_point_statistics_per_tile`.
+        tiles_x (int): Number of tile columns.
+        tiles_y (int): Number of tile rows.
+
+    Returns:
+        np.ndarray: Number of points with shape (tiles_y, tiles_x).
+    """
+    point_counts = np.zeros((tiles_y, tiles_x), dtype = np.int64)
+
+    for (tile_x, tile_y), statistics in point_statistics.items():
+        point_counts[tile_y, tile_x] = statistics["number of points"]
+
+    return point_counts
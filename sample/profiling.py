@@ -0,0 +1,243 @@
+"""
+Module for profiling long runs: cumulative time per stage, counters (e.g. bytes read and skipped tiles),
+reported as JSON lines and, optionally, as a Prometheus textfile (for the textfile collector of the node exporter).
+"""
+import json
+import os
+import time
+
+from contextlib import contextmanager
+
+class Profiler:
+    """Records the cumulative time of stages and the values of counters.
+
+    A disabled profiler records nothing, so the stages and counters can stay in the code at (almost) no cost.
+    The active profiler is available everywhere through `get_profiler` (see `set_profiler`).
+
+    Example:
+        >>> profiler = Profiler(report_fpath = 'output/profile.jsonl')
+        >>> with profiler.stage('read'):
+        ...     data = raster.read()
+        >>> profiler.count('bytes_read', data.nbytes)
+        >>> profiler.report(dimension = 1000)
+
+    Args:
+        report_fpath (str, optional): Filepath of report (JSON lines). Defaults to None.
+        prometheus_fpath (str, optional): Filepath of Prometheus textfile. Defaults to None.
+        prometheus_interval (float, optional): Minimum number of seconds between updates of the textfile. Defaults to 10.
+        namespace (str, optional): Prefix of the Prometheus metrics. Defaults to 'aggregate'.
+        enabled (bool, optional): Whether anything is recorded. Defaults to True.
+    """
+    def __init__(self, report_fpath: str = None, prometheus_fpath: str = None, prometheus_interval: float = 10, namespace: str = 'aggregate', enabled: bool = True):
+        self.report_fpath = report_fpath
+        self.prometheus_fpath = prometheus_fpath
+        self.prometheus_interval = prometheus_interval
+        self.namespace = namespace
+        self.enabled = enabled
+
+        # Cumulative time (in seconds) and number of calls per stage
+        self.stage_seconds = {}
+        self.stage_calls = {}
+
+        # Counters by name and labels
+        self.counters = {}
+
+        self._start_time = time.perf_counter()
+        self._prometheus_time = None
+
+        # Stages and counters at the last report, so every line of the report only covers the time since
+        self._report_state = self.get_state()
+        self._report_time = self._start_time
+
+    @contextmanager
+    def stage(self, name: str):
+        """Adds the time spent within the context to a stage.
+
+        Args:
+            name (str): Name of stage.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0) + time.perf_counter() - start_time
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+
+    def count(self, name: str, value = 1, **labels) -> None:
+        """Adds a value to a counter.
+
+        Args:
+            name (str): Name of counter.
+            value (optional): Value to add. Defaults to 1.
+            **labels: Labels of counter (e.g. reason = 'clouds').
+        """
+        if not self.enabled:
+            return
+
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def get_count(self, name: str, **labels):
+        """Returns the value of a counter (0 if it has not been counted).
+
+        Args:
+            name (str): Name of counter.
+            **labels: Labels of counter.
+        """
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_state(self) -> dict:
+        """Returns the recorded stages and counters, e.g. to send them from a worker process to the parent process (see `merge`).
+
+        Returns:
+            dict: Stage times ('stage_seconds'), stage calls ('stage_calls') and counters ('counters').
+        """
+        return {
+            'stage_seconds': dict(self.stage_seconds),
+            'stage_calls': dict(self.stage_calls),
+            'counters': dict(self.counters)
+        }
+
+    def merge(self, state: dict) -> None:
+        """Adds the stages and counters of another profiler (e.g. of a worker process) to this profiler.
+
+        NOTE: The stage times of parallel workers are added up, so they can exceed the elapsed time.
+
+        Args:
+            state (dict): Stages and counters, as returned by `get_state`.
+        """
+        if not self.enabled:
+            return
+
+        for name, seconds in state['stage_seconds'].items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0) + seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + state['stage_calls'][name]
+
+        for key, value in state['counters'].items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get_elapsed_time(self) -> float:
+        """Returns the number of seconds since the profiler was created."""
+        return time.perf_counter() - self._start_time
+
+    def to_dict(self, since: dict = None, since_time: float = None) -> dict:
+        """Returns the recorded stages and counters, and the throughput of tiles ('tiles' counter).
+
+        Args:
+            since (dict, optional): Earlier stages and counters (see `get_state`) to subtract. Defaults to None (cumulative).
+            since_time (float, optional): Time (`time.perf_counter`) of the earlier stages and counters. Defaults to None (the start).
+
+        Returns:
+            dict: Profile.
+        """
+        if since is None:
+            since = {'stage_seconds': {}, 'stage_calls': {}, 'counters': {}}
+
+        elapsed_time = time.perf_counter() - (self._start_time if since_time is None else since_time)
+
+        counters = {}
+        for (name, labels), value in self.counters.items():
+            value = value - since['counters'].get((name, labels), 0)
+            if labels:
+                counters.setdefault(name, {})[",".join("{}={}".format(*label) for label in labels)] = value
+            else:
+                counters[name] = value
+
+        stages = {}
+        for name, seconds in self.stage_seconds.items():
+            # Leave out the stages without calls
+            calls = self.stage_calls[name] - since['stage_calls'].get(name, 0)
+            if calls > 0:
+                stages[name] = {'seconds': seconds - since['stage_seconds'].get(name, 0), 'calls': calls}
+
+        tiles = self.get_count('tiles') - since['counters'].get(('tiles', ()), 0)
+
+        return {
+            'elapsed_seconds': elapsed_time,
+            'stages': stages,
+            'counters': counters,
+            'tiles_per_second': tiles / elapsed_time if elapsed_time > 0 else 0.0
+        }
+
+    def report(self, **fields) -> None:
+        """Appends the profile (see `to_dict`) since the last report as a line to the report, and updates the Prometheus textfile
+        (which stays cumulative over the run, as Prometheus expects of counters).
+
+        Args:
+            **fields: Extra fields of the line (e.g. dimension = 1000).
+        """
+        if not self.enabled:
+            return
+
+        if self.report_fpath is not None:
+            with open(self.report_fpath, 'a') as report_file:
+                report_file.write(json.dumps({'time': time.time(), **fields, **self.to_dict(self._report_state, self._report_time)}) + "\n")
+
+        self._report_state = self.get_state()
+        self._report_time = time.perf_counter()
+
+        self.write_prometheus()
+
+    def update(self) -> None:
+        """Updates the Prometheus textfile, if the last update is longer ago than the interval."""
+        if not self.enabled or self.prometheus_fpath is None:
+            return
+
+        if self._prometheus_time is None or time.perf_counter() - self._prometheus_time >= self.prometheus_interval:
+            self.write_prometheus()
+
+    def write_prometheus(self) -> None:
+        """Writes the stages and counters to the Prometheus textfile (replacing it at once, so it is never read half-written)."""
+        if not self.enabled or self.prometheus_fpath is None:
+            return
+
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            name = "{}_{}".format(self.namespace, name)
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(key, label_value) for key, label_value in labels)
+                lines.append("{}{} {}".format(name, "{" + label_text + "}" if label_text else "", value))
+
+        add_metric('elapsed_seconds', 'gauge', 'Seconds since the start of the run.', [((), self.get_elapsed_time())])
+        add_metric('stage_seconds_total', 'counter', 'Cumulative seconds per stage.',
+            [((('stage', name),), seconds) for name, seconds in self.stage_seconds.items()])
+
+        for name in sorted(set(name for name, _ in self.counters)):
+            add_metric("{}_total".format(name), 'counter', "Cumulative count of {}.".format(name.replace('_', ' ')),
+                [(labels, value) for (counter_name, labels), value in self.counters.items() if counter_name == name])
+
+        add_metric('tiles_per_second', 'gauge', 'Tiles processed per second.', [((), self.to_dict()['tiles_per_second'])])
+
+        temporary_fpath = self.prometheus_fpath + ".tmp"
+        with open(temporary_fpath, 'w') as prometheus_file:
+            prometheus_file.write("\n".join(lines) + "\n")
+        os.replace(temporary_fpath, self.prometheus_fpath)
+
+        self._prometheus_time = time.perf_counter()
+
+# Active profiler (disabled by default)
+_profiler = Profiler(enabled = False)
+
+def get_profiler() -> Profiler:
+    """Returns the active profiler.
+
+    Returns:
+        Profiler: Active profiler.
+    """
+    return _profiler
+
+def set_profiler(profiler: Profiler) -> None:
+    """Sets the active profiler.
+
+    Args:
+        profiler (Profiler): Profiler.
+    """
+    global _profiler
+    _profiler = profiler
@@ -6,23 +6,42 @@ from itertools import product
 from rasterio import band, windows
 
 from rasterio.windows import Window
+from rasterio.enums import Resampling
 
 import numpy as np
 
 import math
 import os
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
 import rasterio
 
 from osgeo import gdal
 
-def add_padding_to_raster(raster_in: str, raster_out: str, dimension: int, verbose = True):
+from sample.results import ResultTable
+from sample.profiling import get_profiler
+
+# Minimum height (in pixels) of the row strips that are read at once (e.g. by the strip engine of the aggregation)
+STRIP_HEIGHT = 1024
+
+# State of worker processes (see `init_tile_worker`)
+_worker_state = {}
+
+def add_padding_to_raster(raster_in: str, raster_out: str, dimension: int, fill_value = 0, strip_height: int = 1024, verbose = True):
     """Adds a padding to the raster, based on the dimension of the tiles.
 
+    The padded raster is written in row strips (of all bands), so only one strip is kept in memory.
+    If the padded raster is only needed for tiling, use `tile_raster` with `padding = True` instead,
+    which pads the tiles while reading, without writing a padded raster.
+
     Args:
         raster_in (str): Filename of input raster.
         raster_out (str): Filename of output raster.
         dimension (int): Dimension of tiles.
+        fill_value (optional): Value of the padding. Defaults to 0.
+        strip_height (int, optional): Number of rows written at once. Defaults to 1024.
 
     Example:
         The raster is 118 x 135 and has a spatial resolution of 10 metre.
@@ -33,60 +52,260 @@ def add_padding_to_raster(raster_in: str, raster_out: str, dimension: int, verbo
     """
     assert type(dimension) == int, "The dimension has to be provided as integer."
     assert os.path.exists(raster_in), "The file '{}' does not exist.".format(raster_in)
-
-    # Open raster
-    raster = rio.open(raster_in)
+    assert strip_height > 0, "The strip height should be positive, not {}.".format(strip_height)
 
     # Get spatial resolution of raster
     raster_spatial_resolution = get_spatial_resolution_raster(raster_in)
 
     # Calculate resolution of tile in pixels
-    tile_resolution = dimension / raster_spatial_resolution
+    tile_resolution = int(dimension / raster_spatial_resolution)
+
+    # Open raster
+    with rio.open(raster_in) as raster:
+        # Copy metadata
+        out_meta = raster.meta.copy()
+
+        # Determine padding based on spatial resolution of raster
+        new_raster_width = raster.width + (tile_resolution - raster.width % tile_resolution)
+        new_raster_height = raster.height + (tile_resolution - raster.height % tile_resolution)
+
+        if verbose:
+            print("The raster width will be increased from {} to {} pixels.".format(raster.width, new_raster_width))
+            print("The raster height will be increased from {} to {} pixels.\n".format(raster.height, new_raster_height))
+
+        # Update values based on padding
+        out_meta.update({
+            'width': new_raster_width,
+            'height': new_raster_height
+        })
+
+        with rio.open(raster_out, 'w', **out_meta) as dest:
+            # Loop through row strips of padded raster
+            for row_off in range(0, new_raster_height, strip_height):
+                window = Window(
+                    col_off = 0,
+                    row_off = row_off,
+                    width = new_raster_width,
+                    height = min(strip_height, new_raster_height - row_off)
+                )
+
+                if verbose:
+                    print("Writing rows {} to {}...".format(row_off, row_off + window.height))
+
+                # Read strip, with padding outside of raster
+                dest.write(read_padded_window(raster, window, fill_value = fill_value), window = window)
+
+def read_padded_window(raster, window: Window, fill_value = 0) -> np.ndarray:
+    """Reads a window of all bands, filling the part outside of the raster with a fill value.
+
+    Windows that are within the raster are read directly; others are read boundless.
+
+    Args:
+        raster ([type]): Raster.
+        window (Window): Window to read (may extend beyond the raster).
+        fill_value (optional): Value of the pixels outside of the raster. Defaults to 0.
+
+    Returns:
+        np.ndarray: Data of the window (bands, height, width).
+    """
+    # Read the window directly, if it is within the raster
+    if window.col_off >= 0 and window.row_off >= 0 and \
+        window.col_off + window.width <= raster.width and window.row_off + window.height <= raster.height:
+        return raster.read(window = window)
+
+    return raster.read(window = window, boundless = True, fill_value = fill_value)
+
+def read_decimated_window(raster, window: Window, factor: int) -> np.ndarray:
+    """Reads every n-th pixel (in both directions) of a window of all bands: the center pixel of each block of n x n pixels.
+
+    If the raster has an overview with this factor (built with nearest resampling), it is read instead of the raster.
+    The rows and columns that remain after the last whole block (if the window size is not a multiple of the factor)
+    are sampled by one extra row and column.
+
+    Args:
+        raster ([type]): Raster.
+        window (Window): Window to read (within the raster).
+        factor (int): Decimation factor.
+
+    Returns:
+        np.ndarray: Sampled data (bands, ceil(height / factor), ceil(width / factor)).
+    """
+    width, height = int(window.width), int(window.height)
+
+    # Split the rows and columns in a part with whole blocks (sampled exactly every n-th pixel), and the remainder
+    ## (offset, size, offset in output, size in output)
+    row_parts = [(0, height // factor * factor, 0, height // factor), (height // factor * factor, height % factor, height // factor, 1)]
+    column_parts = [(0, width // factor * factor, 0, width // factor), (width // factor * factor, width % factor, width // factor, 1)]
+
+    data = np.empty((raster.count, math.ceil(height / factor), math.ceil(width / factor)), dtype = raster.dtypes[0])
+
+    for (row_off, rows, out_row_off, out_rows), (col_off, columns, out_col_off, out_columns) in product(row_parts, column_parts):
+        if rows == 0 or columns == 0:
+            continue
+
+        part_window = Window(col_off = window.col_off + col_off, row_off = window.row_off + row_off, width = columns, height = rows)
+        data[:, out_row_off:out_row_off + out_rows, out_col_off:out_col_off + out_columns] = raster.read(
+            window = part_window,
+            out_shape = (raster.count, out_rows, out_columns)
+        )
+
+    return data
+
+def build_missing_overviews(raster_fpath: str, factors: list) -> list:
+    """Builds the overviews of a raster with the given factors, if they are missing, with nearest resampling
+    (so overview pixels are pixels of the raster). The overviews are written to an external file (.ovr),
+    so the raster itself is not changed.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        factors (list): Overview factors.
+
+    Returns:
+        list: Factors of the overviews that are built.
+    """
+    with rio.open(raster_fpath) as raster:
+        missing_factors = [factor for factor in factors if factor not in raster.overviews(1)]
+
+    if missing_factors:
+        with rio.Env(TIFF_USE_OVR = True), rio.open(raster_fpath, 'r+') as raster:
+            raster.build_overviews(missing_factors, Resampling.nearest)
+
+    return missing_factors
+
+def get_block_aligned_tile_rows(tile_height: int, block_height: int, max_height: int = 1024) -> int:
+    """Calculates the number of tile rows per strip, so the strips start at the boundaries of the internal blocks.
+
+    If that would make the strips more than four times the maximum height, the strips are not aligned.
+
+    Args:
+        tile_height (int): Tile height.
+        block_height (int): Height of the internal blocks of the raster.
+        max_height (int, optional): Maximum height of a strip (unless a single tile row is higher). Defaults to 1024.
+
+    Returns:
+        int: Number of tile rows per strip.
+    """
+    # Smallest height that is a multiple of both the tile and block height
+    aligned_height = tile_height * block_height // math.gcd(tile_height, block_height)
+
+    if aligned_height > 4 * max_height:
+        return max(1, max_height // tile_height)
+
+    return max(1, max_height // aligned_height) * aligned_height // tile_height
+
+def plan_block_aligned_reads(raster, strip_height: int) -> list:
+    """Plans the reads for row strips of a raster, so every internal block is decoded only once.
+
+    The reads cover whole block rows and do not overlap, so the strips can be sliced out of them
+    (see `read_block_aligned_strips`).
+
+    Args:
+        raster ([type]): Raster.
+        strip_height (int): Height of strips.
+
+    Returns:
+        list: Windows to read (full width).
+    """
+    block_height = raster.block_shapes[0][0]
+
+    reads = []
+    read_end = 0
+    for row_off in range(0, raster.height, strip_height):
+        row_end = min(row_off + strip_height, raster.height)
+
+        # Read up to the end of the block row that the strip ends in
+        if row_end > read_end:
+            next_read_end = min(math.ceil(row_end / block_height) * block_height, raster.height)
+            reads.append(Window(col_off = 0, row_off = read_end, width = raster.width, height = next_read_end - read_end))
+            read_end = next_read_end
+
+    return reads
+
+def read_block_aligned_strips(raster, strip_height: int):
+    """Reads a raster in row strips, decoding every internal block only once (see `plan_block_aligned_reads`).
+
+    Rows of a read that belong to the next strip are kept in memory.
+
+    Args:
+        raster ([type]): Raster.
+        strip_height (int): Height of strips.
+
+    Yields:
+        tuple: Row offset and data (bands, rows, columns) of each strip.
+    """
+    reads = iter(plan_block_aligned_reads(raster, strip_height))
+
+    # Rows that are read, but not yet part of a strip
+    buffer = np.empty((raster.count, 0, raster.width), dtype = raster.dtypes[0])
+    buffer_row_off = 0
 
-    # Create list for bands
-    padded_bands = []
+    for row_off in range(0, raster.height, strip_height):
+        row_end = min(row_off + strip_height, raster.height)
 
-    # Copy metadata
-    out_meta = raster.meta.copy()
+        if row_end > buffer_row_off + buffer.shape[1]:
+            with get_profiler().stage('read'):
+                read_data = raster.read(window = next(reads))
+            get_profiler().count('bytes_read', read_data.nbytes)
 
-    # Determine padding based on spatial resolution of raster
-    new_raster_width = raster.width + (tile_resolution - raster.width % tile_resolution)
-    new_raster_height = raster.height + (tile_resolution - raster.height % tile_resolution)
+            buffer = np.concatenate([buffer, read_data], axis = 1)
 
-    if verbose:
-        print("The raster width will be increased from {} to {} pixels.".format(raster.width, new_raster_width))
-        print("The raster height will be increased from {} to {} pixels.\n".format(raster.height, new_raster_height))
+        yield row_off, buffer[:, row_off - buffer_row_off:row_end - buffer_row_off]
 
-    # Determine padding
-    padding_x = int(new_raster_width - raster.width)
-    padding_y = int(new_raster_height - raster.height)
+        # Drop the rows of the strip
+        buffer = buffer[:, row_end - buffer_row_off:]
+        buffer_row_off = row_end
 
-    # Update values based on padding
-    out_meta.update({
-        'width': new_raster_width,
-        'height': new_raster_height
-    })
+def count_decoded_bytes(raster, read_windows) -> int:
+    """Counts the number of bytes of internal blocks that are decoded to read windows of a raster (of all bands).
 
-    # Loop through raster bands
-    for band_no in range(1, raster.count + 1):
-        print("Processing band no. {}...".format(band_no))
+    Args:
+        raster ([type]): Raster.
+        read_windows: Windows to read.
+
+    Returns:
+        int: Number of decoded bytes.
+    """
+    block_height, block_width = raster.block_shapes[0]
+    block_bytes = block_height * block_width * sum(np.dtype(dtype).itemsize for dtype in raster.dtypes)
+
+    decoded_bytes = 0
+    for window in read_windows:
+        window = window.intersection(Window(col_off = 0, row_off = 0, width = raster.width, height = raster.height))
 
-        # Read band
-        raster_band = raster.read(band_no)
+        # Count the blocks that intersect with the window
+        block_rows = math.ceil((window.row_off + window.height) / block_height) - window.row_off // block_height
+        block_cols = math.ceil((window.col_off + window.width) / block_width) - window.col_off // block_width
+        decoded_bytes += int(block_rows * block_cols) * block_bytes
 
-        # Add padding
-        padded_raster_band = np.pad(
-            raster_band, 
-            pad_width = ((0, padding_y), (0, padding_x)), 
-            mode = 'constant',
-            constant_values = 0)
+    return decoded_bytes
 
-        # Append padded raster band to list
-        padded_bands.append(padded_raster_band)
+def get_tile_grid_bounds(raster, tile_width, tile_height) -> tuple:
+    """Creates the bounding boxes of all tiles in a raster, equal to those of `get_virtual_tile_point_date` of the aggregation.
+
+    Args:
+        raster ([type]): Raster.
+        tile_width (int): Tile width.
+        tile_height (int): Tile height.
+
+    Returns:
+        tuple: Bounds (X1, X2) of each tile column with shape (tiles_x, 2), and bounds (Y1, Y2) of each tile row with shape (tiles_y, 2).
+    """
+    # Calculate the number of tiles that fit in the raster
+    tiles_x = math.ceil(raster.width / tile_width)
+    tiles_y = math.ceil(raster.height / tile_height)
 
-    with rio.open(raster_out, 'w', **out_meta) as dest:
-        for band_nr, src in enumerate(padded_bands, start=1):
-            dest.write(src, band_nr)
+    # NOTE: bounds = left, bottom, right, top
+    # Calculate the size of each tile in coordinates
+    coords_size_x = int(raster.bounds[2] - raster.bounds[0]) / tiles_x
+    coords_size_y = int(raster.bounds[3] - raster.bounds[1]) / tiles_y
+
+    # Create bounds for each tile column and row
+    x1 = raster.bounds[0] + np.arange(tiles_x) * coords_size_x
+    y1 = raster.bounds[1] + np.arange(tiles_y) * coords_size_y
+    x_bounds = np.stack([x1, x1 + coords_size_x], axis = 1).astype(int)
+    y_bounds = np.stack([y1, y1 + coords_size_y], axis = 1).astype(int)
+
+    return x_bounds, y_bounds
 
 def get_spatial_resolution_raster(raster_fpath, verbose = False) -> float:
     """Extracts spatial resolution from raster.
@@ -117,22 +336,44 @@ def get_spatial_resolution_raster(raster_fpath, verbose = False) -> float:
             "The raster file does not exist."
         )
 
-def get_tiles(ds, width = 256, height = 256):
+def get_tiles(ds, width = 256, height = 256, boundless = False):
     nols, nrows = ds.meta['width'], ds.meta['height']
     offsets = product(range(0, nols, width), range(0, nrows, height))
     big_window = windows.Window(col_off=0, row_off=0, width=nols, height=nrows)
     for col_off, row_off in  offsets:
-        window = windows.Window(col_off=col_off, row_off=row_off, width=width, height=height).intersection(big_window)
+        window = windows.Window(col_off=col_off, row_off=row_off, width=width, height=height)
+        # Keep full tiles at the edges (for padding), or clip them to the raster
+        if not boundless:
+            window = window.intersection(big_window)
         transform = windows.transform(window, ds.transform)
         yield window, transform
 
-def tile_raster(raster_in, raster_out, dimension: int = 5000, verbose = True):
+def tile_raster(raster_in, raster_out, dimension: int = 5000, padding = False, fill_value = 0, compression: str = 'deflate', predictor: int = None, block_size: int = 256, workers: int = 1, index_fpath: str = None, prune = False, verbose = True):
     """Splits raster in smaller tiles.
 
+    With padding, the tiles at the right and bottom edge are filled up to the full tile size while reading
+    (see `read_padded_window`), so no padded copy of the raster has to be written first.
+
+    The tiles are written as compressed, internally tiled GeoTIFFs (see `get_tile_profile`), optionally by
+    several worker processes. If an index filepath is given, no tiles are written at all: only an index (CSV)
+    with the window and bounds of every tile in the raster is written (see `write_tile_index`).
+
     Args:
-        raster ([type]): [description]
-        resolution ([type]): [description]
+        raster_in (str): Filepath of raster.
+        raster_out (str): Folder of tiles.
+        dimension (int, optional): Dimension of tiles. Defaults to 5000.
+        padding (bool, optional): Pad the tiles at the edges to the full tile size. Defaults to False.
+        fill_value (optional): Value of the padding. Defaults to 0.
+        compression (str, optional): Compression of the tiles (e.g. 'deflate', 'lzw', 'zstd'), or None. Defaults to 'deflate'.
+        predictor (int, optional): Predictor of the compression; chosen based on the data type if None. Defaults to None.
+        block_size (int, optional): Size of the internal blocks of the tiles (in pixels). Defaults to 256.
+        workers (int, optional): Number of worker processes writing tiles. Defaults to 1.
+        index_fpath (str, optional): Filepath of tile index to write instead of the tiles. Defaults to None.
+        prune (bool, optional): Do not write tiles with only a single value in each band (see `is_single_value_array`). Defaults to False.
+        verbose (bool, optional): Verbose output. Defaults to True.
     """
+    assert workers > 0, "The number of workers should be positive, not {}.".format(workers)
+
     # Check if raster exists
     if not os.path.exists(raster_in):
         raise FileNotFoundError(
@@ -140,10 +381,10 @@ def tile_raster(raster_in, raster_out, dimension: int = 5000, verbose = True):
         )
 
     # CHeck if output folder exists
-    if not os.path.exists(raster_out):
+    if index_fpath is None and not os.path.exists(raster_out):
         if verbose:
             print("Creating new folder for tiles...")
-        os.mkdir("data/intermediate/tiles")
+        os.makedirs(raster_out)
 
     # Open raster
     with rio.open(raster_in) as raster:
@@ -167,38 +408,259 @@ def tile_raster(raster_in, raster_out, dimension: int = 5000, verbose = True):
                 num_tiles_y
             ))
 
-        meta = raster.meta.copy()
+        tiles = get_tiles(raster, width = tile_pixel_size, height = tile_pixel_size, boundless = padding)
+
+        # Only write an index of the tiles
+        if index_fpath is not None:
+            write_tile_index(raster, tiles, index_fpath)
+            return
+
+        profile = get_tile_profile(raster.meta, compression = compression, predictor = predictor, block_size = block_size)
+
+        output_filename = 'tile_{}-{}.tif'
+        tasks = [(
+            window.col_off,
+            window.row_off,
+            window.width,
+            window.height,
+            os.path.join(raster_out, output_filename.format(int(window.col_off), int(window.row_off)))
+        ) for window, _ in tiles]
+
+        if workers == 1:
+            for col_off, row_off, width, height, outpath in tasks:
+                write_tile(raster, Window(col_off, row_off, width, height), outpath, profile, fill_value = fill_value, prune = prune)
+            return
 
-        for window, transform in get_tiles(raster, width = tile_pixel_size, height = tile_pixel_size):
-            meta['transform'] = transform
-            meta['width'], meta['height'] = window.width, window.height
-            output_filename = 'tile_{}-{}.tif'
-            outpath = os.path.join(raster_out, output_filename.format(int(window.col_off), int(window.row_off)))
-            with rio.open(outpath, 'w', **meta) as outds:
-                outds.write(raster.read(window = window))
+    # Write the tiles in worker processes, each with its own dataset handle
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_tile_worker, initargs = (raster_in, profile, fill_value, prune)) as executor:
+        for _ in executor.map(write_tile_in_worker, tasks, chunksize = max(1, len(tasks) // (workers * 4))):
+            pass
 
-def delete_single_value_tiles(tiles_folder: str) -> None:
-    """Deletes raster files with only a single-value.
+def get_tile_profile(meta: dict, compression: str = 'deflate', predictor: int = None, block_size: int = 256) -> dict:
+    """Creates the profile of compressed, internally tiled GeoTIFF tiles from the metadata of a raster.
 
     Args:
-        tiles_folder (str): Folder of rasters.
+        meta (dict): Metadata of raster.
+        compression (str, optional): Compression (e.g. 'deflate', 'lzw', 'zstd'), or None. Defaults to 'deflate'.
+        predictor (int, optional): Predictor of the compression (1: none, 2: horizontal differencing, 3: floating point).
+            If None, the predictor is chosen based on the data type. Defaults to None.
+        block_size (int, optional): Size of the internal blocks (in pixels); rounded down to a multiple of 16. Defaults to 256.
+
+    Returns:
+        dict: Profile of tiles.
+    """
+    profile = meta.copy()
+    profile['driver'] = 'GTiff'
+
+    if compression is not None:
+        if predictor is None:
+            predictor = 3 if np.issubdtype(np.dtype(profile['dtype']), np.floating) else 2
+
+        profile.update({
+            'compress': compression,
+            'predictor': predictor
+        })
+
+    # GeoTIFF blocks should be a multiple of 16 pixels
+    block_size = block_size // 16 * 16
+    if block_size > 0:
+        profile.update({
+            'tiled': True,
+            'blockxsize': block_size,
+            'blockysize': block_size
+        })
+
+    return profile
+
+def write_tile(raster, window: Window, outpath: str, profile: dict, fill_value = 0, prune = False) -> bool:
+    """Writes a window of a raster as a tile.
+
+    Args:
+        raster ([type]): Raster.
+        window (Window): Window of tile.
+        outpath (str): Filepath of tile.
+        profile (dict): Profile of tile (see `get_tile_profile`), without the size and transform.
+        fill_value (optional): Value of the pixels outside of the raster. Defaults to 0.
+        prune (bool, optional): Do not write the tile if it has only a single value in each band. Defaults to False.
+
+    Returns:
+        bool: True if the tile is written.
     """
-    # Loop through tiles
-    for tile in os.listdir(tiles_folder):
-        # Combine paths of input folder and raster filename
-        f = os.path.join(tiles_folder, tile)
+    data = read_padded_window(raster, window, fill_value = fill_value)
+
+    if prune and is_single_value_array(data):
+        return False
+
+    profile = profile.copy()
+    profile['transform'] = windows.transform(window, raster.transform)
+    profile['width'], profile['height'] = window.width, window.height
+
+    # Shrink the blocks of small tiles (to a multiple of 16 pixels)
+    if profile.get('tiled'):
+        profile['blockxsize'] = min(profile['blockxsize'], math.ceil(window.width / 16) * 16)
+        profile['blockysize'] = min(profile['blockysize'], math.ceil(window.height / 16) * 16)
+
+    with rio.open(outpath, 'w', **profile) as outds:
+        outds.write(data)
+
+    return True
 
-        # If tile exists ...
-        if os.path.isfile(f) and os.path.splitext(f)[1] == ".tif":
+def init_tile_worker(raster_fpath: str, profile: dict, fill_value, prune = False) -> None:
+    """Initializes a worker process for writing tiles, by opening its own handle of the raster.
 
-            # Open raster and read band
-            raster = rio.open(f)
-            raster_band = raster.read(1)
-            
-            # If all values are the same, remove file
-            if (np.all(raster_band == raster_band[0])):
+    Args:
+        raster_fpath (str): Filepath of raster.
+        profile (dict): Profile of tiles.
+        fill_value: Value of the pixels outside of the raster.
+        prune (bool, optional): Do not write tiles with only a single value in each band. Defaults to False.
+    """
+    _worker_state['raster'] = rio.open(raster_fpath)
+    _worker_state['profile'] = profile
+    _worker_state['fill_value'] = fill_value
+    _worker_state['prune'] = prune
+
+def write_tile_in_worker(task: tuple) -> bool:
+    """Writes a tile in a worker process (see `init_tile_worker`).
+
+    Args:
+        task (tuple): Column offset, row offset, width, height and filepath of tile.
+
+    Returns:
+        bool: True if the tile is written.
+    """
+    col_off, row_off, width, height, outpath = task
+
+    return write_tile(
+        raster = _worker_state['raster'],
+        window = Window(col_off, row_off, width, height),
+        outpath = outpath,
+        profile = _worker_state['profile'],
+        fill_value = _worker_state['fill_value'],
+        prune = _worker_state['prune']
+    )
+
+def write_tile_index(raster, tiles, index_fpath: str) -> None:
+    """Writes an index (CSV) of tiles, referencing windows of the raster instead of tile files.
+
+    For every tile, the index contains the filename the tile would have had, the raster, the window
+    (col_off, row_off, width, height) and the bounds (x1, y1, x2, y2). A tile can then be read with
+    `read_padded_window`.
+
+    Args:
+        raster ([type]): Raster.
+        tiles: Windows and transforms of tiles, as given by `get_tiles`.
+        index_fpath (str): Filepath of index.
+    """
+    columns = {'filename': object, 'raster': object}
+    columns.update({name: np.int64 for name in ['col_off', 'row_off', 'width', 'height']})
+    columns.update({name: np.float64 for name in ['x1', 'y1', 'x2', 'y2']})
+
+    with ResultTable(columns, fpath = index_fpath) as index:
+        for window, transform in tiles:
+            x1, y1, x2, y2 = windows.bounds(window, raster.transform)
+
+            index.append({
+                'filename': 'tile_{}-{}.tif'.format(int(window.col_off), int(window.row_off)),
+                'raster': raster.name,
+                'col_off': window.col_off,
+                'row_off': window.row_off,
+                'width': window.width,
+                'height': window.height,
+                'x1': x1,
+                'y1': y1,
+                'x2': x2,
+                'y2': y2
+            })
+
+def delete_single_value_tiles(tiles_folder: str, workers: int = 1) -> None:
+    """Deletes raster files with only a single value in each band (see `is_single_value_raster`).
+
+    Args:
+        tiles_folder (str): Folder of rasters.
+        workers (int, optional): Number of worker processes checking rasters. Defaults to 1.
+    """
+    assert workers > 0, "The number of workers should be positive, not {}.".format(workers)
+
+    # Combine paths of input folder and raster filenames
+    fpaths = [os.path.join(tiles_folder, tile) for tile in os.listdir(tiles_folder)]
+    fpaths = [f for f in fpaths if os.path.isfile(f) and os.path.splitext(f)[1] == ".tif"]
+
+    # NOTE: The worker processes are shut down when leaving the context, also after an exception.
+    with ProcessPoolExecutor(max_workers = workers) if workers > 1 else nullcontext() as executor:
+        if executor is not None:
+            single_values = executor.map(is_single_value_raster, fpaths, chunksize = max(1, len(fpaths) // (workers * 4)))
+        else:
+            single_values = map(is_single_value_raster, fpaths)
+
+        # If all values are the same, remove file
+        for f, single_value in zip(fpaths, single_values):
+            if single_value:
                 os.remove(f)
 
+def is_single_value_raster(raster_fpath: str) -> bool:
+    """Checks whether every band of a raster has only a single value (NaN values are considered equal).
+
+    The check stops as soon as a band is found to have differing values: first using the stored band statistics
+    and the overviews (if available), then reading the raster block by block.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+
+    Returns:
+        bool: True if every band has a single value.
+    """
+    with rio.open(raster_fpath) as raster:
+        # Stored statistics with a different minimum and maximum prove differing values
+        for band_no in raster.indexes:
+            tags = raster.tags(band_no)
+            if 'STATISTICS_MINIMUM' in tags and 'STATISTICS_MAXIMUM' in tags and \
+                float(tags['STATISTICS_MINIMUM']) != float(tags['STATISTICS_MAXIMUM']):
+                return False
+
+        # Differing values in an overview (of a band) prove differing values as well
+        for band_no in raster.indexes:
+            overviews = raster.overviews(band_no)
+            if overviews:
+                overview = raster.read(band_no, out_shape = (
+                    math.ceil(raster.height / overviews[-1]),
+                    math.ceil(raster.width / overviews[-1])
+                ))
+                if not is_single_value_array(overview[np.newaxis]):
+                    return False
+
+        # Values of the first pixel of every band
+        first_values = raster.read(window = Window(0, 0, 1, 1))
+
+        # Read the raster block by block, until a differing value is found
+        for _, window in raster.block_windows(1):
+            if not is_single_value_array(raster.read(window = window), first_values):
+                return False
+
+    return True
+
+def is_single_value_array(data: np.ndarray, values: np.ndarray = None) -> bool:
+    """Checks whether every band of an array has only a single value (NaN values are considered equal).
+
+    Args:
+        data (np.ndarray): Data (bands, height, width).
+        values (np.ndarray, optional): Values (bands, 1, 1) that every band should have. Defaults to None (the first pixel).
+
+    Returns:
+        bool: True if every band has a single value.
+    """
+    if data.size == 0:
+        return True
+
+    if values is None:
+        values = data[:, :1, :1]
+
+    same = data == values
+
+    if np.issubdtype(data.dtype, np.floating):
+        same |= np.isnan(data) & np.isnan(values)
+
+    return bool(np.all(same))
+
 def set_band_descriptions(raster_fpath: str, bands_txt: str) -> None:
     """Sets descriptions of raster bands using a .txt file.
 
@@ -0,0 +1,273 @@
+"""
+Module for collecting results row by row, without growing a Pandas DataFrame for every row,
+and for reading and writing result tables as CSV or Parquet.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from shapely.geometry import box
+
+class ResultTable:
+    """Buffers rows of results in preallocated, typed columns.
+
+    The rows are moved out of the buffer in chunks: they are written to a file (if a filepath is given),
+    or kept as DataFrame chunks in memory. When writing to a file, the memory use is bounded by the chunk size,
+    however many rows are added.
+
+    With the Parquet format, the filepath is a folder, and each chunk is written as a compressed Parquet file
+    within it (see `write_parquet_chunk`).
+
+    A table that is written to a file can continue the output of an earlier table from one of its checkpoints
+    (see `get_checkpoint`): anything written after the checkpoint is removed, and new rows are added after it.
+
+    Example:
+        >>> with ResultTable({'x1': np.int64, 'mean': np.float64}, fpath = 'output/table.csv') as table:
+        ...     table.append({'x1': 500000, 'mean': 10.5})
+
+    Args:
+        columns (dict): Column names (key) and NumPy data types (value), in the order of the output.
+        fpath (str, optional): Filepath of file (CSV) or folder (Parquet) to write the rows to. Defaults to None (keep rows in memory).
+        chunk_size (int, optional): Number of rows to buffer before flushing. Defaults to 10_000.
+        file_format (str, optional): Format of the output, 'csv' or 'parquet'. Defaults to 'csv'.
+        bounds_columns (tuple, optional): Columns (left, bottom, right, top) to store as geometry in Parquet output. Defaults to None.
+        crs (optional): CRS of the geometry in Parquet output. Defaults to None.
+        checkpoint (dict, optional): Checkpoint of an earlier table to continue the output of. Defaults to None.
+        on_flush (optional): Function that is called with the table after every flush (e.g. to store its checkpoint). Defaults to None.
+    """
+    def __init__(self, columns: dict, fpath: str = None, chunk_size: int = 10_000, file_format: str = 'csv', bounds_columns: tuple = None, crs = None, checkpoint: dict = None, on_flush = None):
+        assert chunk_size > 0, "The chunk size should be positive, not {}.".format(chunk_size)
+        assert file_format in ['csv', 'parquet'], "'{}' is not an available file format.".format(file_format)
+
+        self.columns = {name: np.dtype(dtype) for name, dtype in columns.items()}
+        self.fpath = fpath
+        self.chunk_size = chunk_size
+        self.file_format = file_format
+        self.bounds_columns = bounds_columns
+        self.crs = crs
+        self.on_flush = on_flush
+
+        # Preallocate a buffer for each column
+        self._buffers = {name: np.empty(chunk_size, dtype = dtype) for name, dtype in self.columns.items()}
+        self._buffered_rows = 0
+
+        # Number of rows that are flushed
+        self._flushed_rows = 0
+
+        # Chunks that are kept in memory (if no filepath is given)
+        self._chunks = []
+
+        # Whether the file has been (over)written by this table
+        self._written = False
+
+        # Number of Parquet files written
+        self._num_parts = 0
+
+        if checkpoint is not None:
+            self._continue_from_checkpoint(checkpoint)
+
+    def __len__(self) -> int:
+        return self._flushed_rows + self._buffered_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # NOTE: After an error, the buffered rows are not flushed, so the last checkpoint is not moved past rows that are missing.
+        if exc_type is None:
+            self.close()
+
+    def append(self, row: dict) -> None:
+        """Adds a row to the table.
+
+        A full buffer is flushed before the row is added (not after), so `on_flush` is only called between rows.
+
+        Args:
+            row (dict): Column names (key) and values (value). Missing values of float columns are stored as NaN.
+        """
+        for name in row:
+            assert name in self.columns, "The column '{}' is not part of the table.".format(name)
+
+        if self._buffered_rows == self.chunk_size:
+            self.flush()
+
+        for name, buffer in self._buffers.items():
+            if name in row:
+                buffer[self._buffered_rows] = row[name]
+            elif np.issubdtype(buffer.dtype, np.floating):
+                buffer[self._buffered_rows] = np.nan
+            else:
+                raise ValueError("The row has no value for the column '{}'.".format(name))
+
+        self._buffered_rows += 1
+
+    def flush(self) -> None:
+        """Moves the buffered rows to the file, or to the chunks in memory."""
+        # NOTE: The file is created (with header) on the first flush, even if there are no rows.
+        if self._buffered_rows == 0 and (self.fpath is None or self._written):
+            return
+
+        chunk = pd.DataFrame(
+            {name: buffer[:self._buffered_rows].copy() for name, buffer in self._buffers.items()},
+            index = pd.RangeIndex(self._flushed_rows, self._flushed_rows + self._buffered_rows)
+        )
+
+        if self.fpath is None:
+            self._chunks.append(chunk)
+        elif self.file_format == 'parquet':
+            # Remove the files of an earlier run, so they do not end up in the table
+            if not self._written:
+                os.makedirs(self.fpath, exist_ok = True)
+                for part_fpath in glob.glob(os.path.join(self.fpath, "part-*.parquet")):
+                    os.remove(part_fpath)
+
+            part_fpath = os.path.join(self.fpath, "part-{:05d}.parquet".format(self._num_parts))
+            write_parquet_chunk(chunk, part_fpath, bounds_columns = self.bounds_columns, crs = self.crs)
+            self._num_parts += 1
+            self._written = True
+        else:
+            chunk.to_csv(self.fpath, mode = 'a' if self._written else 'w', header = not self._written)
+            self._written = True
+
+        self._flushed_rows += self._buffered_rows
+        self._buffered_rows = 0
+
+        if self.on_flush is not None:
+            self.on_flush(self)
+
+    def get_checkpoint(self) -> dict:
+        """Returns the state of the output after the last flush, from which a new table can continue.
+
+        Returns:
+            dict: Number of rows ('rows'), Parquet files ('parts') and bytes of the CSV file ('bytes') written.
+        """
+        assert self.fpath is not None, "Only tables that are written to a file have checkpoints."
+
+        return {
+            'rows': self._flushed_rows,
+            'parts': self._num_parts,
+            'bytes': os.path.getsize(self.fpath) if self.file_format == 'csv' and self._written else 0
+        }
+
+    def _continue_from_checkpoint(self, checkpoint: dict) -> None:
+        """Removes the output written after a checkpoint, and continues the output from there.
+
+        Args:
+            checkpoint (dict): Checkpoint, as given by `get_checkpoint`.
+        """
+        assert self.fpath is not None, "Only tables that are written to a file can continue from a checkpoint."
+
+        if self.file_format == 'parquet':
+            # Nothing is written yet
+            if checkpoint['parts'] == 0:
+                return
+
+            # Remove the Parquet files written after the checkpoint
+            for part_fpath in glob.glob(os.path.join(self.fpath, "part-*.parquet")):
+                if int(os.path.basename(part_fpath)[5:10]) >= checkpoint['parts']:
+                    os.remove(part_fpath)
+
+            self._num_parts = checkpoint['parts']
+        else:
+            # Nothing is written yet
+            if checkpoint['bytes'] == 0:
+                return
+
+            # Remove the rows written after the checkpoint
+            with open(self.fpath, 'r+b') as table_file:
+                table_file.truncate(checkpoint['bytes'])
+
+        self._flushed_rows = checkpoint['rows']
+        self._written = True
+
+    def close(self) -> None:
+        """Flushes the remaining rows."""
+        self.flush()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all rows as a Pandas DataFrame (only if no filepath is given).
+
+        Returns:
+            pd.DataFrame: Table with all rows.
+        """
+        assert self.fpath is None, "The rows are written to '{}', and are not kept in memory.".format(self.fpath)
+
+        self.flush()
+
+        if not self._chunks:
+            return pd.DataFrame({name: pd.Series(dtype = dtype) for name, dtype in self.columns.items()})
+
+        return pd.concat(self._chunks)
+
+def write_parquet_chunk(chunk: pd.DataFrame, fpath: str, bounds_columns: tuple = None, crs = None, compression: str = 'zstd') -> None:
+    """Writes a chunk of results to a compressed Parquet file, using compact data types.
+
+    Floats are stored as 32-bit floats, and integers as 32-bit integers. If bounds columns are given,
+    the bounds are (also) stored as a polygon geometry column, so the file can be read as GeoParquet.
+
+    Args:
+        chunk (pd.DataFrame): Chunk of results.
+        fpath (str): Filepath of Parquet file.
+        bounds_columns (tuple, optional): Columns (left, bottom, right, top) to store as geometry. Defaults to None.
+        crs (optional): CRS of the geometry. Defaults to None.
+        compression (str, optional): Compression codec. Defaults to 'zstd'.
+    """
+    # Use compact data types
+    chunk = chunk.astype({
+        name: np.float32 if pd.api.types.is_float_dtype(dtype) else np.int32
+        for name, dtype in chunk.dtypes.items()
+        if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype)
+    })
+
+    if bounds_columns is not None:
+        from geopandas import GeoDataFrame
+
+        left, bottom, right, top = (chunk[name] for name in bounds_columns)
+        geometry = [box(*bounds) for bounds in zip(left, bottom, right, top)]
+        chunk = GeoDataFrame(chunk, geometry = geometry, crs = crs)
+
+    chunk.to_parquet(fpath, compression = compression)
+
+def read_table(fpath: str, columns: list = None) -> pd.DataFrame:
+    """Reads a result table from a CSV file, or from a Parquet file or folder.
+
+    Args:
+        fpath (str): Filepath of CSV file, or of Parquet file or folder (as written by `ResultTable`).
+        columns (list, optional): Columns to read; only these are parsed. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: Result table.
+    """
+    assert os.path.exists(fpath), "The file '{}' does not exist.".format(fpath)
+
+    if os.path.isdir(fpath) or os.path.splitext(fpath)[1] == ".parquet":
+        from geopandas import read_parquet
+
+        # Read the geometry as well, if it is stored (and requested)
+        try:
+            return read_parquet(fpath, columns = columns)
+        except ValueError:
+            return pd.read_parquet(fpath, columns = columns)
+
+    return pd.read_csv(fpath, usecols = columns)
+
+def write_table(data: pd.DataFrame, fpath: str) -> None:
+    """Writes a result table to a CSV file, or to a Parquet file or folder (based on the filepath).
+
+    Args:
+        data (pd.DataFrame): Result table.
+        fpath (str): Filepath of CSV file, or of Parquet file or folder.
+    """
+    if os.path.isdir(fpath):
+        # Replace the Parquet files in the folder with a single file (only once it is written)
+        temporary_fpath = os.path.join(fpath, "table.parquet.tmp")
+        write_parquet_chunk(data, temporary_fpath)
+        for part_fpath in glob.glob(os.path.join(fpath, "part-*.parquet")):
+            os.remove(part_fpath)
+        os.rename(temporary_fpath, os.path.join(fpath, "part-00000.parquet"))
+    elif os.path.splitext(fpath)[1] == ".parquet":
+        write_parquet_chunk(data, fpath)
+    else:
+        data.to_csv(fpath)
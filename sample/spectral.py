@@ -1,11 +1,10 @@
 import os
+import warnings
 
 import numpy as np
 
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-
 import rasterio as rio
+from rasterio.windows import Window
 
 def centeroidnp(arr):
     length = arr.shape[0]
@@ -14,37 +13,279 @@ def centeroidnp(arr):
     return sum_x/length, sum_y/length
 
 def calculate_spectral_variance(raster_fpath):
+    """Calculates the spectral variance of a raster (see `calculate_spectral_variances`).
+
+    Args:
+        raster_fpath (str): Filepath of raster (.tif).
+
+    Returns:
+        float: Spectral variance.
+    """
     assert os.path.exists(raster_fpath), "The file '{}' does not exist.".format(raster_fpath)
     assert os.path.splitext(raster_fpath)[1] == ".tif", "The file should be in GeoTIFF format."
 
-    # Open raster
-    raster = rio.open(raster_fpath)
+    # Open raster and read bands as NumPy array
+    with rio.open(raster_fpath) as raster:
+        data = raster.read()
+
+    return float(calculate_spectral_variances(data[np.newaxis])[0])
+
+def calculate_spectral_variance_of_rasters(raster_fpaths: list, spectral_components: dict = None) -> np.ndarray:
+    """Calculates the spectral variance of a list of rasters, in batches of rasters with the same shape.
+
+    Args:
+        raster_fpaths (list): Filepaths of rasters (.tif).
+        spectral_components (dict, optional): Components to project on (see `calculate_projected_spectral_variances`).
+            Defaults to None (fit components per raster, see `calculate_spectral_variances`).
+
+    Returns:
+        np.ndarray: Spectral variance of every raster.
+    """
+    spectral_variances = np.full(len(raster_fpaths), np.nan)
+
+    # Read bands of rasters, grouped by shape
+    batches = {}
+    for raster_no, raster_fpath in enumerate(raster_fpaths):
+        assert os.path.splitext(raster_fpath)[1] == ".tif", "The file '{}' should be in GeoTIFF format.".format(raster_fpath)
+
+        with rio.open(raster_fpath) as raster:
+            data = raster.read()
+
+        batches.setdefault(data.shape, []).append((raster_no, data))
+
+    for batch in batches.values():
+        raster_nos, data = zip(*batch)
+        if spectral_components is None:
+            spectral_variances[list(raster_nos)] = calculate_spectral_variances(np.stack(data))
+        else:
+            spectral_variances[list(raster_nos)] = calculate_projected_spectral_variances(np.stack(data), spectral_components)
+
+    return spectral_variances
+
+def calculate_spectral_variances(data: np.ndarray, max_values: int = 2 ** 24) -> np.ndarray:
+    """Calculates the spectral variance of a batch of tiles at once.
+
+    For every tile, the bands are standardized per pixel, and the first two principal components
+    (with the bands as samples and the pixels as features) are found from the eigen decomposition of the
+    (bands x bands) Gram matrix. The spectral variance is the average distance based on these components,
+    as calculated by the original scikit-learn implementation (`StandardScaler` and `PCA(n_components = 2)`):
+    the signs of the components follow scikit-learn (largest absolute value positive), and the 'centroid'
+    is that of the first two pixels (see `centeroidnp`).
+
+    The tiles are processed in chunks of at most `max_values` values (at least one tile), which are standardized in place
+    in a single 64-bit working buffer, so the memory does not grow with the number of tiles.
+
+    Tiles with NaN values get a NaN spectral variance.
+
+    Args:
+        data (np.ndarray): Data of tiles (tiles, bands, height, width) or (tiles, bands, pixels).
+        max_values (int, optional): Maximum number of values (tiles x bands x pixels) of a chunk. Defaults to 2 ** 24 (128 MB).
 
-    # Read bands as NumPy array
-    data = raster.read()
+    Returns:
+        np.ndarray: Spectral variance of every tile.
+    """
+    assert data.ndim in [3, 4], "The data should have 3 or 4 dimensions, not {}.".format(data.ndim)
 
-    # Reshape
-    data_reshaped = np.reshape(data, (raster.count, data.shape[1] * data.shape[2]))
+    # Reshape to (tiles, bands, pixels)
+    data = data.reshape(data.shape[0], data.shape[1], -1)
 
-    # Standardizing the features
-    data_reshaped = StandardScaler().fit_transform(data_reshaped)
+    # Create the working buffer of a chunk of tiles
+    chunk_size = max(1, min(data.shape[0], max_values // (data.shape[1] * data.shape[2])))
+    buffer = np.empty((chunk_size,) + data.shape[1:], dtype = np.float64)
 
-    # Perform PCA
-    pca = PCA(n_components = 2)
+    spectral_variances = np.empty(data.shape[0])
 
-    # Store fitted PCA
-    result = pca.fit(data_reshaped).components_
+    for start in range(0, data.shape[0], chunk_size):
+        chunk = buffer[:min(chunk_size, data.shape[0] - start)]
+        chunk[...] = data[start:start + chunk_size]
+
+        spectral_variances[start:start + len(chunk)] = calculate_chunk_spectral_variances(chunk)
+
+    return spectral_variances
+
+def calculate_chunk_spectral_variances(data: np.ndarray) -> np.ndarray:
+    """Calculates the spectral variance of a chunk of tiles (see `calculate_spectral_variances`), overwriting the data.
+
+    Args:
+        data (np.ndarray): Data of tiles (tiles, bands, pixels), as 64-bit floats; it is standardized in place.
+
+    Returns:
+        np.ndarray: Spectral variance of every tile.
+    """
+    # Standardize every pixel over the bands (constant pixels are only centered)
+    data -= data.mean(axis = 1, keepdims = True)
+    scale = np.sqrt(np.einsum('nbp,nbp->np', data, data) / data.shape[1])[:, np.newaxis]
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1
+    data /= scale
+
+    # Center every pixel over the bands, as PCA does
+    data -= data.mean(axis = 1, keepdims = True)
+
+    # Find the first two left singular vectors from the Gram matrix (eigenvalues in ascending order)
+    gram = np.einsum('nbp,ncp->nbc', data, data)
+    eigenvalues, eigenvectors = np.linalg.eigh(np.nan_to_num(gram))
+    eigenvalues, eigenvectors = eigenvalues[:, :-3:-1], eigenvectors[:, :, :-3:-1]
+
+    # Calculate the components (right singular vectors)
+    singular_values = np.sqrt(np.clip(eigenvalues, 0, None))
+    singular_values[singular_values == 0] = 1
+    components = np.einsum('nbk,nbp->nkp', eigenvectors, data) / singular_values[:, :, np.newaxis]
+
+    # Flip the signs of the components, so the largest absolute value is positive
+    largest = np.take_along_axis(components, np.abs(components).argmax(axis = 2)[:, :, np.newaxis], axis = 2)
+    components *= np.where(largest < 0, -1, 1)
 
     # Calculate centroid
-    centroid = centeroidnp(result)
-
-    # Variable for summing distances
-    total_distance = 0
-    
-    # Calculate the distance from each point to the centroid
-    for i in range(0, result.shape[1]):
-        distance = ((result[0,i] - result[1,i])**2 + (centroid[0] - centroid[1])**2)**0.5
-        total_distance += distance
-
-    # Return average value
-    return total_distance / result.shape[1]
+    centroid = components[:, :, :2].mean(axis = 1)
+
+    # Calculate the distance for each pixel, and average
+    distances = np.sqrt((components[:, 0] - components[:, 1]) ** 2 + (centroid[:, :1] - centroid[:, 1:]) ** 2)
+
+    return distances.mean(axis = 1)
+
+def fit_spectral_components(raster_fpath: str, n_components: int = 2, strip_height: int = 1024) -> dict:
+    """Fits principal components of the bands over a whole raster, in one streaming pass over row strips.
+
+    The pixels are the samples and the bands the features. The covariance of the bands is accumulated
+    strip by strip (pixels with NaN or very negative values are ignored), after which the components of the standardized
+    bands are found from its eigen decomposition.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        n_components (int, optional): Number of components. Defaults to 2.
+        strip_height (int, optional): Number of rows read at once. Defaults to 1024.
+
+    Returns:
+        dict: Mean and standard deviation of every band ('mean', 'scale') and components ('components', (components, bands)).
+    """
+    assert os.path.exists(raster_fpath), "The file '{}' does not exist.".format(raster_fpath)
+
+    with rio.open(raster_fpath) as raster:
+        assert 0 < n_components <= raster.count, "The number of components should be between 1 and {}.".format(raster.count)
+
+        count = 0
+        sums = np.zeros(raster.count)
+        products = np.zeros((raster.count, raster.count))
+
+        for row_off in range(0, raster.height, strip_height):
+            window = Window(col_off = 0, row_off = row_off, width = raster.width, height = min(strip_height, raster.height - row_off))
+            strip_data = raster.read(window = window).reshape(raster.count, -1).astype(np.float64)
+
+            # Ignore pixels with NaN or very negative values
+            # NOTE: With (supposedly) rasterio, the NaN values are assigned the largest possible negative value
+            with np.errstate(invalid = 'ignore'):
+                strip_data = strip_data[:, np.all(np.isfinite(strip_data) & ~(strip_data < -10_000_000), axis = 0)]
+
+            count += strip_data.shape[1]
+            sums += strip_data.sum(axis = 1)
+            products += strip_data @ strip_data.T
+
+    assert count > 1, "The raster '{}' has too few pixels without NaN or very negative values.".format(raster_fpath)
+
+    # Calculate the covariance of the bands
+    mean = sums / count
+    covariance = (products - count * np.outer(mean, mean)) / count
+
+    # Standardize the covariance (constant bands are only centered)
+    scale = np.sqrt(np.clip(np.diag(covariance), 0, None))
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1
+    correlation = covariance / np.outer(scale, scale)
+
+    # Find the components with the largest eigenvalues
+    _, eigenvectors = np.linalg.eigh(correlation)
+    components = eigenvectors[:, ::-1][:, :n_components].T
+
+    # Flip the signs of the components, so the largest absolute value is positive
+    components *= np.where(components[np.arange(n_components), np.abs(components).argmax(axis = 1)] < 0, -1, 1)[:, np.newaxis]
+
+    return {
+        'mean': mean,
+        'scale': scale,
+        'components': components
+    }
+
+def calculate_projected_spectral_variances(data: np.ndarray, spectral_components: dict) -> np.ndarray:
+    """Calculates the spectral variance of a batch of tiles, projected on fixed components (see `fit_spectral_components`).
+
+    The pixels of every tile are standardized and projected on the components; the spectral variance is
+    the average distance of the projected pixels to their centroid. Unlike `calculate_spectral_variances`,
+    the values can be compared between tiles. Pixels with NaN or very negative values are ignored, as in the fit.
+
+    Args:
+        data (np.ndarray): Data of tiles (tiles, bands, height, width) or (tiles, bands, pixels).
+        spectral_components (dict): Fitted components, as given by `fit_spectral_components`.
+
+    Returns:
+        np.ndarray: Spectral variance of every tile.
+    """
+    assert data.ndim in [3, 4], "The data should have 3 or 4 dimensions, not {}.".format(data.ndim)
+    assert data.shape[1] == len(spectral_components['mean']), "The tiles have {} bands, but the components are fitted on {} bands.".format(
+        data.shape[1], len(spectral_components['mean']))
+
+    # Reshape to (tiles, bands, pixels)
+    data = data.reshape(data.shape[0], data.shape[1], -1).astype(np.float64)
+
+    # Treat very negative values as NaN, so these pixels are ignored
+    with np.errstate(invalid = 'ignore'):
+        data[data < -10_000_000] = np.nan
+
+    # Standardize the bands and project the pixels
+    data = (data - spectral_components['mean'][:, np.newaxis]) / spectral_components['scale'][:, np.newaxis]
+    projected = np.einsum('kb,nbp->nkp', spectral_components['components'], data)
+
+    # Calculate the distance of each pixel to the centroid, and average (pixels with NaN values are NaN in every component)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category = RuntimeWarning)
+
+        centroid = np.nanmean(projected, axis = 2, keepdims = True)
+        distances = np.sqrt(np.sum((projected - centroid) ** 2, axis = 1))
+
+        return np.nanmean(distances, axis = 1)
+
+def calculate_strip_spectral_variances(raster_fpath: str, row_off: int, tile_width: int, tile_height: int, tile_rows: int = 1, spectral_components: dict = None, max_values: int = 2 ** 24) -> dict:
+    """Calculates the spectral variance of the tiles in a row strip of a raster, without tile files.
+
+    The tiles at the right and bottom edge are clipped to the raster, like the tiles of `tile_raster` without padding.
+    The tiles are stacked and calculated in chunks of at most `max_values` values, so only the strip itself is kept in memory.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        row_off (int): Row offset of strip.
+        tile_width (int): Tile width (in pixels).
+        tile_height (int): Tile height (in pixels).
+        tile_rows (int, optional): Number of tile rows in strip. Defaults to 1.
+        spectral_components (dict, optional): Components to project on (see `calculate_projected_spectral_variances`).
+            Defaults to None (fit components per tile, see `calculate_spectral_variances`).
+        max_values (int, optional): Maximum number of values (tiles x bands x pixels) of a chunk. Defaults to 2 ** 24.
+
+    Returns:
+        dict: Spectral variance (value) of every tile by offsets (col_off, row_off) (key).
+    """
+    with rio.open(raster_fpath) as raster:
+        window = Window(col_off = 0, row_off = row_off, width = raster.width, height = min(tile_rows * tile_height, raster.height - row_off))
+        strip_data = raster.read(window = window)
+
+    # Cut the strip into tiles, grouped by shape
+    batches = {}
+    for tile_row_off in range(0, strip_data.shape[1], tile_height):
+        for col_off in range(0, strip_data.shape[2], tile_width):
+            tile_data = strip_data[:, tile_row_off:tile_row_off + tile_height, col_off:col_off + tile_width]
+            batches.setdefault(tile_data.shape, []).append(((col_off, row_off + tile_row_off), tile_data))
+
+    spectral_variances = {}
+
+    for batch in batches.values():
+        offsets, data = zip(*batch)
+
+        # Stack the tiles of the same shape in chunks (of at least one tile)
+        chunk_size = max(1, max_values // data[0].size)
+
+        for start in range(0, len(data), chunk_size):
+            chunk = np.stack(data[start:start + chunk_size])
+
+            if spectral_components is None:
+                spectral_variances.update(zip(offsets[start:start + chunk_size], calculate_spectral_variances(chunk, max_values)))
+            else:
+                spectral_variances.update(zip(offsets[start:start + chunk_size], calculate_projected_spectral_variances(chunk, spectral_components)))
+
+    return spectral_variances
@@ -1,12 +1,21 @@
 import os
 import argparse
+import json
 import re
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+import numpy as np
 import pandas as pd
+import rasterio as rio
 
 from tqdm import tqdm
 
-from sample.spectral import calculate_spectral_variance
+from sample.spectral import calculate_spectral_variance_of_rasters, fit_spectral_components, calculate_strip_spectral_variances
+from sample.raster import get_tile_grid_bounds, STRIP_HEIGHT
+from sample.results import ResultTable, read_table, write_table
 
 def main():
     # Set up argument parser
@@ -18,13 +27,62 @@ def main():
         help='Folder with tiles'
     )
 
+    ## TILE DIMENSION
+    parser.add_argument('-d', '--dimension',
+        type = int,
+        help = 'Dimension of tiles (in metres); if given, the tiles are read as windows of the raster instead of from the folder of tiles',
+        default = None
+    )
+
     ## CSV
     parser.add_argument('-c', '--csv',
         type = str,
-        help='Filepath to CSV of tiles',
+        help='Filepath to CSV (or Parquet file or folder) of tiles',
         default='output/tile_dimension_1000.csv'
     )
 
+    ## MODE
+    parser.add_argument('-m', '--mode',
+        type = str,
+        choices = ['tile', 'global'],
+        help = 'Fit principal components per tile (tile), or once over the whole raster and project each tile on them (global)',
+        default = 'tile'
+    )
+
+    ## RASTER
+    parser.add_argument('-r', '--raster',
+        type = str,
+        help = 'Filepath of raster to fit the principal components over (global mode), and to read the tiles from (with a dimension)'
+    )
+
+    ## NUMBER OF COMPONENTS
+    parser.add_argument('-nc', '--n-components',
+        type = int,
+        help = 'Number of principal components (global mode)',
+        default = 2
+    )
+
+    ## BATCH SIZE
+    parser.add_argument('-b', '--batch-size',
+        type = int,
+        help = 'Number of tiles processed at once',
+        default = 64
+    )
+
+    ## WORKERS
+    parser.add_argument('-w', '--workers',
+        type = int,
+        help = 'Number of worker processes',
+        default = 1
+    )
+
+    ## CACHE
+    parser.add_argument('-ca', '--cache',
+        type = str,
+        help = 'Filepath of result cache (CSV); tiles that did not change since the previous run are not processed again',
+        default = None
+    )
+
     ## VERBOSITY
     parser.add_argument('-v', '--verbose',
         help = 'Verbose output',
@@ -33,8 +91,8 @@ def main():
 
     args = parser.parse_args()
 
-    # Open CSV
-    data = pd.read_csv(args.csv)
+    # Open CSV (or Parquet)
+    data = read_table(args.csv)
 
     # TODO: Refactor
     # Sorting function
@@ -43,29 +101,211 @@ def main():
         alphanum_key = lambda key: [ convert(c) for c in re.split('([0-9]+)', key) ] 
         return sorted(data, key=alphanum_key)
 
-    # Loop through all tiles in folder
-    tile_fnames = sorted_alphanumeric(os.listdir(args.tiles))
+    # Fit the principal components over the whole raster (global mode)
+    spectral_components = None
+    if args.mode == 'global':
+        assert args.raster is not None, "A raster is required to fit the principal components over."
+        spectral_components = fit_spectral_components(args.raster, n_components = args.n_components)
+
+    # Read the tiles as windows of the raster, and join them to the table by their bounds
+    if args.dimension is not None:
+        assert args.raster is not None, "A raster is required to read the tiles from."
+
+        spectral_variances = create_window_spectral_variances(
+            raster_fpath = args.raster,
+            dimension = args.dimension,
+            spectral_components = spectral_components,
+            workers = args.workers
+        )
+
+        data = data.merge(spectral_variances, how = 'inner', on = ['x1', 'x2', 'y1', 'y2'])
+
+        # Write result to CSV (or Parquet)
+        write_table(data, args.csv)
+        return
+
+    # List all tiles (.tif files) in folder
+    tile_fpaths = [os.path.join(args.tiles, tile_fname) for tile_fname in sorted_alphanumeric(os.listdir(args.tiles))]
+    tile_fpaths = [f for f in tile_fpaths if os.path.isfile(f) and os.path.splitext(f)[1] == '.tif']
+
+    # Parameters that the spectral variances depend on
+    parameters = get_cache_parameters(args.mode, args.raster, args.n_components)
+
+    # Look up the spectral variances of tiles that did not change
+    cache = read_cache(args.cache) if args.cache is not None and os.path.exists(args.cache) else {}
+    cache_keys = [get_cache_key(f, parameters) for f in tile_fpaths]
+    new_fpaths = [f for f, cache_key in zip(tile_fpaths, cache_keys) if cache_key not in cache]
+
+    if args.verbose and args.cache is not None:
+        print("{} of {} tiles are found in the cache.".format(len(tile_fpaths) - len(new_fpaths), len(tile_fpaths)))
+
+    # Split the other tiles into batches
+    batches = [new_fpaths[batch_start:batch_start + args.batch_size] for batch_start in range(0, len(new_fpaths), args.batch_size)]
+
+    # NOTE: The worker processes are shut down when leaving the context, also after an exception.
+    with ProcessPoolExecutor(max_workers = args.workers) if args.workers > 1 else nullcontext() as executor:
+        if executor is not None:
+            batch_spectral_variances = executor.map(calculate_spectral_variance_of_rasters, batches, repeat(spectral_components))
+        else:
+            batch_spectral_variances = map(calculate_spectral_variance_of_rasters, batches, repeat(spectral_components))
 
-    # Create list for spectral variances
-    spectral_variances = pd.DataFrame(columns = ["filename", "spectral_variance"])
+        # Calculate spectral variances of batches of tiles
+        for batch_fpaths, spectral_variances in tqdm(zip(batches, batch_spectral_variances), total = len(batches), desc = "Processing tiles..."):
+            for f, spectral_variance in zip(batch_fpaths, spectral_variances):
+                cache[get_cache_key(f, parameters)] = spectral_variance
 
-    for tile_no in tqdm(range(len(tile_fnames)), desc = "Processing tiles..."):
-        # Join path of folder and tile filename
-        f = os.path.join(args.tiles, tile_fnames[tile_no])
+    # Rewrite the cache with the current tiles only, so the entries of deleted tiles or other parameters do not pile up
+    if args.cache is not None:
+        write_cache({cache_key: cache[cache_key] for cache_key in cache_keys}, args.cache)
 
-        # Check if .tif file exists
-        if os.path.isfile(f) and os.path.splitext(f)[1] == '.tif':
-            # Read tile
-            spectral_variances = spectral_variances.append({
-                'filename': f, 
-                'spectral_variance': calculate_spectral_variance(f)
-                }, ignore_index=True)
+    # Create table for spectral variances
+    spectral_variances = ResultTable({"filename": object, "spectral_variance": np.float64})
+
+    for f, cache_key in zip(tile_fpaths, cache_keys):
+        spectral_variances.append({
+            'filename': f, 
+            'spectral_variance': cache[cache_key]
+            })
 
     # Add spectral variance values to DataFrame
-    data = data.merge(spectral_variances, how='inner', on='filename')
+    data = data.merge(spectral_variances.to_dataframe(), how='inner', on='filename')
+
+    # Write result to CSV (or Parquet)
+    write_table(data, args.csv)
+
+def create_window_spectral_variances(raster_fpath: str, dimension: int, spectral_components: dict = None, workers: int = 1) -> pd.DataFrame:
+    """Calculates the spectral variance of every tile of a raster, reading the tiles as windows of the raster.
+
+    The tiles and their bounds (x1, x2, y1, y2) are the same as those of the `aggregate` command, so the
+    result can be joined to its table.
+
+    Args:
+        raster_fpath (str): Filepath of raster.
+        dimension (int): Dimension of tiles (in metres).
+        spectral_components (dict, optional): Components to project on (global mode). Defaults to None.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: Bounds and spectral variance of every tile.
+    """
+    with rio.open(raster_fpath) as raster:
+        # Calculate the tile size (in pixels), as the aggregate command does
+        cell_size_x, cell_size_y = raster.res
+        tile_width, tile_height = int(dimension / cell_size_x), int(dimension / cell_size_y)
+
+        x_bounds, y_bounds = get_tile_grid_bounds(raster, tile_width, tile_height)
+        raster_height = raster.height
+
+    # Read strips of whole tile rows
+    tile_rows = max(1, STRIP_HEIGHT // tile_height)
+    strip_offsets = list(range(0, raster_height, tile_rows * tile_height))
+    arguments = (repeat(raster_fpath), strip_offsets, repeat(tile_width), repeat(tile_height), repeat(tile_rows), repeat(spectral_components))
+
+    # Create table for spectral variances
+    columns = {name: np.int64 for name in ['x1', 'x2', 'y1', 'y2']}
+    columns['spectral_variance'] = np.float64
+    spectral_variances = ResultTable(columns)
+
+    # NOTE: The worker processes are shut down when leaving the context, also after an exception.
+    with ProcessPoolExecutor(max_workers = workers) if workers > 1 else nullcontext() as executor:
+        if executor is not None:
+            strip_spectral_variances = executor.map(calculate_strip_spectral_variances, *arguments)
+        else:
+            strip_spectral_variances = map(calculate_strip_spectral_variances, *arguments)
+
+        for strip in tqdm(strip_spectral_variances, total = len(strip_offsets), desc = "Processing strips..."):
+            for (col_off, row_off), spectral_variance in strip.items():
+                tile_x, tile_y = col_off // tile_width, row_off // tile_height
+
+                spectral_variances.append({
+                    'x1': x_bounds[tile_x, 0],
+                    'x2': x_bounds[tile_x, 1],
+                    'y1': y_bounds[tile_y, 0],
+                    'y2': y_bounds[tile_y, 1],
+                    'spectral_variance': spectral_variance
+                })
+
+    return spectral_variances.to_dataframe()
+
+def get_cache_parameters(mode: str, raster_fpath: str = None, n_components: int = 2) -> str:
+    """Describes the parameters that the spectral variances depend on, for use in cache keys.
+
+    In the global mode, the raster the components are fitted over is identified by its path, size and modification time.
+
+    Args:
+        mode (str): Mode ('tile' or 'global').
+        raster_fpath (str, optional): Filepath of raster (global mode). Defaults to None.
+        n_components (int, optional): Number of principal components (global mode). Defaults to 2.
+
+    Returns:
+        str: Parameters (JSON).
+    """
+    parameters = {'mode': mode}
+
+    if mode == 'global':
+        raster_stat = os.stat(raster_fpath)
+        parameters.update({
+            'raster': os.path.abspath(raster_fpath),
+            'raster_size': raster_stat.st_size,
+            'raster_mtime': raster_stat.st_mtime_ns,
+            'n_components': n_components,
+            # Pixels with values below this are ignored in the fit (earlier results are not reused)
+            'nodata_threshold': -10_000_000
+        })
+
+    return json.dumps(parameters, sort_keys = True)
+
+def get_cache_key(tile_fpath: str, parameters: str) -> tuple:
+    """Creates the cache key of a tile: its path, size and modification time, and the parameters.
+
+    Args:
+        tile_fpath (str): Filepath of tile.
+        parameters (str): Parameters, as given by `get_cache_parameters`.
+
+    Returns:
+        tuple: Cache key.
+    """
+    tile_stat = os.stat(tile_fpath)
+    return (os.path.abspath(tile_fpath), tile_stat.st_size, tile_stat.st_mtime_ns, parameters)
+
+def read_cache(fpath: str) -> dict:
+    """Reads a cache of spectral variances (CSV).
+
+    Args:
+        fpath (str): Filepath of cache.
+
+    Returns:
+        dict: Spectral variances (value) by cache key (key, see `get_cache_key`).
+    """
+    cache = pd.read_csv(fpath, dtype = {'path': str, 'size': np.int64, 'mtime': np.int64, 'parameters': str}, float_precision = 'round_trip')
+
+    keys = zip(cache['path'], cache['size'], cache['mtime'], cache['parameters'])
+    return dict(zip(keys, cache['spectral_variance']))
+
+def write_cache(cache: dict, fpath: str) -> None:
+    """Writes a cache of spectral variances (CSV).
+
+    Args:
+        cache (dict): Spectral variances (value) by cache key (key, see `get_cache_key`).
+        fpath (str): Filepath of cache.
+    """
+    cache_table = ResultTable({
+        'path': object,
+        'size': np.int64,
+        'mtime': np.int64,
+        'parameters': object,
+        'spectral_variance': np.float64
+    }, fpath = fpath)
 
-    # Write result to CSV
-    data.to_csv(args.csv)
+    with cache_table:
+        for (path, size, mtime, parameters), spectral_variance in cache.items():
+            cache_table.append({
+                'path': path,
+                'size': size,
+                'mtime': mtime,
+                'parameters': parameters,
+                'spectral_variance': spectral_variance
+            })
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -4,7 +4,7 @@ import argparse
 
 import rasterio as rio
 
-from sample.raster import add_padding_to_raster, tile_raster, delete_single_value_tiles
+from sample.raster import add_padding_to_raster, tile_raster
 
 def main():
     # Set up argument parser
@@ -30,38 +30,96 @@ def main():
         default=5000
     )
 
+    ## PADDING
+    parser.add_argument('-p', '--padding',
+        type = str,
+        choices = ['virtual', 'file', 'none'],
+        help = 'Pad the edge tiles while reading (virtual), write a padded raster first (file), or do not pad (none)',
+        default = 'virtual'
+    )
+
+    ## FILL VALUE
+    parser.add_argument('-fv', '--fill-value',
+        type = float,
+        help = 'Value of the padding',
+        default = 0
+    )
+
+    ## COMPRESSION
+    parser.add_argument('-c', '--compression',
+        type = str,
+        help = "Compression of tiles (e.g. 'deflate', 'lzw', 'zstd' or 'none')",
+        default = 'deflate'
+    )
+
+    ## PREDICTOR
+    parser.add_argument('-pr', '--predictor',
+        type = int,
+        choices = [1, 2, 3],
+        help = 'Predictor of compression (default: based on data type)',
+        default = None
+    )
+
+    ## BLOCK SIZE
+    parser.add_argument('-bs', '--block-size',
+        type = int,
+        help = 'Size of internal blocks of tiles (in pixels)',
+        default = 256
+    )
+
+    ## WORKERS
+    parser.add_argument('-w', '--workers',
+        type = int,
+        help = 'Number of worker processes writing tiles',
+        default = 1
+    )
+
+    ## INDEX
+    parser.add_argument('-i', '--index',
+        type = str,
+        help = 'Filepath of tile index (CSV) to write instead of tile files',
+        default = None
+    )
+
     ## VERBOSITY
     parser.add_argument('-v', '--verbose',
         help='Verbose output'
     )
     args = parser.parse_args()
 
-    padded_raster_filepath = "data/intermediate/padded_raster_{}.tif".format(args.dimension)
+    raster_filepath = args.raster
+
+    # Add padding to raster (only if a padded raster file is requested)
+    if args.padding == 'file':
+        raster_filepath = "data/intermediate/padded_raster_{}.tif".format(args.dimension)
 
-    # Add padding to raster
-    add_padding_to_raster(
-        raster_in = args.raster,
-        raster_out = padded_raster_filepath,
-        dimension = args.dimension
-        )
+        add_padding_to_raster(
+            raster_in = args.raster,
+            raster_out = raster_filepath,
+            dimension = args.dimension,
+            fill_value = args.fill_value
+            )
 
     # Create folder for tiles
     tiles_folder_path = os.path.join("data/intermediate/tiles", "dimension_{}".format(args.dimension))
     if not os.path.exists(tiles_folder_path):
         os.makedirs(tiles_folder_path)
 
-    # Tile raster
+    # Tile raster, without the tiles that have a single value
     tile_raster(
-        raster_in = padded_raster_filepath,
+        raster_in = raster_filepath,
         raster_out = tiles_folder_path,
         dimension = args.dimension,
+        padding = args.padding == 'virtual',
+        fill_value = args.fill_value,
+        compression = None if args.compression == 'none' else args.compression,
+        predictor = args.predictor,
+        block_size = args.block_size,
+        workers = args.workers,
+        index_fpath = args.index,
+        prune = True,
         verbose = args.verbose
     )
 
-    # Delete single-value rasters
-    delete_single_value_tiles(
-        tiles_folder = "data/intermediate/tiles"
-    )
-
 if __name__ == '__main__':
     main()
\ No newline at end of file
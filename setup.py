@@ -14,16 +14,20 @@ setup(
         'gdal',
         'alive_progress'
     ],
+    extras_require={
+        'parquet': ['pyarrow']
+    },
     entry_points={
         'console_scripts': [
             'aggregate = sample.aggregating:main',
             'name-bands = sample.naming_bands:main',
             'spectral-heterogeneity = sample.spectral_heterogeneity:main',
-            'create-polygon = sample.creating_polygon:main' 
+            'create-polygon = sample.creating_polygon:main',
+            'focal-statistics = sample.focal:main'
             ],
     },
     setup_requires=[
         'pytest-runner'
         ],
-    tests_require=['pytest'],
+    tests_require=['pytest', 'scikit-learn'],
 )
\ No newline at end of file
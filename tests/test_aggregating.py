@@ -0,0 +1,274 @@
+import re
+
+import numpy as np
+import pytest
+import rasterio as rio
+
+from rasterio.transform import from_origin
+
+from sample.aggregating import create_tile_grid_partials, create_tile_data_from_partials, create_tile_validity_map, create_virtual_tile_grid_data, get_band_ranges
+from sample.data_analysis import calculate_class_means_from_partials, calculate_quantile_from_histograms, create_histogram_bin_edges, merge_tile_grid_partials
+from sample.filters import create_tile_filters
+
+# Fixture raster: 6 bands (the last is land use) of 55 x 45 pixels, in tiles of 10 x 10 pixels (the edge tiles are clipped),
+# with internal blocks of 16 x 16 pixels
+LAND_USE_BAND = 6
+TILE_SIZE = 10
+LAND_USE_CLASSES = ['clouds/shadows', 'urban', 'bare_soil', 'other_crops', 'trees', 'grassland', 'water']
+
+# Tile with some very negative (nodata) values in the second band
+NODATA_TILE = (0, 20)
+
+# Tiles (col_off, row_off) that the filters skip, by reason, in the raster of `filtered_raster_fpath`
+# with a cloud fraction of 0.5 and a minimum of 2 points (see `get_point_counts`)
+SKIPPED_TILES = {
+    (0, 0): 'nan',              # land use band
+    (10, 0): 'very negative',   # land use band
+    (20, 0): 'clouds',          # only 'clouds/shadows'
+    (30, 0): 'nan',             # second band
+    (40, 0): 'very negative',   # fourth band
+    (50, 0): 'nan',             # first band, of a clipped edge tile
+    (0, 10): 'no points',       # also NaN in the land use band
+    (10, 10): 'clouds',         # 60% 'clouds/shadows', also NaN in the second band
+    (20, 40): 'no points'       # clipped edge tile
+}
+
+# Statistics of the engines agree within this tolerance (see `create_tile_grid_data`): one unit of the rounding (1e-3),
+# as the tile engine rounds 32-bit floats, plus their error
+TOLERANCE = 1.5e-3
+
+@pytest.fixture(scope = 'module')
+def lut_fpath(tmp_path_factory):
+    fpath = str(tmp_path_factory.mktemp('lut') / 'classes.txt')
+    with open(fpath, 'w') as lut_file:
+        lut_file.write("\n".join("{}={}".format(class_no, name) for class_no, name in enumerate(LAND_USE_CLASSES)))
+
+    return fpath
+
+def create_raster_data() -> np.ndarray:
+    """Creates the bands of a small raster, with scattered NaN values and some very negative (nodata) values."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(500, 100, size = (6, 45, 55)).astype(np.float32)
+
+    # Land use classes, without 'clouds/shadows'
+    data[LAND_USE_BAND - 1] = rng.integers(1, len(LAND_USE_CLASSES), size = (45, 55))
+
+    # Scattered NaN values
+    data[rng.integers(0, 6, 20), rng.integers(0, 45, 20), rng.integers(0, 55, 20)] = np.nan
+
+    col_off, row_off = NODATA_TILE
+    data[1, row_off + 2, col_off + 3:col_off + 8] = -3e38
+
+    return data
+
+def write_raster(fpath: str, data: np.ndarray) -> str:
+    with rio.open(fpath, 'w', driver = 'GTiff', width = data.shape[2], height = data.shape[1], count = data.shape[0],
+        dtype = 'float32', crs = 'EPSG:32626', transform = from_origin(500000, 4200000, 10, 10),
+        tiled = True, blockxsize = 16, blockysize = 16) as raster:
+        raster.write(data)
+
+    return fpath
+
+@pytest.fixture(scope = 'module')
+def raster_fpath(tmp_path_factory):
+    return write_raster(str(tmp_path_factory.mktemp('aggregating') / 'raster.tif'), create_raster_data())
+
+@pytest.fixture(scope = 'module')
+def filtered_raster_fpath(tmp_path_factory):
+    """Writes the raster of `raster_fpath`, with tiles that the filters skip (see `SKIPPED_TILES`)."""
+    data = create_raster_data()
+
+    data[LAND_USE_BAND - 1, 0:10, 0:10] = np.nan
+    data[LAND_USE_BAND - 1, 0:10, 10:20] = -3e38
+    data[LAND_USE_BAND - 1, 0:10, 20:30] = 0
+    data[1, 0:10, 30:40] = np.nan
+    data[3, 0:10, 40:50] = -3e38
+    data[0, 0:10, 50:55] = np.nan
+    data[LAND_USE_BAND - 1, 10:20, 0:10] = np.nan
+    data[LAND_USE_BAND - 1, 10:16, 10:20] = 0
+    data[1, 10:20, 10:20] = np.nan
+
+    return write_raster(str(tmp_path_factory.mktemp('aggregating') / 'filtered_raster.tif'), data)
+
+def get_point_counts() -> np.ndarray:
+    """Number of points per tile of the fixture rasters, for the tiles in `SKIPPED_TILES`."""
+    point_counts = np.full((5, 6), 2)
+    point_counts[1, 0] = 1
+    point_counts[4, 2] = 0
+
+    return point_counts
+
+def read_strip_engine(raster_fpath: str, lut_fpath: str, included_statistics: list, tile_size: int = TILE_SIZE, verbose = False, **kwargs) -> dict:
+    with rio.open(raster_fpath) as raster:
+        partials = create_tile_grid_partials(raster, tile_size, tile_size, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath,
+            tile_filters = kwargs.get('tile_filters'))
+
+    return dict(create_tile_data_from_partials(partials, tile_size, tile_size, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath,
+        included_statistics = included_statistics, verbose = verbose, **kwargs))
+
+def read_tile_engine(raster_fpath: str, lut_fpath: str, included_statistics: list, tile_size: int = TILE_SIZE, verbose = False, **kwargs) -> dict:
+    with rio.open(raster_fpath) as raster:
+        return dict(create_virtual_tile_grid_data(raster, tile_size, tile_size, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath,
+            included_statistics = included_statistics, verbose = verbose, **kwargs))
+
+def parse_skipped_tiles(output: str) -> dict:
+    """Finds the skip reasons by tile offsets in the verbose output of the engines."""
+    return {
+        (int(col_off), int(row_off)): reason
+        for col_off, row_off, reason in re.findall(r"Tile \((\d+),(\d+)\) is skipped \((.+)\)\.", output)
+    }
+
+def test_strip_engine_equals_tile_engine(raster_fpath, lut_fpath):
+    included_statistics = ['mean', 'minimum', 'maximum', 'range', 'coefficient_of_variation']
+    strip_results = read_strip_engine(raster_fpath, lut_fpath, included_statistics)
+    tile_results = read_tile_engine(raster_fpath, lut_fpath, included_statistics)
+
+    # The same tiles, in the same order
+    assert list(strip_results) == list(tile_results)
+
+    for offset, tile_statistics in tile_results.items():
+        strip_statistics = strip_results[offset]
+        assert list(strip_statistics) == list(tile_statistics)
+
+        for name, value in tile_statistics.items():
+            # The statistics of the band with very negative values differ as documented, except for the maximum
+            if offset == NODATA_TILE and name.startswith("band 2 - ") and name != "band 2 - maximum":
+                continue
+            assert strip_statistics[name] == pytest.approx(value, abs = TOLERANCE, nan_ok = True), "{} of tile {}".format(name, offset)
+
+def test_nodata_tile_differences(raster_fpath, lut_fpath):
+    included_statistics = ['mean', 'minimum', 'maximum']
+    strip_statistics = read_strip_engine(raster_fpath, lut_fpath, included_statistics)[NODATA_TILE]
+    tile_statistics = read_tile_engine(raster_fpath, lut_fpath, included_statistics)[NODATA_TILE]
+
+    # The 32-bit statistics of the tile engine overflow, the 64-bit statistics of the strip engine do not
+    assert tile_statistics["band 2 - mean"] == -np.inf
+    assert -np.inf < strip_statistics["band 2 - mean"] < -10_000_000
+    assert tile_statistics["band 2 - minimum"] == -np.inf
+    assert strip_statistics["band 2 - minimum"] == pytest.approx(float(np.float32(-3e38)))
+    assert strip_statistics["band 2 - maximum"] == pytest.approx(tile_statistics["band 2 - maximum"], abs = TOLERANCE)
+
+def test_merged_partials_equal_direct_partials(raster_fpath, lut_fpath):
+    with rio.open(raster_fpath) as raster:
+        partials = create_tile_grid_partials(raster, TILE_SIZE, TILE_SIZE, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath, class_means = True)
+        direct_partials = create_tile_grid_partials(raster, 2 * TILE_SIZE, 3 * TILE_SIZE, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath, class_means = True)
+
+    # Merge the tiles into tiles of 2 x 3 tiles (the edge tiles are clipped)
+    merged_partials = merge_tile_grid_partials(partials, 2, 3)
+
+    assert set(merged_partials) == set(direct_partials)
+    for name, values in direct_partials.items():
+        assert merged_partials[name].shape == values.shape, name
+        np.testing.assert_allclose(merged_partials[name], values, rtol = 1e-9, equal_nan = True, err_msg = name)
+
+    # The statistics of the merged tiles are those of the tiles read directly
+    included_statistics = ['mean', 'minimum', 'maximum', 'range', 'coefficient_of_variation']
+    merged_results = dict(create_tile_data_from_partials(merged_partials, 2 * TILE_SIZE, 3 * TILE_SIZE, land_use_band = LAND_USE_BAND,
+        lut_fpath = lut_fpath, included_statistics = included_statistics, verbose = False))
+    direct_results = dict(create_tile_data_from_partials(direct_partials, 2 * TILE_SIZE, 3 * TILE_SIZE, land_use_band = LAND_USE_BAND,
+        lut_fpath = lut_fpath, included_statistics = included_statistics, verbose = False))
+
+    assert merged_results.keys() == direct_results.keys()
+    for offset, direct_statistics in direct_results.items():
+        assert merged_results[offset] == pytest.approx(direct_statistics, nan_ok = True), "tile {}".format(offset)
+
+def test_rolled_up_quantiles(raster_fpath, lut_fpath, monkeypatch):
+    # Read a single tile row per strip, so the rows of the larger tiles are completed across strips
+    monkeypatch.setattr('sample.aggregating.STRIP_HEIGHT', TILE_SIZE)
+
+    factors = [(1, 1), (2, 3)]
+    quantiles = {'median': 0.5, 'p5': 0.05, 'p95': 0.95}
+
+    with rio.open(raster_fpath) as raster:
+        bin_edges = create_histogram_bin_edges(*get_band_ranges(raster), num_bins = 64)
+        partials = create_tile_grid_partials(raster, TILE_SIZE, TILE_SIZE, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath, bin_edges = bin_edges)
+        rolled_up_partials = create_tile_grid_partials(raster, TILE_SIZE, TILE_SIZE, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath,
+            bin_edges = bin_edges, histogram_factors = factors, quantile_statistics = list(quantiles))
+        data = raster.read()
+
+    # The histograms are not kept
+    assert 'histogram' not in rolled_up_partials
+
+    # Leave out the very negative (nodata) values, like the histograms
+    data[data < -10_000_000] = np.nan
+    bin_widths = (bin_edges[:, -1] - bin_edges[:, 0]) / 64
+
+    for factor_x, factor_y in factors:
+        histograms = merge_tile_grid_partials({'histogram': partials['histogram']}, factor_x, factor_y)['histogram']
+        tile_width, tile_height = factor_x * TILE_SIZE, factor_y * TILE_SIZE
+
+        for statistic, quantile in quantiles.items():
+            estimates = rolled_up_partials['quantiles'][(factor_x, factor_y)][statistic]
+
+            # The quantiles are those of the histograms, merged after reading
+            np.testing.assert_array_equal(estimates, calculate_quantile_from_histograms(histograms, bin_edges, quantile))
+
+            # ...and are within one bin width of the values ranked directly below and above them
+            for tile_y, tile_x in np.ndindex(estimates.shape[1:]):
+                tile_data = data[:, tile_y * tile_height:(tile_y + 1) * tile_height, tile_x * tile_width:(tile_x + 1) * tile_width].reshape(data.shape[0], -1)
+                below = np.nanquantile(tile_data, quantile, axis = 1, method = 'lower')
+                above = np.nanquantile(tile_data, quantile, axis = 1, method = 'higher')
+                assert np.all((below - bin_widths <= estimates[:, tile_y, tile_x]) & (estimates[:, tile_y, tile_x] <= above + bin_widths)), \
+                    "{} of tile ({}, {})".format(statistic, tile_x, tile_y)
+
+@pytest.mark.parametrize('read_engine', [read_strip_engine, read_tile_engine])
+def test_skip_reasons(filtered_raster_fpath, lut_fpath, read_engine, capsys):
+    tile_filters = create_tile_filters(cloud_fraction = 0.5, min_points = 2)
+    results = read_engine(filtered_raster_fpath, lut_fpath, ['mean'], verbose = True, tile_filters = tile_filters, point_counts = get_point_counts())
+
+    # The skipped tiles have no statistics, and are skipped for the reason of the first filter that fails
+    assert {offset for offset, statistics in results.items() if statistics is False} == set(SKIPPED_TILES)
+    assert parse_skipped_tiles(capsys.readouterr().out) == SKIPPED_TILES
+
+@pytest.mark.parametrize('read_engine', [read_strip_engine, read_tile_engine])
+def test_default_filters(filtered_raster_fpath, lut_fpath, read_engine, capsys):
+    read_engine(filtered_raster_fpath, lut_fpath, ['mean'], verbose = True)
+
+    # Without points, and with tiles that are partly 'clouds/shadows', the next filter that fails gives the reason
+    skipped_tiles = {offset: reason for offset, reason in SKIPPED_TILES.items() if reason != 'no points'}
+    skipped_tiles[(0, 10)] = 'nan'
+    skipped_tiles[(10, 10)] = 'nan'
+
+    assert parse_skipped_tiles(capsys.readouterr().out) == skipped_tiles
+
+def test_class_means(raster_fpath, lut_fpath):
+    with rio.open(raster_fpath) as raster:
+        partials = create_tile_grid_partials(raster, TILE_SIZE, TILE_SIZE, land_use_band = LAND_USE_BAND, lut_fpath = lut_fpath, class_means = True)
+        data = raster.read()
+
+    class_means = calculate_class_means_from_partials(partials)
+    assert class_means.shape == (6, len(LAND_USE_CLASSES), 5, 6)
+
+    for tile_y, tile_x in np.ndindex(class_means.shape[2:]):
+        tile_data = data[:, tile_y * TILE_SIZE:(tile_y + 1) * TILE_SIZE, tile_x * TILE_SIZE:(tile_x + 1) * TILE_SIZE]
+
+        for class_no in range(len(LAND_USE_CLASSES)):
+            # Mean of the non-NaN values of the class, or NaN for classes that do not occur in the tile (like 'clouds/shadows')
+            pixels = tile_data[:, tile_data[LAND_USE_BAND - 1] == class_no].astype(np.float64)
+            valid = ~np.isnan(pixels)
+            with np.errstate(invalid = 'ignore'):
+                expected = np.round(np.where(valid, pixels, 0).sum(axis = 1) / valid.sum(axis = 1), 3)
+
+            np.testing.assert_allclose(class_means[:, class_no, tile_y, tile_x], expected, atol = TOLERANCE, equal_nan = True)
+
+def test_validity_map(filtered_raster_fpath, lut_fpath):
+    tile_filters = create_tile_filters(cloud_fraction = 0.5)
+
+    with rio.open(filtered_raster_fpath) as raster:
+        skipped_tiles, valid_tile_proportions = create_tile_validity_map(raster, TILE_SIZE, TILE_SIZE, land_use_band = LAND_USE_BAND,
+            lut_fpath = lut_fpath, tile_filters = tile_filters)
+
+    # The tiles that are skipped because of their land use band
+    assert skipped_tiles == {(0, 0): 'nan', (10, 0): 'very negative', (20, 0): 'clouds', (0, 10): 'nan', (10, 10): 'clouds'}
+
+    # The results are those of the tile engine without the validity map
+    results = read_tile_engine(filtered_raster_fpath, lut_fpath, ['mean'], tile_filters = tile_filters)
+    results_with_map = read_tile_engine(filtered_raster_fpath, lut_fpath, ['mean'], tile_filters = tile_filters,
+        skipped_tiles = skipped_tiles, land_use_proportions = valid_tile_proportions)
+
+    assert results_with_map == results
+
+    # The land use proportions are those of the tiles that are not skipped because of other bands
+    for offset, proportions in valid_tile_proportions.items():
+        if results[offset] is not False:
+            assert proportions == {name: results[offset][name] for name in proportions}
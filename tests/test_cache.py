@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from sample.cache import TileCache, get_tile_cache_key
+
+@pytest.fixture
+def cache(tmp_path):
+    with TileCache(str(tmp_path / 'tiles.sqlite')) as cache:
+        yield cache
+
+def test_hits_and_misses(cache):
+    keys = {(col_off, 0): get_tile_cache_key('raster', (col_off, 0, 10, 10), 'parameters') for col_off in range(0, 30, 10)}
+
+    # Nothing is found in an empty cache
+    assert cache.get_many(keys) == {}
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    results = {keys[(0, 0)]: {'band 1 - mean': 10.5}, keys[(10, 0)]: False}
+    cache.put_many(results)
+
+    # The stored results are found by the name of their key, including skipped tiles (False)
+    assert cache.get_many(keys) == {(0, 0): {'band 1 - mean': 10.5}, (10, 0): False}
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert cache.get_hit_rate() == pytest.approx(2 / 6)
+
+def test_results_persist(tmp_path):
+    fpath = str(tmp_path / 'tiles.sqlite')
+    key = get_tile_cache_key('raster', (0, 0, 10, 10), 'parameters')
+
+    with TileCache(fpath) as cache:
+        cache.put_many({key: {'band 1 - mean': np.float64(10.5)}})
+
+    with TileCache(fpath) as cache:
+        assert cache.get_many({(0, 0): key}) == {(0, 0): {'band 1 - mean': 10.5}}
+
+def test_keys_differ():
+    key = get_tile_cache_key('raster', (0, 0, 10, 10), 'parameters')
+
+    assert get_tile_cache_key('raster', (0, 0, 10, 10), 'parameters') == key
+    assert get_tile_cache_key('other raster', (0, 0, 10, 10), 'parameters') != key
+    assert get_tile_cache_key('raster', (10, 0, 10, 10), 'parameters') != key
+    assert get_tile_cache_key('raster', (0, 0, 10, 10), 'other parameters') != key
+
+def test_least_recently_used_are_evicted(cache):
+    results = {str(i): np.random.default_rng(i).random(100) for i in range(3)}
+    cache.put_many(results)
+
+    # Use the first result, and limit the cache to two results
+    cache.get_many({0: '0'})
+    cache.max_bytes = cache.get_size() * 2 // 3 + 1
+    cache.evict()
+
+    assert set(cache.get_many({i: str(i) for i in range(3)})) == {0, 2}
+
+def test_file_hash_is_stored(cache, tmp_path):
+    fpath = str(tmp_path / 'raster.tif')
+    with open(fpath, 'wb') as f:
+        f.write(b'content')
+
+    file_hash = cache.get_file_hash(fpath)
+
+    # The stored hash is used while the file is unchanged
+    assert cache.get_file_hash(fpath) == file_hash
+
+    with open(fpath, 'wb') as f:
+        f.write(b'other content')
+    os.utime(fpath, ns = (0, 0))
+
+    assert cache.get_file_hash(fpath) != file_hash
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import rasterio as rio
+
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from sample.raster import count_decoded_bytes, get_block_aligned_tile_rows, plan_block_aligned_reads, read_block_aligned_strips
+
+# Fixture raster: 3 bands of 55 x 45 pixels, with internal blocks of 16 x 16 pixels
+BLOCK_SIZE = 16
+
+@pytest.fixture(scope = 'module')
+def raster_fpath(tmp_path_factory):
+    data = np.random.default_rng(0).normal(500, 100, size = (3, 45, 55)).astype(np.float32)
+
+    fpath = str(tmp_path_factory.mktemp('raster') / 'raster.tif')
+    with rio.open(fpath, 'w', driver = 'GTiff', width = data.shape[2], height = data.shape[1], count = data.shape[0],
+        dtype = 'float32', crs = 'EPSG:32626', transform = from_origin(500000, 4200000, 10, 10),
+        tiled = True, blockxsize = BLOCK_SIZE, blockysize = BLOCK_SIZE) as raster:
+        raster.write(data)
+
+    return fpath
+
+@pytest.mark.parametrize('strip_height', [10, 16, 20, 45])
+def test_block_aligned_strips_equal_plain_reads(raster_fpath, strip_height):
+    with rio.open(raster_fpath) as raster:
+        strips = list(read_block_aligned_strips(raster, strip_height))
+
+        # The strips are those of plain reads
+        assert [row_off for row_off, _ in strips] == list(range(0, raster.height, strip_height))
+        for row_off, strip_data in strips:
+            window = Window(col_off = 0, row_off = row_off, width = raster.width, height = min(strip_height, raster.height - row_off))
+            np.testing.assert_array_equal(strip_data, raster.read(window = window))
+
+        # Every block is decoded once, as if the raster is read at once
+        full_window = Window(col_off = 0, row_off = 0, width = raster.width, height = raster.height)
+        assert count_decoded_bytes(raster, plan_block_aligned_reads(raster, strip_height)) == count_decoded_bytes(raster, [full_window])
+
+def test_block_aligned_tile_rows():
+    # Strips of 8 tiles of 10 rows end at the boundary of every 5th block
+    assert get_block_aligned_tile_rows(10, 16, max_height = 100) == 8
+    assert get_block_aligned_tile_rows(10, 16, max_height = 1024) == 96
+
+    # Strips are not aligned if that makes them much higher than the maximum
+    assert get_block_aligned_tile_rows(10, 16, max_height = 16) == 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sample.results import ResultTable, read_table
+
+COLUMNS = {'x1': np.int64, 'mean': np.float64}
+
+def create_rows(start: int, stop: int) -> list:
+    return [{'x1': 500000 + 10 * i, 'mean': i / 2} for i in range(start, stop)]
+
+def test_chunks_equal_rows():
+    with ResultTable(COLUMNS, chunk_size = 3) as table:
+        for row in create_rows(0, 10):
+            table.append(row)
+
+        # Missing float values are NaN
+        table.append({'x1': 0})
+
+    data = table.to_dataframe()
+
+    assert len(table) == 11
+    assert list(data.columns) == list(COLUMNS)
+    assert list(data.index) == list(range(11))
+    pd.testing.assert_frame_equal(data.iloc[:10], pd.DataFrame(create_rows(0, 10)))
+    assert np.isnan(data['mean'].iloc[10])
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_resume_after_truncation(tmp_path, file_format):
+    if file_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    fpath = str(tmp_path / ('table.csv' if file_format == 'csv' else 'table'))
+
+    # Store the checkpoint after every flush, and stop the run (with an error) after 8 rows
+    checkpoints = []
+    with pytest.raises(KeyboardInterrupt):
+        with ResultTable(COLUMNS, fpath = fpath, chunk_size = 3, file_format = file_format, on_flush = lambda table: checkpoints.append(table.get_checkpoint())) as table:
+            for row in create_rows(0, 8):
+                table.append(row)
+            raise KeyboardInterrupt
+
+    # Only the flushed rows are written
+    assert [checkpoint['rows'] for checkpoint in checkpoints] == [3, 6]
+    assert len(read_table(fpath)) == 6
+
+    # Continue from the first checkpoint, as if the second was not stored: the rows after it are removed first
+    with ResultTable(COLUMNS, fpath = fpath, chunk_size = 3, file_format = file_format, checkpoint = checkpoints[0]) as table:
+        for row in create_rows(3, 10):
+            table.append(row)
+
+    data = read_table(fpath)
+    if file_format == 'csv':
+        data = data.drop(columns = data.columns[0])
+
+    expected = pd.DataFrame(create_rows(0, 10))
+    pd.testing.assert_frame_equal(data.reset_index(drop = True), expected, check_dtype = False)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import rasterio as rio
+
+from rasterio.transform import from_origin
+
+from sample.spectral import calculate_spectral_variances, calculate_strip_spectral_variances, centeroidnp
+
+# The original implementation is the reference
+StandardScaler = pytest.importorskip('sklearn.preprocessing').StandardScaler
+PCA = pytest.importorskip('sklearn.decomposition').PCA
+
+# Fixture raster: 6 bands of 2 x 3 tiles of 20 x 20 pixels
+TILE_SIZE = 20
+NAN_TILE = (20, 20)
+NODATA_TILE = (40, 0)
+
+def calculate_spectral_variance_with_scikit_learn(data: np.ndarray) -> float:
+    """Calculates the spectral variance of a tile (bands, height, width), as the original implementation did."""
+    # Reshape and standardize the features
+    data_reshaped = np.reshape(data, (data.shape[0], data.shape[1] * data.shape[2]))
+    data_reshaped = StandardScaler().fit_transform(data_reshaped)
+
+    # Fit PCA
+    result = PCA(n_components = 2).fit(data_reshaped).components_
+
+    # Average distance based on the centroid
+    centroid = centeroidnp(result)
+    total_distance = 0
+    for i in range(0, result.shape[1]):
+        total_distance += ((result[0,i] - result[1,i])**2 + (centroid[0] - centroid[1])**2)**0.5
+
+    return total_distance / result.shape[1]
+
+@pytest.fixture(scope = 'module')
+def raster_fpath(tmp_path_factory):
+    """Writes a small raster, with a tile with NaN values and a tile with very negative (nodata) values."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(500, 100, size = (6, 2 * TILE_SIZE, 3 * TILE_SIZE)).astype(np.float32)
+
+    # Make the bands correlated, as they are in real data
+    data[1] += data[0]
+    data[2] -= 0.5 * data[0]
+
+    col_off, row_off = NAN_TILE
+    data[:, row_off + 3, col_off + 5] = np.nan
+
+    col_off, row_off = NODATA_TILE
+    data[1, row_off + 2:row_off + 8, col_off + 4:col_off + 9] = -3e38
+
+    fpath = str(tmp_path_factory.mktemp('spectral') / 'raster.tif')
+    with rio.open(fpath, 'w', driver = 'GTiff', width = data.shape[2], height = data.shape[1], count = data.shape[0],
+        dtype = 'float32', crs = 'EPSG:32626', transform = from_origin(500000, 4200000, 10, 10)) as raster:
+        raster.write(data)
+
+    return fpath
+
+def read_tiles(raster_fpath: str) -> dict:
+    with rio.open(raster_fpath) as raster:
+        data = raster.read()
+
+    return {
+        (col_off, row_off): data[:, row_off:row_off + TILE_SIZE, col_off:col_off + TILE_SIZE]
+        for col_off in range(0, data.shape[2], TILE_SIZE) for row_off in range(0, data.shape[1], TILE_SIZE)
+    }
+
+def test_batched_equals_scikit_learn(raster_fpath):
+    tiles = read_tiles(raster_fpath)
+    del tiles[NAN_TILE]
+
+    spectral_variances = calculate_spectral_variances(np.stack(list(tiles.values())))
+
+    expected = [calculate_spectral_variance_with_scikit_learn(tile_data) for tile_data in tiles.values()]
+    np.testing.assert_allclose(spectral_variances, expected, rtol = 1e-5)
+
+def test_strips_equal_scikit_learn(raster_fpath):
+    spectral_variances = calculate_strip_spectral_variances(raster_fpath, row_off = 0, tile_width = TILE_SIZE, tile_height = TILE_SIZE, tile_rows = 2)
+
+    for offset, tile_data in read_tiles(raster_fpath).items():
+        if offset == NAN_TILE:
+            continue
+        assert spectral_variances[offset] == pytest.approx(calculate_spectral_variance_with_scikit_learn(tile_data), rel = 1e-5)
+
+def test_nan_tile(raster_fpath):
+    tile_data = read_tiles(raster_fpath)[NAN_TILE]
+
+    # The original implementation does not accept NaN values; the batched one gives NaN
+    with pytest.raises(ValueError):
+        calculate_spectral_variance_with_scikit_learn(tile_data)
+
+    assert np.isnan(calculate_spectral_variances(tile_data[np.newaxis])[0])